@@ -0,0 +1,79 @@
+"""
+Endpoint combinado das camadas de infraestrutura
+Retorna fibra, linhas e subestações em uma única consulta
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from geoalchemy2.functions import ST_MakeEnvelope
+from sqlalchemy import JSON, Text, cast, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.endpoints.fibra import FIBRA_QUERY
+from app.api.v1.endpoints.linhas import LINHA_QUERY, LINHA_SIMPLIFIED_QUERY
+from app.api.v1.endpoints.subestacoes import SUBESTACAO_QUERY
+from app.core.database import get_db
+from app.core.rate_limit import limiter
+from app.core.security import security
+from app.models.fibra_optica import FibraOptica
+from app.models.linha_transmissao import LinhaTransmissao
+from app.models.subestacao import Subestacao
+from app.utils.geo_utils import bbox_filter, feature_collection_query
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    response_model=dict,
+    summary="Listar Camadas de Infraestrutura",
+    description="Retorna fibra, linhas e subestações de uma área em uma única resposta",
+)
+@limiter.limit("10/minute")  # Consulta as três camadas de uma vez
+async def get_camadas(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    # Filtros geográficos
+    bbox: str = Query(..., description="Bounding box: min_lon,min_lat,max_lon,max_lat"),
+    bbox_only: bool = Query(
+        False, description="Filtrar apenas pelo retângulo envolvente (mais rápido, menos preciso)"
+    ),
+    # Paginação (por camada)
+    limit: int = Query(100, ge=1, le=1000, description="Máximo de registros por camada"),
+    # Simplificação
+    simplify: bool = Query(True, description="Simplificar geometrias para reduzir tamanho"),
+):
+    """
+    Retorna um objeto com uma FeatureCollection por camada:
+    `{"fibra": ..., "linhas": ..., "subestacoes": ...}`.
+
+    As três FeatureCollections são montadas pelo PostgreSQL em uma única
+    query, evitando três requisições (e três idas ao banco) por visualização.
+    """
+    # SEGURANÇA: Validar bbox antes de usar
+    if not security.validate_bbox(bbox):
+        raise HTTPException(status_code=400, detail="Bounding box inválido ou muito grande")
+
+    min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
+    envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+
+    layers = {
+        "fibra": FIBRA_QUERY.where(bbox_filter(FibraOptica.geometry, envelope, bbox_only))
+        .order_by(FibraOptica.id)
+        .limit(limit),
+        "linhas": (LINHA_SIMPLIFIED_QUERY if simplify else LINHA_QUERY)
+        .where(bbox_filter(LinhaTransmissao.geometry, envelope, bbox_only))
+        .order_by(LinhaTransmissao.id)
+        .limit(limit),
+        "subestacoes": SUBESTACAO_QUERY.where(bbox_filter(Subestacao.geometry, envelope, bbox_only))
+        .order_by(Subestacao.id)
+        .limit(limit),
+    }
+
+    # Uma FeatureCollection por camada, agregadas em um único objeto JSON
+    args = []
+    for name, query in layers.items():
+        args.extend([literal(name), cast(feature_collection_query(query).scalar_subquery(), JSON)])
+
+    result = await db.execute(select(cast(func.json_build_object(*args), Text)))
+
+    return Response(content=result.scalar(), media_type="application/json")
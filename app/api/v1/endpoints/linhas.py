@@ -5,23 +5,65 @@ Retorna dados em formato GeoJSON
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from geoalchemy2.functions import (
-    ST_AsGeoJSON,
-    ST_Intersects,
-    ST_MakeEnvelope,
-    ST_Simplify,
-)
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from geoalchemy2.functions import ST_AsGeoJSON, ST_MakeEnvelope, ST_Simplify
+from sqlalchemy import bindparam, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.core.cache import (
+    CACHE_CONTROL,
+    cache_stream,
+    etag_matches,
+    get_cached,
+    get_layer_version,
+    make_cache_key,
+    make_etag,
+)
 from app.core.database import get_db
 from app.core.rate_limit import limiter
 from app.models.linha_transmissao import LinhaTransmissao
+from app.utils.geo_utils import (
+    MVT_MEDIA_TYPE,
+    bbox_filter,
+    mvt_tile_query,
+    row_to_feature_bytes,
+    stream_feature_collection,
+)
 
 router = APIRouter()
 
+# Colunas retornadas como properties, na ordem usada para montar a Feature
+LINHA_COLUMNS = (
+    LinhaTransmissao.id,
+    LinhaTransmissao.nome,
+    LinhaTransmissao.codigo,
+    LinhaTransmissao.tensao_kv,
+    LinhaTransmissao.extensao_km,
+    LinhaTransmissao.operador,
+    LinhaTransmissao.origem,
+    LinhaTransmissao.destino,
+    LinhaTransmissao.status,
+    LinhaTransmissao.created_at,
+    LinhaTransmissao.data_source,
+)
+LINHA_PROPERTIES = tuple(column.key for column in LINHA_COLUMNS)
+
+# Queries base montadas uma única vez; os filtros são adicionados por requisição
+LINHA_QUERY = select(*LINHA_COLUMNS, ST_AsGeoJSON(LinhaTransmissao.geometry).label("geometry"))
+# Usa a geometria pré-simplificada na escrita; calcula apenas se ausente
+LINHA_SIMPLIFIED_QUERY = select(
+    *LINHA_COLUMNS,
+    ST_AsGeoJSON(
+        func.coalesce(
+            LinhaTransmissao.geometry_simplified,
+            ST_Simplify(LinhaTransmissao.geometry, settings.SIMPLIFY_TOLERANCE),
+        )
+    ).label("geometry"),
+)
+LINHA_BY_ID_QUERY = LINHA_QUERY.where(LinhaTransmissao.id == bindparam("linha_id"))
+
 
 @router.get(
     "",
@@ -35,6 +77,9 @@ async def get_linhas(
     db: AsyncSession = Depends(get_db),
     # Filtros geográficos
     bbox: Optional[str] = Query(None, description="Bounding box: min_lon,min_lat,max_lon,max_lat"),
+    bbox_only: bool = Query(
+        False, description="Filtrar apenas pelo retângulo envolvente (mais rápido, menos preciso)"
+    ),
     # Filtros técnicos
     tensao_min: Optional[float] = Query(None, ge=0, description="Tensão mínima (kV)"),
     tensao_max: Optional[float] = Query(None, ge=0, description="Tensão máxima (kV)"),
@@ -43,6 +88,9 @@ async def get_linhas(
     destino: Optional[str] = Query(None, description="Subestação de destino"),
     # Paginação
     skip: int = Query(0, ge=0, description="Registros para pular"),
+    cursor: Optional[int] = Query(
+        None, ge=0, description="Último id recebido (paginação por cursor, substitui skip)"
+    ),
     limit: int = Query(100, ge=1, le=1000, description="Máximo de registros"),
     # Simplificação
     simplify: bool = Query(True, description="Simplificar geometrias para reduzir tamanho"),
@@ -50,87 +98,66 @@ async def get_linhas(
     """
     Retorna linhas de transmissão em formato GeoJSON
     """
-    try:
-        # Query base
-        query = select(
-            LinhaTransmissao.id,
-            LinhaTransmissao.nome,
-            LinhaTransmissao.codigo,
-            LinhaTransmissao.tensao_kv,
-            LinhaTransmissao.extensao_km,
-            LinhaTransmissao.operador,
-            LinhaTransmissao.origem,
-            LinhaTransmissao.destino,
-            LinhaTransmissao.status,
-            LinhaTransmissao.created_at,
-            LinhaTransmissao.data_source,
-        )
-
-        # Adicionar geometria (simplificada ou não)
-        if simplify:
-            query = query.add_columns(
-                ST_AsGeoJSON(
-                    ST_Simplify(LinhaTransmissao.geometry, settings.SIMPLIFY_TOLERANCE)
-                ).label("geometry")
-            )
-        else:
-            query = query.add_columns(ST_AsGeoJSON(LinhaTransmissao.geometry).label("geometry"))
-
-        # Aplicar filtros
-        if bbox:
-            try:
-                min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
-                envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
-                query = query.where(ST_Intersects(LinhaTransmissao.geometry, envelope))
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Formato de bbox inválido")
-
-        if tensao_min is not None:
-            query = query.where(LinhaTransmissao.tensao_kv >= tensao_min)
-
-        if tensao_max is not None:
-            query = query.where(LinhaTransmissao.tensao_kv <= tensao_max)
-
-        if operador:
-            query = query.where(LinhaTransmissao.operador.ilike(f"%{operador}%"))
-
-        if origem:
-            query = query.where(LinhaTransmissao.origem.ilike(f"%{origem}%"))
-
-        if destino:
-            query = query.where(LinhaTransmissao.destino.ilike(f"%{destino}%"))
-
-        # Paginação
-        query = query.offset(skip).limit(limit)
-
-        # Executar query
-        result = await db.execute(query)
-        rows = result.all()
-
-        # Converter para GeoJSON
-        import json
-
-        features = []
-        for row in rows:
-            row_dict = dict(row._mapping)
-            geometry_str = row_dict.pop("geometry")
-            geometry = json.loads(geometry_str) if geometry_str else None
-
-            properties = {}
-            for key, value in row_dict.items():
-                if hasattr(value, "isoformat"):
-                    properties[key] = value.isoformat()
-                else:
-                    properties[key] = value
-
-            features.append({"type": "Feature", "geometry": geometry, "properties": properties})
-
-        return {"type": "FeatureCollection", "features": features}
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar linhas: {str(e)}")
+    # Chave de cache pelos parâmetros da consulta e pela versão dos dados
+    version = await get_layer_version(db, LinhaTransmissao)
+    cache_key = make_cache_key(
+        "linhas", [*request.query_params.multi_items(), ("_version", version)]
+    )
+    etag = make_etag(cache_key)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    # Cliente já possui a versão atual
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Resposta em cache para os mesmos parâmetros de consulta
+    cached = await get_cached(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers=headers)
+
+    # Query base (geometria simplificada ou não)
+    query = LINHA_SIMPLIFIED_QUERY if simplify else LINHA_QUERY
+
+    # Aplicar filtros
+    if bbox:
+        try:
+            min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
+            envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+            query = query.where(bbox_filter(LinhaTransmissao.geometry, envelope, bbox_only))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Formato de bbox inválido")
+
+    if tensao_min is not None:
+        query = query.where(LinhaTransmissao.tensao_kv >= tensao_min)
+
+    if tensao_max is not None:
+        query = query.where(LinhaTransmissao.tensao_kv <= tensao_max)
+
+    if operador:
+        query = query.where(LinhaTransmissao.operador.ilike(f"%{operador}%"))
+
+    if origem:
+        query = query.where(LinhaTransmissao.origem.ilike(f"%{origem}%"))
+
+    if destino:
+        query = query.where(LinhaTransmissao.destino.ilike(f"%{destino}%"))
+
+    # Paginação - por cursor (id > último id) ou por deslocamento
+    if cursor is not None:
+        query = query.where(LinhaTransmissao.id > cursor)
+    else:
+        query = query.offset(skip)
+
+    query = query.order_by(LinhaTransmissao.id).limit(limit)
+
+    # Features montadas pelo PostgreSQL e enviadas em streaming (a query já é executada
+    # aqui: falhas do banco viram erro HTTP, não uma resposta 200 truncada)
+    chunks = await stream_feature_collection(query, id_column="id")
+    return StreamingResponse(
+        cache_stream(cache_key, chunks),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.get(
@@ -148,45 +175,40 @@ async def get_linha_by_id(
     """
     Retorna uma linha de transmissão específica por ID
     """
-    try:
-        query = select(
-            LinhaTransmissao.id,
-            LinhaTransmissao.nome,
-            LinhaTransmissao.codigo,
-            LinhaTransmissao.tensao_kv,
-            LinhaTransmissao.extensao_km,
-            LinhaTransmissao.operador,
-            LinhaTransmissao.origem,
-            LinhaTransmissao.destino,
-            LinhaTransmissao.status,
-            LinhaTransmissao.created_at,
-            LinhaTransmissao.data_source,
-            ST_AsGeoJSON(LinhaTransmissao.geometry).label("geometry"),
-        ).where(LinhaTransmissao.id == linha_id)
-
-        result = await db.execute(query)
-        row = result.first()
-
-        if not row:
-            raise HTTPException(status_code=404, detail="Linha não encontrada")
-
-        # Converter para GeoJSON Feature
-        import json
-
-        row_dict = dict(row._mapping)
-        geometry_str = row_dict.pop("geometry")
-        geometry = json.loads(geometry_str) if geometry_str else None
-
-        properties = {}
-        for key, value in row_dict.items():
-            if hasattr(value, "isoformat"):
-                properties[key] = value.isoformat()
-            else:
-                properties[key] = value
-
-        return {"type": "Feature", "geometry": geometry, "properties": properties}
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar linha: {str(e)}")
+    result = await db.execute(LINHA_BY_ID_QUERY, {"linha_id": linha_id})
+    row = result.first()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Linha não encontrada")
+
+    # Converter para GeoJSON Feature
+    return Response(
+        content=row_to_feature_bytes(row, LINHA_PROPERTIES), media_type="application/json"
+    )
+
+
+@router.get(
+    "/mvt/{z}/{x}/{y}",
+    response_class=Response,
+    summary="Tile Vetorial (MVT)",
+    description="Retorna linhas de transmissão como Mapbox Vector Tile para clientes de mapa",
+)
+@limiter.limit("300/minute")  # Clientes de mapa pedem vários tiles por visualização
+async def get_linhas_mvt(
+    request: Request,
+    z: int = Path(..., ge=0, le=22, description="Nível de zoom"),
+    x: int = Path(..., ge=0, description="Coluna do tile"),
+    y: int = Path(..., ge=0, description="Linha do tile"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retorna um tile vetorial (Mapbox Vector Tile) de linhas de transmissão
+    """
+    if x >= 2**z or y >= 2**z:
+        raise HTTPException(status_code=400, detail="Tile fora dos limites do nível de zoom")
+
+    tile = await db.scalar(
+        mvt_tile_query(LINHA_COLUMNS, LinhaTransmissao.geometry, "linhas", z, x, y)
+    )
+
+    return Response(content=tile or b"", media_type=MVT_MEDIA_TYPE)
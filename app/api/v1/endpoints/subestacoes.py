@@ -5,26 +5,58 @@ Retorna dados em formato GeoJSON
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from geoalchemy2.functions import (
-    ST_AsGeoJSON,
-    ST_Intersects,
-    ST_MakeEnvelope,
-    ST_Simplify,
-)
-from sqlalchemy import func, select, text
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from geoalchemy2.functions import ST_AsGeoJSON, ST_MakeEnvelope
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import settings
+from app.core.cache import (
+    CACHE_CONTROL,
+    cache_stream,
+    etag_matches,
+    get_cached,
+    get_layer_version,
+    make_cache_key,
+    make_etag,
+)
 from app.core.database import get_db
 from app.core.rate_limit import limiter
 from app.core.security import security
 from app.models.subestacao import Subestacao
-from app.schemas.base import FeatureCollectionBase
-from app.utils.geo_utils import rows_to_feature_collection
+from app.utils.geo_utils import (
+    MVT_MEDIA_TYPE,
+    bbox_filter,
+    mvt_tile_query,
+    row_to_feature_bytes,
+    stream_feature_collection,
+)
 
 router = APIRouter()
 
+# Colunas retornadas como properties, na ordem usada para montar a Feature
+# SEGURANÇA: Não expor campos sensíveis
+SUBESTACAO_COLUMNS = (
+    Subestacao.id,
+    Subestacao.nome,
+    Subestacao.codigo,
+    Subestacao.tensao_kv,
+    Subestacao.tipo,
+    Subestacao.operador,
+    Subestacao.municipio,
+    Subestacao.uf,
+    Subestacao.capacidade_mva,
+    Subestacao.status,
+    # SEGURANÇA: Não expor created_at, data_source
+)
+SUBESTACAO_PROPERTIES = tuple(column.key for column in SUBESTACAO_COLUMNS)
+
+# Queries base montadas uma única vez; os filtros são adicionados por requisição.
+# Pontos não têm vértices a simplificar, então o parâmetro simplify não altera
+# a geometria retornada
+SUBESTACAO_QUERY = select(*SUBESTACAO_COLUMNS, ST_AsGeoJSON(Subestacao.geometry).label("geometry"))
+SUBESTACAO_BY_ID_QUERY = SUBESTACAO_QUERY.where(Subestacao.id == bindparam("subestacao_id"))
+
 
 @router.get(
     "",
@@ -38,6 +70,9 @@ async def get_subestacoes(
     db: AsyncSession = Depends(get_db),
     # Filtros geográficos
     bbox: Optional[str] = Query(None, description="Bounding box: min_lon,min_lat,max_lon,max_lat"),
+    bbox_only: bool = Query(
+        False, description="Filtrar apenas pelo retângulo envolvente (mais rápido, menos preciso)"
+    ),
     uf: Optional[str] = Query(None, max_length=2, description="Unidade Federativa"),
     municipio: Optional[str] = Query(None, description="Nome do município"),
     # Filtros técnicos
@@ -46,6 +81,9 @@ async def get_subestacoes(
     operador: Optional[str] = Query(None, description="Nome do operador"),
     # Paginação
     skip: int = Query(0, ge=0, description="Registros para pular"),
+    cursor: Optional[int] = Query(
+        None, ge=0, description="Último id recebido (paginação por cursor, substitui skip)"
+    ),
     limit: int = Query(100, ge=1, le=1000, description="Máximo de registros"),
     # Simplificação
     simplify: bool = Query(True, description="Simplificar geometrias para reduzir tamanho"),
@@ -53,95 +91,73 @@ async def get_subestacoes(
     """
     Retorna subestações em formato GeoJSON
     """
-    try:
-        # Query base - SEGURANÇA: Não expor campos sensíveis
-        query = select(
-            Subestacao.id,
-            Subestacao.nome,
-            Subestacao.codigo,
-            Subestacao.tensao_kv,
-            Subestacao.tipo,
-            Subestacao.operador,
-            Subestacao.municipio,
-            Subestacao.uf,
-            Subestacao.capacidade_mva,
-            Subestacao.status,
-            # SEGURANÇA: Não expor created_at, data_source
-        )
-
-        # Adicionar geometria (simplificada ou não)
-        if simplify:
-            query = query.add_columns(
-                ST_AsGeoJSON(ST_Simplify(Subestacao.geometry, settings.SIMPLIFY_TOLERANCE)).label(
-                    "geometry"
-                )
+    # Chave de cache pelos parâmetros da consulta e pela versão dos dados
+    version = await get_layer_version(db, Subestacao)
+    cache_key = make_cache_key(
+        "subestacoes", [*request.query_params.multi_items(), ("_version", version)]
+    )
+    etag = make_etag(cache_key)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    # Cliente já possui a versão atual
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Resposta em cache para os mesmos parâmetros de consulta
+    cached = await get_cached(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers=headers)
+
+    # Query base
+    query = SUBESTACAO_QUERY
+
+    # Aplicar filtros
+    if bbox:
+        # SEGURANÇA: Validar bbox antes de usar
+        if not security.validate_bbox(bbox):
+            raise HTTPException(status_code=400, detail="Bounding box inválido ou muito grande")
+
+        try:
+            min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
+            envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+            query = query.where(bbox_filter(Subestacao.geometry, envelope, bbox_only))
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Formato de bbox inválido. Use: min_lon,min_lat,max_lon,max_lat",
             )
-        else:
-            query = query.add_columns(ST_AsGeoJSON(Subestacao.geometry).label("geometry"))
-
-        # Aplicar filtros
-        if bbox:
-            # SEGURANÇA: Validar bbox antes de usar
-            if not security.validate_bbox(bbox):
-                raise HTTPException(status_code=400, detail="Bounding box inválido ou muito grande")
-
-            try:
-                min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
-                envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
-                query = query.where(ST_Intersects(Subestacao.geometry, envelope))
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Formato de bbox inválido. Use: min_lon,min_lat,max_lon,max_lat",
-                )
-
-        if uf:
-            query = query.where(Subestacao.uf == uf.upper())
-
-        if municipio:
-            query = query.where(Subestacao.municipio.ilike(f"%{municipio}%"))
-
-        if tensao_min is not None:
-            query = query.where(Subestacao.tensao_kv >= tensao_min)
-
-        if tensao_max is not None:
-            query = query.where(Subestacao.tensao_kv <= tensao_max)
-
-        if operador:
-            query = query.where(Subestacao.operador.ilike(f"%{operador}%"))
 
-        # Paginação
-        query = query.offset(skip).limit(limit)
+    if uf:
+        query = query.where(Subestacao.uf == uf.upper())
 
-        # Executar query
-        result = await db.execute(query)
-        rows = result.all()
+    if municipio:
+        query = query.where(Subestacao.municipio.ilike(f"%{municipio}%"))
 
-        # Converter para GeoJSON
-        # Como ST_AsGeoJSON retorna string, precisamos parsear
-        import json
+    if tensao_min is not None:
+        query = query.where(Subestacao.tensao_kv >= tensao_min)
 
-        features = []
-        for row in rows:
-            row_dict = dict(row._mapping)
-            geometry_str = row_dict.pop("geometry")
-            geometry = json.loads(geometry_str) if geometry_str else None
+    if tensao_max is not None:
+        query = query.where(Subestacao.tensao_kv <= tensao_max)
 
-            properties = {}
-            for key, value in row_dict.items():
-                if hasattr(value, "isoformat"):
-                    properties[key] = value.isoformat()
-                else:
-                    properties[key] = value
+    if operador:
+        query = query.where(Subestacao.operador.ilike(f"%{operador}%"))
 
-            features.append({"type": "Feature", "geometry": geometry, "properties": properties})
+    # Paginação - por cursor (id > último id) ou por deslocamento
+    if cursor is not None:
+        query = query.where(Subestacao.id > cursor)
+    else:
+        query = query.offset(skip)
 
-        return {"type": "FeatureCollection", "features": features}
+    query = query.order_by(Subestacao.id).limit(limit)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar subestações: {str(e)}")
+    # Features montadas pelo PostgreSQL e enviadas em streaming (a query já é executada
+    # aqui: falhas do banco viram erro HTTP, não uma resposta 200 truncada)
+    chunks = await stream_feature_collection(query, id_column="id")
+    return StreamingResponse(
+        cache_stream(cache_key, chunks),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.get(
@@ -159,45 +175,40 @@ async def get_subestacao_by_id(
     """
     Retorna uma subestação específica por ID
     """
-    try:
-        query = select(
-            Subestacao.id,
-            Subestacao.nome,
-            Subestacao.codigo,
-            Subestacao.tensao_kv,
-            Subestacao.tipo,
-            Subestacao.operador,
-            Subestacao.municipio,
-            Subestacao.uf,
-            Subestacao.capacidade_mva,
-            Subestacao.status,
-            # SEGURANÇA: Não expor created_at, data_source
-            ST_AsGeoJSON(Subestacao.geometry).label("geometry"),
-        ).where(Subestacao.id == subestacao_id)
-
-        result = await db.execute(query)
-        row = result.first()
-
-        if not row:
-            raise HTTPException(status_code=404, detail="Subestação não encontrada")
-
-        # Converter para GeoJSON Feature
-        import json
-
-        row_dict = dict(row._mapping)
-        geometry_str = row_dict.pop("geometry")
-        geometry = json.loads(geometry_str) if geometry_str else None
-
-        properties = {}
-        for key, value in row_dict.items():
-            if hasattr(value, "isoformat"):
-                properties[key] = value.isoformat()
-            else:
-                properties[key] = value
-
-        return {"type": "Feature", "geometry": geometry, "properties": properties}
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar subestação: {str(e)}")
+    result = await db.execute(SUBESTACAO_BY_ID_QUERY, {"subestacao_id": subestacao_id})
+    row = result.first()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Subestação não encontrada")
+
+    # Converter para GeoJSON Feature
+    return Response(
+        content=row_to_feature_bytes(row, SUBESTACAO_PROPERTIES), media_type="application/json"
+    )
+
+
+@router.get(
+    "/mvt/{z}/{x}/{y}",
+    response_class=Response,
+    summary="Tile Vetorial (MVT)",
+    description="Retorna subestações como Mapbox Vector Tile para clientes de mapa",
+)
+@limiter.limit("300/minute")  # Clientes de mapa pedem vários tiles por visualização
+async def get_subestacoes_mvt(
+    request: Request,
+    z: int = Path(..., ge=0, le=22, description="Nível de zoom"),
+    x: int = Path(..., ge=0, description="Coluna do tile"),
+    y: int = Path(..., ge=0, description="Linha do tile"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retorna um tile vetorial (Mapbox Vector Tile) de subestações
+    """
+    if x >= 2**z or y >= 2**z:
+        raise HTTPException(status_code=400, detail="Tile fora dos limites do nível de zoom")
+
+    tile = await db.scalar(
+        mvt_tile_query(SUBESTACAO_COLUMNS, Subestacao.geometry, "subestacoes", z, x, y)
+    )
+
+    return Response(content=tile or b"", media_type=MVT_MEDIA_TYPE)
@@ -4,25 +4,135 @@ Retorna polígonos de zoneamento em formato GeoJSON
 Fonte: Lei 18.177/2024
 """
 
+import asyncio
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
-from geoalchemy2.functions import (
-    ST_AsGeoJSON,
-    ST_Intersects,
-    ST_MakeEnvelope,
-    ST_Simplify,
-)
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from geoalchemy2.functions import ST_AsGeoJSON, ST_MakeEnvelope
+from sqlalchemy import JSON, Float, Integer, bindparam, column, func, select, table
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.core.database import get_db
+from app.core.cache import (
+    STATIC_CACHE_CONTROL,
+    cache_stream,
+    etag_matches,
+    get_cached,
+    get_layer_version,
+    make_cache_key,
+    make_etag,
+)
+from app.core.database import AsyncSessionLocal, get_db
 from app.core.rate_limit import limiter
+from app.core.security import parse_bbox
 from app.models.zoneamento_sp import ZoneamentoSP
+from app.utils.geo_utils import (
+    MVT_MEDIA_TYPE,
+    bbox_filter,
+    mvt_tile_query,
+    row_to_feature_bytes,
+    stream_feature_collection,
+)
 
 router = APIRouter()
 
+# Simplificação automática: tolerância ≈ largura da bbox / largura da tela (px)
+AUTO_TOLERANCE_VIEWPORT_PX = 1024.0
+MIN_TOLERANCE = 0.0001
+MAX_TOLERANCE = 0.01
+
+# Colunas retornadas como properties, na ordem usada para montar a Feature
+ZONEAMENTO_COLUMNS = (
+    ZoneamentoSP.id_original,
+    ZoneamentoSP.cd_tipo_legislacao_zoneamento,
+    ZoneamentoSP.cd_numero_legislacao_zoneamento,
+    ZoneamentoSP.an_legislacao_zoneamento,
+    ZoneamentoSP.cd_zoneamento_perimetro,
+    ZoneamentoSP.tx_zoneamento_perimetro,
+    ZoneamentoSP.cd_identificador,
+    ZoneamentoSP.tx_observacao_perimetro,
+    ZoneamentoSP.dt_atualizacao,
+    ZoneamentoSP.cd_usuario_atualizacao,
+    ZoneamentoSP.data_source,
+)
+ZONEAMENTO_PROPERTIES = tuple(column.key for column in ZONEAMENTO_COLUMNS)
+
+# Queries base montadas uma única vez. Tolerância e precisão são parâmetros
+# (bindparam), então o SQL compilado é o mesmo para qualquer valor pedido.
+# A simplificação preserva a topologia (sem polígonos inválidos/colapsados) e
+# remove vértices repetidos antes de simplificar
+ZONEAMENTO_QUERY = select(
+    *ZONEAMENTO_COLUMNS,
+    ST_AsGeoJSON(ZoneamentoSP.geometry, bindparam("precision", type_=Integer)).label("geometry"),
+)
+ZONEAMENTO_SIMPLIFIED_QUERY = select(
+    *ZONEAMENTO_COLUMNS,
+    ST_AsGeoJSON(
+        func.ST_SimplifyPreserveTopology(
+            func.ST_RemoveRepeatedPoints(ZoneamentoSP.geometry),
+            bindparam("tolerance", type_=Float),
+        ),
+        bindparam("precision", type_=Integer),
+    ).label("geometry"),
+)
+ZONEAMENTO_BY_ID_QUERY = ZONEAMENTO_QUERY.where(
+    ZoneamentoSP.id_original == bindparam("zoneamento_id")
+)
+ZONEAMENTO_SIMPLIFIED_BY_ID_QUERY = ZONEAMENTO_SIMPLIFIED_QUERY.where(
+    ZoneamentoSP.id_original == bindparam("zoneamento_id")
+)
+
+# Agregações de /stats/summary (fallback da materialized view)
+ZONEAMENTO_TOTAL_QUERY = select(func.count(ZoneamentoSP.id_original))
+ZONEAMENTO_TIPOS_QUERY = (
+    select(
+        ZoneamentoSP.cd_zoneamento_perimetro,
+        func.count(ZoneamentoSP.id_original).label("count"),
+    )
+    .group_by(ZoneamentoSP.cd_zoneamento_perimetro)
+    .order_by(func.count(ZoneamentoSP.id_original).desc())
+    .limit(20)
+)
+ZONEAMENTO_ANOS_QUERY = (
+    select(
+        ZoneamentoSP.an_legislacao_zoneamento,
+        func.count(ZoneamentoSP.id_original).label("count"),
+    )
+    .group_by(ZoneamentoSP.an_legislacao_zoneamento)
+    .order_by(ZoneamentoSP.an_legislacao_zoneamento.desc())
+)
+
+# Estatísticas pré-calculadas pela carga (scripts/extrair_sao_paulo_municipio.py)
+ZONEAMENTO_STATS_VIEW = table(
+    "zoneamento_sp_stats_mv",
+    column("total", Integer),
+    column("tipos", JSON),
+    column("anos", JSON),
+    schema="geo",
+)
+
+
+def _text_filter(column, value: str):
+    """
+    Filtro textual: igualdade (sem diferenciar maiúsculas) ou ILIKE se houver curinga
+
+    Códigos como ZEPAM ou ZEIS-1 são curtos e conhecidos; a igualdade usa o
+    índice em upper(coluna), e o ILIKE com % usa o índice trigram.
+
+    Args:
+        column: Coluna do modelo
+        value: Valor informado pelo cliente (aceita % como curinga)
+
+    Returns:
+        Expressão SQLAlchemy para usar em query.where()
+    """
+    if "%" in value:
+        return column.ilike(value)
+
+    return func.upper(column) == value.upper()
+
 
 @router.get(
     "",
@@ -39,22 +149,29 @@ async def get_zoneamento(
     bbox: Optional[str] = Query(None, description="Bounding box: min_lon,min_lat,max_lon,max_lat"),
     # Filtros de zoneamento
     cd_zoneamento_perimetro: Optional[str] = Query(
-        None, description="Código do zoneamento (ex: ZEPAM, ZC, ZEIS-1, ZM, ZER-1)"
+        None, description="Código do zoneamento (ex: ZEPAM, ZC, ZEIS-1, ZM, ZER-1; % = curinga)"
     ),
     an_legislacao_zoneamento: Optional[int] = Query(
         None, ge=1900, le=2100, description="Ano da legislação"
     ),
     cd_tipo_legislacao_zoneamento: Optional[str] = Query(
-        None, description="Tipo da legislação (lei, decreto, etc.)"
+        None, description="Tipo da legislação (lei, decreto, etc.; % = curinga)"
     ),
     # Paginação
-    skip: int = Query(0, ge=0, description="Registros para pular"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Registros para pular (use `after`)"),
+    after: Optional[str] = Query(
+        None, description="Último id_original recebido (paginação por cursor, substitui skip)"
+    ),
     limit: int = Query(100, ge=1, le=1000, description="Máximo de registros"),
     # Simplificação (MUITO importante para polígonos!)
     simplify: bool = Query(True, description="Simplificar geometrias para reduzir tamanho"),
     simplify_tolerance: Optional[float] = Query(
-        None, ge=0.0001, le=0.01, description="Tolerância de simplificação (padrão: 0.001)"
+        None,
+        ge=0.0001,
+        le=0.01,
+        description="Tolerância de simplificação (padrão: derivada da bbox, ou 0.001)",
     ),
+    precision: int = Query(6, ge=4, le=8, description="Casas decimais das coordenadas (6 ≈ 0,1 m)"),
 ):
     """
     Retorna polígonos de zoneamento urbano de São Paulo em formato GeoJSON.
@@ -66,109 +183,106 @@ async def get_zoneamento(
     - `cd_tipo_legislacao_zoneamento`: Tipo da legislação
 
     **Performance:**
-    - Use `simplify=true` (padrão) para reduzir o tamanho da resposta
+    - Use `simplify=true` (padrão) para reduzir o tamanho da resposta; com
+      `bbox`, a tolerância é ajustada automaticamente à área consultada
+    - Use `precision` para ajustar as casas decimais das coordenadas (padrão: 6)
     - Use `bbox` para consultar apenas áreas específicas
     - Limite os resultados com `limit` (máximo 1000)
+    - Pagine com `after` usando o `next_cursor` da página anterior
     """
-    try:
-        # Query base - selecionar todos os campos
-        query = select(
-            ZoneamentoSP.id_original,
-            ZoneamentoSP.cd_tipo_legislacao_zoneamento,
-            ZoneamentoSP.cd_numero_legislacao_zoneamento,
-            ZoneamentoSP.an_legislacao_zoneamento,
-            ZoneamentoSP.cd_zoneamento_perimetro,
-            ZoneamentoSP.tx_zoneamento_perimetro,
-            ZoneamentoSP.cd_identificador,
-            ZoneamentoSP.tx_observacao_perimetro,
-            ZoneamentoSP.dt_atualizacao,
-            ZoneamentoSP.cd_usuario_atualizacao,
-            ZoneamentoSP.data_source,
+    # Versão dos dados para validação por ETag
+    version = await get_layer_version(db, ZoneamentoSP)
+    cache_key = make_cache_key(
+        "zoneamento", [*request.query_params.multi_items(), ("_version", version)]
+    )
+    etag = make_etag(cache_key)
+    headers = {"ETag": etag, "Cache-Control": STATIC_CACHE_CONTROL}
+
+    # Cliente já possui a versão atual
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Resposta em cache para os mesmos parâmetros de consulta
+    cached = await get_cached(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers=headers)
+
+    # Validar bbox antes de montar a geometria (a tolerância depende da área pedida)
+    envelope = None
+    if bbox:
+        bounds = parse_bbox(bbox)
+        if bounds is None:
+            raise HTTPException(status_code=400, detail="Formato de bbox inválido")
+
+        min_lon, min_lat, max_lon, max_lat = bounds
+
+        # Validar bbox para São Paulo (aproximadamente)
+        if not (-47.0 <= min_lon <= -46.0 and -24.0 <= min_lat <= -23.0):
+            raise HTTPException(
+                status_code=400, detail="Bounding box fora dos limites de São Paulo"
+            )
+
+        envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+
+    # Tolerância: informada pelo cliente, derivada da bbox (~1 pixel) ou padrão
+    if simplify_tolerance:
+        tolerance = simplify_tolerance
+    elif envelope is not None:
+        span = max(max_lon - min_lon, max_lat - min_lat)
+        tolerance = min(max(span / AUTO_TOLERANCE_VIEWPORT_PX, MIN_TOLERANCE), MAX_TOLERANCE)
+    else:
+        tolerance = settings.SIMPLIFY_TOLERANCE
+
+    # Query base com a geometria simplificada ou não
+    if simplify:
+        query = ZONEAMENTO_SIMPLIFIED_QUERY.params(tolerance=tolerance, precision=precision)
+    else:
+        query = ZONEAMENTO_QUERY.params(precision=precision)
+
+    # Aplicar filtros espaciais
+    if envelope is not None:
+        query = query.where(bbox_filter(ZoneamentoSP.geometry, envelope))
+
+    # Aplicar filtros de zoneamento
+    if cd_zoneamento_perimetro:
+        query = query.where(
+            _text_filter(ZoneamentoSP.cd_zoneamento_perimetro, cd_zoneamento_perimetro)
         )
 
-        # Adicionar geometria (simplificada ou não)
-        tolerance = simplify_tolerance if simplify_tolerance else settings.SIMPLIFY_TOLERANCE
-        if simplify:
-            query = query.add_columns(
-                ST_AsGeoJSON(ST_Simplify(ZoneamentoSP.geometry, tolerance)).label("geometry")
-            )
-        else:
-            query = query.add_columns(ST_AsGeoJSON(ZoneamentoSP.geometry).label("geometry"))
-
-        # Aplicar filtros espaciais
-        if bbox:
-            try:
-                min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
-
-                # Validar bbox para São Paulo (aproximadamente)
-                if not (-47.0 <= min_lon <= -46.0 and -24.0 <= min_lat <= -23.0):
-                    raise HTTPException(
-                        status_code=400, detail="Bounding box fora dos limites de São Paulo"
-                    )
-
-                envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
-                query = query.where(ST_Intersects(ZoneamentoSP.geometry, envelope))
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Formato de bbox inválido")
-
-        # Aplicar filtros de zoneamento
-        if cd_zoneamento_perimetro:
-            query = query.where(
-                ZoneamentoSP.cd_zoneamento_perimetro.ilike(f"%{cd_zoneamento_perimetro}%")
-            )
+    if an_legislacao_zoneamento:
+        query = query.where(ZoneamentoSP.an_legislacao_zoneamento == an_legislacao_zoneamento)
 
-        if an_legislacao_zoneamento:
-            query = query.where(ZoneamentoSP.an_legislacao_zoneamento == an_legislacao_zoneamento)
+    if cd_tipo_legislacao_zoneamento:
+        # Busca por substring, como antes: o tipo de legislação não é um código curto e
+        # conhecido como o perímetro (ILIKE atendido pelo índice trigram da coluna)
+        query = query.where(
+            ZoneamentoSP.cd_tipo_legislacao_zoneamento.ilike(f"%{cd_tipo_legislacao_zoneamento}%")
+        )
 
-        if cd_tipo_legislacao_zoneamento:
-            query = query.where(
-                ZoneamentoSP.cd_tipo_legislacao_zoneamento.ilike(
-                    f"%{cd_tipo_legislacao_zoneamento}%"
-                )
-            )
+    # Paginação - por cursor (id_original > último recebido) ou por deslocamento
+    if after is not None:
+        query = query.where(ZoneamentoSP.id_original > after)
+    else:
+        query = query.offset(skip)
+
+    query = query.order_by(ZoneamentoSP.id_original).limit(limit)
 
-        # Paginação
-        query = query.offset(skip).limit(limit)
-
-        # Executar query
-        result = await db.execute(query)
-        rows = result.all()
-
-        # Converter para GeoJSON
-        import json
-
-        features = []
-        for row in rows:
-            row_dict = dict(row._mapping)
-            geometry_str = row_dict.pop("geometry")
-            geometry = json.loads(geometry_str) if geometry_str else None
-
-            # Converter campos datetime para ISO format
-            properties = {}
-            for key, value in row_dict.items():
-                if hasattr(value, "isoformat"):
-                    properties[key] = value.isoformat()
-                else:
-                    properties[key] = value
-
-            features.append({"type": "Feature", "geometry": geometry, "properties": properties})
-
-        return {
-            "type": "FeatureCollection",
-            "features": features,
-            "metadata": {
-                "count": len(features),
-                "skip": skip,
-                "limit": limit,
-                "simplified": simplify,
-                "tolerance": tolerance if simplify else None,
-            },
-        }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar zoneamento: {str(e)}")
+    metadata = {
+        "skip": skip,
+        "limit": limit,
+        "simplified": simplify,
+        "tolerance": tolerance if simplify else None,
+        "precision": precision,
+    }
+
+    # Features montadas pelo PostgreSQL e enviadas em streaming (a query já é executada
+    # aqui: falhas do banco viram erro HTTP, não uma resposta 200 truncada)
+    chunks = await stream_feature_collection(query, id_column="id_original", metadata=metadata)
+    return StreamingResponse(
+        cache_stream(cache_key, chunks),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.get(
@@ -184,65 +298,94 @@ async def get_zoneamento_by_id(
     zoneamento_id: str,
     db: AsyncSession = Depends(get_db),
     simplify: bool = Query(True, description="Simplificar geometria"),
+    precision: int = Query(6, ge=4, le=8, description="Casas decimais das coordenadas (6 ≈ 0,1 m)"),
 ):
     """
     Retorna um polígono de zoneamento específico por ID original.
     """
-    try:
-        query = select(
-            ZoneamentoSP.id_original,
-            ZoneamentoSP.cd_tipo_legislacao_zoneamento,
-            ZoneamentoSP.cd_numero_legislacao_zoneamento,
-            ZoneamentoSP.an_legislacao_zoneamento,
-            ZoneamentoSP.cd_zoneamento_perimetro,
-            ZoneamentoSP.tx_zoneamento_perimetro,
-            ZoneamentoSP.cd_identificador,
-            ZoneamentoSP.tx_observacao_perimetro,
-            ZoneamentoSP.dt_atualizacao,
-            ZoneamentoSP.cd_usuario_atualizacao,
-            ZoneamentoSP.data_source,
+    if simplify:
+        query = ZONEAMENTO_SIMPLIFIED_BY_ID_QUERY
+        params = {"tolerance": settings.SIMPLIFY_TOLERANCE}
+    else:
+        query = ZONEAMENTO_BY_ID_QUERY
+        params = {}
+
+    result = await db.execute(
+        query, {"zoneamento_id": zoneamento_id, "precision": precision, **params}
+    )
+    row = result.first()
+
+    if not row:
+        raise HTTPException(
+            status_code=404, detail=f"Zoneamento com ID {zoneamento_id} não encontrado"
         )
 
-        # Adicionar geometria
-        if simplify:
-            query = query.add_columns(
-                ST_AsGeoJSON(ST_Simplify(ZoneamentoSP.geometry, settings.SIMPLIFY_TOLERANCE)).label(
-                    "geometry"
-                )
-            )
-        else:
-            query = query.add_columns(ST_AsGeoJSON(ZoneamentoSP.geometry).label("geometry"))
+    # Converter para GeoJSON Feature
+    return Response(
+        content=row_to_feature_bytes(row, ZONEAMENTO_PROPERTIES), media_type="application/json"
+    )
 
-        query = query.where(ZoneamentoSP.id_original == zoneamento_id)
 
-        result = await db.execute(query)
-        row = result.first()
+@router.get(
+    "/mvt/{z}/{x}/{y}",
+    response_class=Response,
+    summary="Tile Vetorial (MVT)",
+    description="Retorna polígonos de zoneamento como Mapbox Vector Tile para clientes de mapa",
+)
+@limiter.limit("300/minute")  # Clientes de mapa pedem vários tiles por visualização
+async def get_zoneamento_mvt(
+    request: Request,
+    z: int = Path(..., ge=0, le=22, description="Nível de zoom"),
+    x: int = Path(..., ge=0, description="Coluna do tile"),
+    y: int = Path(..., ge=0, description="Linha do tile"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retorna um tile vetorial (Mapbox Vector Tile) de zoneamento.
 
-        if not row:
-            raise HTTPException(
-                status_code=404, detail=f"Zoneamento com ID {zoneamento_id} não encontrado"
-            )
+    O PostGIS recorta e quantiza os polígonos na grade do tile, dispensando
+    a simplificação e a redução de precisão do GeoJSON.
+    """
+    if x >= 2**z or y >= 2**z:
+        raise HTTPException(status_code=400, detail="Tile fora dos limites do nível de zoom")
 
-        # Converter para GeoJSON Feature
-        import json
+    tile = await db.scalar(
+        mvt_tile_query(ZONEAMENTO_COLUMNS, ZoneamentoSP.geometry, "zoneamento", z, x, y)
+    )
 
-        row_dict = dict(row._mapping)
-        geometry_str = row_dict.pop("geometry")
-        geometry = json.loads(geometry_str) if geometry_str else None
+    return Response(content=tile or b"", media_type=MVT_MEDIA_TYPE)
 
-        properties = {}
-        for key, value in row_dict.items():
-            if hasattr(value, "isoformat"):
-                properties[key] = value.isoformat()
-            else:
-                properties[key] = value
 
-        return {"type": "Feature", "geometry": geometry, "properties": properties}
+async def _fetch_all(query):
+    """
+    Executa uma query em sessão própria (permite rodar queries em paralelo)
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query)
+        return result.all()
+
+
+async def _compute_stats():
+    """
+    Calcula as estatísticas direto na tabela (fallback da materialized view)
+
+    As três agregações são independentes e rodam em paralelo, cada uma em
+    uma conexão do pool.
+
+    Returns:
+        Tupla (total, tipos, anos) no mesmo formato da view
+    """
+    total_rows, tipos_rows, anos_rows = await asyncio.gather(
+        _fetch_all(ZONEAMENTO_TOTAL_QUERY),
+        _fetch_all(ZONEAMENTO_TIPOS_QUERY),
+        _fetch_all(ZONEAMENTO_ANOS_QUERY),
+    )
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar zoneamento: {str(e)}")
+    total = total_rows[0][0]
+    tipos = [{"codigo": row[0], "count": row[1]} for row in tipos_rows]
+    anos = [{"ano": row[0], "count": row[1]} for row in anos_rows if row[0] is not None]
+
+    return total, tipos, anos
 
 
 @router.get(
@@ -266,47 +409,39 @@ async def get_zoneamento_stats(
     - Anos de legislação
     - Contagem por tipo de legislação
     """
-    try:
-        from sqlalchemy import func
+    # A versão dos dados também identifica as estatísticas
+    version = await get_layer_version(db, ZoneamentoSP)
+    etag = make_etag(make_cache_key("zoneamento_stats", [("_version", version)]))
+    headers = {"ETag": etag, "Cache-Control": STATIC_CACHE_CONTROL}
 
-        # Total de registros
-        total_query = select(func.count(ZoneamentoSP.id_original))
-        total_result = await db.execute(total_query)
-        total = total_result.scalar()
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
 
-        # Tipos de zoneamento únicos
-        tipos_query = (
+    # Estatísticas pré-calculadas na carga (materialized view)
+    try:
+        result = await db.execute(
             select(
-                ZoneamentoSP.cd_zoneamento_perimetro,
-                func.count(ZoneamentoSP.id_original).label("count"),
+                ZONEAMENTO_STATS_VIEW.c.total,
+                ZONEAMENTO_STATS_VIEW.c.tipos,
+                ZONEAMENTO_STATS_VIEW.c.anos,
             )
-            .group_by(ZoneamentoSP.cd_zoneamento_perimetro)
-            .order_by(func.count(ZoneamentoSP.id_original).desc())
-            .limit(20)
         )
+        stats = result.first()
+    except ProgrammingError:
+        # View ainda não criada (carga antiga): calcular direto na tabela
+        await db.rollback()
+        stats = None
 
-        tipos_result = await db.execute(tipos_query)
-        tipos = [{"codigo": row[0], "count": row[1]} for row in tipos_result.all()]
-
-        # Anos de legislação
-        anos_query = (
-            select(
-                ZoneamentoSP.an_legislacao_zoneamento,
-                func.count(ZoneamentoSP.id_original).label("count"),
-            )
-            .group_by(ZoneamentoSP.an_legislacao_zoneamento)
-            .order_by(ZoneamentoSP.an_legislacao_zoneamento.desc())
-        )
+    if stats is None:
+        stats = await _compute_stats()
 
-        anos_result = await db.execute(anos_query)
-        anos = [{"ano": row[0], "count": row[1]} for row in anos_result.all() if row[0] is not None]
+    total, tipos, anos = stats
 
-        return {
-            "total_poligonos": total,
-            "tipos_zoneamento": tipos,
-            "anos_legislacao": anos,
-            "fonte": "BigQuery - Lei 18.177/2024",
-        }
+    response.headers.update(headers)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao calcular estatísticas: {str(e)}")
+    return {
+        "total_poligonos": total,
+        "tipos_zoneamento": tipos,
+        "anos_legislacao": anos,
+        "fonte": "BigQuery - Lei 18.177/2024",
+    }
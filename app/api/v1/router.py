@@ -5,7 +5,7 @@ Agrega todos os endpoints
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import fibra, linhas, subestacoes, zoneamento_sp
+from app.api.v1.endpoints import camadas, fibra, linhas, subestacoes, zoneamento_sp
 
 api_router = APIRouter()
 
@@ -17,3 +17,5 @@ api_router.include_router(linhas.router, prefix="/linhas", tags=["Linhas de Tran
 api_router.include_router(fibra.router, prefix="/fibra", tags=["Fibra Ótica"])
 
 api_router.include_router(zoneamento_sp.router, prefix="/zoneamento-sp", tags=["Zoneamento SP"])
+
+api_router.include_router(camadas.router, prefix="/camadas", tags=["Camadas"])
@@ -4,7 +4,7 @@ Carrega variáveis de ambiente do arquivo .env
 """
 
 import json
-from typing import List
+from typing import List, Optional
 
 from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -33,9 +33,22 @@ class Settings(BaseSettings):
         return self
 
     MAX_CONNECTIONS_POOL: int = 20
+    POOL_RECYCLE_SECONDS: int = 3600
+    # Cache de prepared statements por conexão (asyncpg)
+    DB_STATEMENT_CACHE_SIZE: int = 1024
+    # Cache de SQL compilado do SQLAlchemy (formatos de query distintos)
+    DB_QUERY_CACHE_SIZE: int = 1200
+    # Tempo máximo (segundos) de cada comando no banco
+    DB_COMMAND_TIMEOUT: int = 30
+    # Conexão via PgBouncer (pool_mode = transaction): desativa o pool local
+    DB_PGBOUNCER: bool = False
 
     # Security
     SECRET_KEY: str
+    # Chaves anteriores (rotação): usadas apenas para descriptografar dados antigos
+    PREVIOUS_SECRET_KEYS: List[str] = []
+    # Entradas do cache de decrypt em memória (0 = desativado; guarda dados em claro)
+    DECRYPT_CACHE_SIZE: int = 0
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
@@ -66,6 +79,10 @@ class Settings(BaseSettings):
     CACHE_TTL: int = 300
     ENABLE_REDIS_CACHE: bool = False
     REDIS_URL: str = "redis://localhost:6379/0"
+    # Compressão das respostas na API (desativar quando o proxy reverso comprime)
+    ENABLE_COMPRESSION: bool = True
+    # Storage dos contadores de rate limit (padrão: REDIS_URL em produção)
+    RATE_LIMIT_STORAGE_URL: Optional[str] = None
 
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -0,0 +1,180 @@
+"""
+Cache de respostas GeoJSON - DataZone Energy
+Armazena no Redis os payloads prontos das consultas de camadas
+"""
+
+import hashlib
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.logging import app_logger as logger
+
+# Cliente Redis compartilhado (criado sob demanda)
+_redis: Optional[aioredis.Redis] = None
+
+# Cache HTTP (navegador/CDN) para respostas das camadas
+CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
+# Camadas praticamente estáticas (ex: zoneamento, atualizado apenas por carga)
+STATIC_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+
+# Contadores de escrita da tabela nas estatísticas do PostgreSQL (consulta O(1), sem varrer
+# a tabela); relid muda quando a carga recria a tabela
+LAYER_VERSION_QUERY = text(
+    """
+    SELECT relid, n_tup_ins, n_tup_upd, n_tup_del
+    FROM pg_stat_user_tables
+    WHERE relid = to_regclass(:table_name)
+    """
+)
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """
+    Retorna o cliente Redis, ou None se o cache estiver desabilitado.
+    """
+    global _redis
+
+    if not settings.ENABLE_REDIS_CACHE:
+        return None
+
+    if _redis is None:
+        _redis = aioredis.from_url(settings.REDIS_URL)
+
+    return _redis
+
+
+def make_cache_key(layer: str, params: Iterable[Tuple[str, str]]) -> str:
+    """
+    Monta a chave de cache a partir da camada e dos parâmetros da consulta.
+
+    Args:
+        layer: Nome da camada (ex: fibra, linhas)
+        params: Pares (nome, valor) dos parâmetros da requisição
+
+    Returns:
+        Chave no formato geo:{layer}:{hash}
+    """
+    # Ordenar para que a mesma consulta gere sempre a mesma chave
+    canonical = "&".join(f"{name}={value}" for name, value in sorted(params))
+    digest = hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+    return f"geo:{layer}:{digest}"
+
+
+async def get_layer_version(db: AsyncSession, model) -> str:
+    """
+    Retorna a versão atual dos dados de uma camada (contadores de escrita da tabela).
+
+    Args:
+        db: Sessão do banco
+        model: Modelo SQLAlchemy da camada
+
+    Returns:
+        String que muda sempre que a camada é alterada (vazia se a tabela não existir)
+    """
+    result = await db.execute(LAYER_VERSION_QUERY, {"table_name": model.__table__.fullname})
+    counters = result.first()
+    return ":".join(map(str, counters)) if counters else ""
+
+
+def make_etag(cache_key: str) -> str:
+    """
+    Monta um ETag fraco (W/) a partir da chave de cache versionada.
+    """
+    digest = hashlib.blake2b(cache_key.encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Verifica se o header If-None-Match do cliente corresponde ao ETag atual.
+    """
+    if not if_none_match:
+        return False
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def get_cached(key: str) -> Optional[bytes]:
+    """
+    Busca um payload no cache. Falhas do Redis são tratadas como cache miss.
+    """
+    redis = get_redis()
+    if redis is None:
+        return None
+
+    try:
+        return await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"Cache indisponível, ignorando leitura: {e}")
+        return None
+
+
+async def set_cached(key: str, payload: bytes, ttl: int = settings.CACHE_TTL) -> None:
+    """
+    Grava um payload no cache com expiração (segundos).
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    try:
+        await redis.set(key, payload, ex=ttl)
+    except RedisError as e:
+        logger.warning(f"Cache indisponível, ignorando escrita: {e}")
+
+
+async def cache_stream(key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Repassa um stream de resposta e grava o payload completo no cache ao final.
+
+    Args:
+        key: Chave de cache
+        chunks: Stream com as partes da resposta
+
+    Yields:
+        As mesmas partes recebidas
+    """
+    if get_redis() is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+
+    await set_cached(key, b"".join(parts))
+
+
+async def invalidate_layer(layer: str) -> None:
+    """
+    Remove do cache todas as respostas de uma camada (usar após ingestões).
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    try:
+        async for key in redis.scan_iter(match=f"geo:{layer}:*"):
+            await redis.delete(key)
+    except RedisError as e:
+        logger.warning(f"Cache indisponível, não foi possível invalidar '{layer}': {e}")
+
+
+async def close_cache() -> None:
+    """
+    Fecha a conexão com o Redis
+    """
+    global _redis
+
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -4,9 +4,10 @@ Suporte para conexões síncronas e assíncronas
 """
 
 from typing import AsyncGenerator
+from uuid import uuid4
 
 from geoalchemy2 import Geometry
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import NullPool
@@ -39,6 +40,7 @@ sync_engine = create_engine(
     pool_pre_ping=True,
     pool_size=settings.MAX_CONNECTIONS_POOL,
     max_overflow=10,
+    pool_recycle=settings.POOL_RECYCLE_SECONDS,
     echo=False,  # SEGURANÇA: Nunca logar SQL queries
 )
 
@@ -49,12 +51,39 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
 # ============================================
 # Engine Assíncrono (para API)
 # ============================================
+if settings.DB_PGBOUNCER:
+    # PgBouncer em modo transaction: sem pool local (o PgBouncer multiplexa as
+    # conexões) e sem cache de prepared statements, que não sobrevivem à troca de backend
+    _async_pool_args = {"poolclass": NullPool}
+    _connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        # Nomes únicos: os prepared statements do dialeto não colidem entre backends
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        # Sem server_settings: o PgBouncer rejeita parâmetros de startup desconhecidos
+        # (jit desligado no próprio banco, ver init_db.sql)
+    }
+else:
+    _async_pool_args = {
+        "pool_pre_ping": True,
+        "pool_size": settings.MAX_CONNECTIONS_POOL,
+        "max_overflow": 10,
+        "pool_recycle": settings.POOL_RECYCLE_SECONDS,
+    }
+    # Reutilizar os planos das queries parametrizadas dos endpoints
+    _connect_args = {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        # Queries curtas: o custo de compilação do JIT não compensa
+        "server_settings": {"jit": "off"},
+    }
+
 async_engine = create_async_engine(
     ASYNC_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=settings.MAX_CONNECTIONS_POOL,
-    max_overflow=10,
+    **_async_pool_args,
     echo=False,  # SEGURANÇA: Nunca logar SQL queries
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    connect_args={**_connect_args, "command_timeout": settings.DB_COMMAND_TIMEOUT},
 )
 
 # Session assíncrona
@@ -128,8 +157,6 @@ def check_db_connection() -> bool:
     Verifica se a conexão com o banco está funcionando
     """
     try:
-        from sqlalchemy import text
-
         with sync_engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         return True
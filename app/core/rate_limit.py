@@ -4,6 +4,7 @@ Proteção contra DDoS e uso abusivo da API
 """
 
 from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
 from slowapi import Limiter
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
@@ -68,9 +69,7 @@ def custom_rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded)
     )
 
     # Retornar resposta customizada
-    from fastapi.responses import JSONResponse
-
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=429,
         content={
             "error": "Rate limit exceeded",
@@ -89,13 +88,34 @@ def custom_rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded)
 # Configurar Limiter
 # ============================================
 
+
+def get_rate_limit_storage_uri() -> str:
+    """
+    Define onde os contadores de rate limit são armazenados.
+
+    Em memória cada worker conta separadamente (o cliente recebe o limite
+    multiplicado pelo número de workers); com Redis o limite é compartilhado.
+
+    Returns:
+        URI do storage (Redis em produção ou com cache habilitado, senão memória)
+    """
+    if settings.RATE_LIMIT_STORAGE_URL:
+        return settings.RATE_LIMIT_STORAGE_URL
+
+    if settings.ENABLE_REDIS_CACHE or settings.ENVIRONMENT == "production":
+        return settings.REDIS_URL
+
+    return "memory://"
+
+
 # Criar instância do limiter
 limiter = Limiter(
     key_func=get_client_identifier,
     default_limits=[],  # Sem limites padrão, definir por rota
-    storage_uri=settings.REDIS_URL if settings.ENABLE_REDIS_CACHE else "memory://",
-    strategy="fixed-window",  # Estratégia de janela fixa
+    storage_uri=get_rate_limit_storage_uri(),
+    strategy="moving-window",  # Janela deslizante (sem rajadas na virada da janela)
     headers_enabled=True,  # Adicionar headers de rate limit nas respostas
+    in_memory_fallback_enabled=True,  # Redis indisponível: contar em memória
 )
 
 
@@ -187,8 +207,6 @@ class RateLimitMiddleware:
             return
 
         # Criar Request object
-        from fastapi import Request
-
         request = Request(scope, receive)
 
         # Aplicar rate limiting global
@@ -4,16 +4,175 @@ Implementa criptografia, sanitização e proteção contra ataques
 """
 
 import base64
+import hashlib
+import hmac
 import os
 import re
-from typing import Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from itertools import chain
+from typing import Any, List, Optional, Sequence, Tuple
 
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import numpy as np
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from app.config import settings
 
+try:
+    from numba import njit
+except ImportError:  # Numba é opcional: sem ele, o arredondamento roda em NumPy puro
+    njit = None
+
+try:
+    import re2
+except ImportError:  # google-re2 é opcional: sem ele, usa o módulo re
+    re2 = None
+
+# Derivação da chave de criptografia (PBKDF2-HMAC-SHA256)
+KDF_SALT = b"datazone_energy_salt"  # Em produção, usar salt único e seguro
+KDF_ITERATIONS = 600000
+# Iterações usadas até a versão anterior (mantidas para descriptografar dados antigos)
+LEGACY_KDF_ITERATIONS = 100000
+
+# AES-GCM: nonce de 96 bits e rótulo que separa a chave AES da chave Fernet
+AEAD_NONCE_SIZE = 12
+AEAD_KEY_INFO = b"datazone_energy_aesgcm"
+# Início de todo token Fernet (versão 0x80) já em base64
+FERNET_TOKEN_PREFIX = "gAAAAA"
+# Tokens maiores que isso não entram no cache de decrypt (limita a memória usada)
+DECRYPT_CACHE_MAX_TOKEN = 4096
+
+# Sequências removidas por sanitize_sql_input (sem diferenciar maiúsculas).
+# Com google-re2 instalado, a busca roda em um DFA de tempo linear.
+SQL_DANGER_RE = (re2 or re).compile(r"(?i);|--|/\*|\*/|xp_|sp_|EXEC(?:UTE)?")
+SQL_INPUT_MAX_LENGTH = 1000
+
+# Bounding box: quatro números decimais separados por vírgula
+_NUMBER = r"\s*(-?\d+(?:\.\d+)?)\s*"
+BBOX_RE = re.compile(rf"^{_NUMBER},{_NUMBER},{_NUMBER},{_NUMBER}$")
+# Limites aceitos por validate_bbox (graus)
+BBOX_LON_RANGE = (-180.0, 180.0)
+BBOX_LAT_RANGE = (-90.0, 90.0)
+BBOX_MAX_SPAN = 10.0
+
+# Arredondamento vetorizado de coordenadas: casas decimais aceitas (10**p exato em float64),
+# distância mínima de x.5 e módulo máximo do valor escalado fora dos quais vale o round()
+ROUND_MAX_PRECISION = 15
+ROUND_TIE_TOLERANCE = 1e-6
+ROUND_EXACT_LIMIT = 2.0**40
+
+# Campos sensíveis que nunca devem ser expostos
+SENSITIVE_FIELDS = frozenset(
+    {
+        "password",
+        "senha",
+        "token",
+        "secret",
+        "api_key",
+        "created_at",
+        "updated_at",
+        "data_source",  # Metadados internos
+    }
+)
+
+
+def parse_bbox(bbox: str) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Converte a string de bounding box em coordenadas
+
+    Args:
+        bbox: String no formato min_lon,min_lat,max_lon,max_lat
+
+    Returns:
+        Tupla (min_lon, min_lat, max_lon, max_lat), ou None se o formato for inválido
+    """
+    match = BBOX_RE.match(bbox)
+    if match is None:
+        return None
+
+    min_lon, min_lat, max_lon, max_lat = map(float, match.groups())
+    return min_lon, min_lat, max_lon, max_lat
+
+
+@lru_cache(maxsize=16)
+def _derive_key(job: Tuple[str, int]) -> bytes:
+    """
+    Deriva uma chave Fernet (base64) a partir de (segredo, iterações)
+    """
+    secret, iterations = job
+    # hashlib usa a implementação em C do OpenSSL (mesma saída do PBKDF2HMAC)
+    raw = hashlib.pbkdf2_hmac("sha256", secret.encode(), KDF_SALT, iterations, 32)
+    return base64.urlsafe_b64encode(raw)
+
+
+def derive_keys(jobs: Sequence[Tuple[str, int]]) -> List[bytes]:
+    """
+    Deriva várias chaves em paralelo
+
+    O pbkdf2_hmac do hashlib libera o GIL durante o cálculo, então as
+    derivações escalam com threads.
+
+    Args:
+        jobs: Pares (segredo, iterações)
+
+    Returns:
+        Chaves Fernet (base64), na mesma ordem de jobs
+    """
+    if len(jobs) <= 1:
+        return [_derive_key(job) for job in jobs]
+
+    with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+        return list(pool.map(_derive_key, jobs))
+
+
+@lru_cache(maxsize=4)
+def _derive_fernet(secret: str, previous: Tuple[str, ...] = ()) -> MultiFernet:
+    """
+    Monta o Fernet da aplicação a partir do segredo atual e dos anteriores
+
+    A primeira chave (segredo atual, KDF_ITERATIONS) criptografa; as demais
+    só descriptografam dados gerados com iterações ou segredos antigos. A
+    derivação é cara e o resultado é reaproveitado por todas as instâncias
+    de SecurityManager com os mesmos segredos.
+
+    Args:
+        secret: Segredo da aplicação (SECRET_KEY)
+        previous: Segredos anteriores (PREVIOUS_SECRET_KEYS)
+
+    Returns:
+        MultiFernet pronto para uso
+    """
+    jobs = [(secret, KDF_ITERATIONS), (secret, LEGACY_KDF_ITERATIONS)]
+    for old_secret in previous:
+        jobs += [(old_secret, KDF_ITERATIONS), (old_secret, LEGACY_KDF_ITERATIONS)]
+
+    return MultiFernet([Fernet(key) for key in derive_keys(jobs)])
+
+
+@lru_cache(maxsize=4)
+def _derive_aead(secret: str, previous: Tuple[str, ...] = ()) -> Tuple[AESGCM, ...]:
+    """
+    Monta as cifras AES-GCM da aplicação a partir do segredo atual e dos anteriores
+
+    Reaproveita a derivação PBKDF2 (KDF_ITERATIONS) já feita para o Fernet e
+    separa a chave AES com um HMAC sobre AEAD_KEY_INFO. A primeira cifra
+    criptografa; as demais só descriptografam.
+
+    Args:
+        secret: Segredo da aplicação (SECRET_KEY)
+        previous: Segredos anteriores (PREVIOUS_SECRET_KEYS)
+
+    Returns:
+        Cifras AES-GCM, da chave atual para as anteriores
+    """
+    ciphers = []
+    for key in derive_keys([(s, KDF_ITERATIONS) for s in (secret, *previous)]):
+        raw = base64.urlsafe_b64decode(key)
+        ciphers.append(AESGCM(hmac.new(raw, AEAD_KEY_INFO, hashlib.sha256).digest()))
+    return tuple(ciphers)
+
 
 class SecurityManager:
     """Gerenciador de segurança da aplicação"""
@@ -21,35 +180,44 @@ class SecurityManager:
     def __init__(self):
         """Inicializa o gerenciador de segurança"""
         self._fernet = None
+        self._aeads = ()
+        self._encrypt = None
+        self._decrypt_cached = None
         self._init_encryption()
 
     def _init_encryption(self):
         """Inicializa sistema de criptografia"""
-        # Derivar chave de criptografia a partir da SECRET_KEY
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b"datazone_energy_salt",  # Em produção, usar salt único e seguro
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(settings.SECRET_KEY.encode()))
-        self._fernet = Fernet(key)
+        # Derivar chaves de criptografia a partir da SECRET_KEY (cacheadas por chave)
+        previous = tuple(settings.PREVIOUS_SECRET_KEYS)
+        # Fernet (AES-CBC + HMAC) só descriptografa dados gravados antes do AES-GCM
+        self._fernet = _derive_fernet(settings.SECRET_KEY, previous)
+        self._aeads = _derive_aead(settings.SECRET_KEY, previous)
+        # Método ligado da cifra atual (evita lookups no caminho quente)
+        self._encrypt = self._aeads[0].encrypt
+
+        # Cache token -> texto (opcional: mantém dados em claro na memória)
+        if settings.DECRYPT_CACHE_SIZE > 0:
+            self._decrypt_cached = lru_cache(maxsize=settings.DECRYPT_CACHE_SIZE)(self._decrypt_str)
+
+    def clear_decrypt_cache(self):
+        """Descarta o cache de decrypt (ex: após rotação de chaves)"""
+        if self._decrypt_cached is not None:
+            self._decrypt_cached.cache_clear()
 
     def encrypt(self, data: str) -> str:
         """
-        Criptografa dados sensíveis
+        Criptografa dados sensíveis com AES-GCM
 
         Args:
             data: Dados a criptografar
 
         Returns:
-            Dados criptografados em base64
+            Nonce + texto cifrado (com tag) em base64
         """
         if not data:
             return data
 
-        encrypted = self._fernet.encrypt(data.encode())
-        return base64.urlsafe_b64encode(encrypted).decode()
+        return base64.urlsafe_b64encode(self.encrypt_bytes(data.encode())).decode("ascii")
 
     def decrypt(self, encrypted_data: str) -> str:
         """
@@ -65,13 +233,71 @@ class SecurityManager:
             return encrypted_data
 
         try:
-            decoded = base64.urlsafe_b64decode(encrypted_data.encode())
-            decrypted = self._fernet.decrypt(decoded)
-            return decrypted.decode()
+            # Falhas levantam exceção e por isso nunca entram no cache
+            if self._decrypt_cached is not None and len(encrypted_data) <= DECRYPT_CACHE_MAX_TOKEN:
+                return self._decrypt_cached(encrypted_data)
+            return self._decrypt_str(encrypted_data)
         except Exception:
             # Se falhar, retornar vazio (não expor erro)
             return ""
 
+    def _decrypt_str(self, encrypted_data: str) -> str:
+        """
+        Descriptografa um token em texto (levanta exceção se inválido)
+        """
+        # Token Fernet em uma única camada base64 (sem o encode extra da versão antiga)
+        if encrypted_data.startswith(FERNET_TOKEN_PREFIX):
+            try:
+                return self._fernet.decrypt(encrypted_data.encode()).decode()
+            except InvalidToken:
+                pass  # Token AES-GCM que por acaso começa com o prefixo
+
+        # b64decode aceita str ASCII diretamente (sem .encode() intermediário)
+        decoded = base64.urlsafe_b64decode(encrypted_data)
+        return self._decrypt_token(decoded).decode()
+
+    def encrypt_bytes(self, data: bytes) -> bytes:
+        """
+        Criptografa bytes com AES-GCM, sem encode/decode nem base64
+
+        Args:
+            data: Bytes a criptografar
+
+        Returns:
+            Nonce + texto cifrado (com tag)
+        """
+        nonce = os.urandom(AEAD_NONCE_SIZE)
+        return nonce + self._encrypt(nonce, data, None)
+
+    def decrypt_bytes(self, token: bytes) -> bytes:
+        """
+        Descriptografa bytes gerados por encrypt_bytes
+
+        Args:
+            token: Nonce + texto cifrado (com tag)
+
+        Returns:
+            Bytes originais (vazio se o token for inválido)
+        """
+        try:
+            return self._decrypt_token(token)
+        except Exception:
+            return b""
+
+    def _decrypt_token(self, token: bytes) -> bytes:
+        """
+        Descriptografa um token AES-GCM, com fallback para tokens Fernet antigos
+        """
+        nonce, encrypted = token[:AEAD_NONCE_SIZE], token[AEAD_NONCE_SIZE:]
+        for aead in self._aeads:
+            try:
+                return aead.decrypt(nonce, encrypted, None)
+            except InvalidTag:
+                continue
+
+        # Dados gravados antes do AES-GCM
+        return self._fernet.decrypt(token)
+
     @staticmethod
     def sanitize_sql_input(value: Any) -> Any:
         """
@@ -89,15 +315,8 @@ class SecurityManager:
             return None
 
         if isinstance(value, str):
-            # Remover caracteres perigosos
-            dangerous_chars = [";", "--", "/*", "*/", "xp_", "sp_", "EXEC", "EXECUTE"]
-            sanitized = value
-
-            for char in dangerous_chars:
-                sanitized = sanitized.replace(char, "")
-
-            # Limitar tamanho
-            return sanitized[:1000]  # Máximo 1000 caracteres
+            # Remover sequências perigosas (em uma única passada) e depois limitar tamanho
+            return SQL_DANGER_RE.sub("", value)[:SQL_INPUT_MAX_LENGTH]
 
         return value
 
@@ -112,29 +331,18 @@ class SecurityManager:
         Returns:
             GeoJSON sanitizado
         """
-        # Campos sensíveis que nunca devem ser expostos
-        sensitive_fields = [
-            "password",
-            "senha",
-            "token",
-            "secret",
-            "api_key",
-            "created_at",
-            "updated_at",
-            "data_source",  # Metadados internos
-        ]
-
-        if "features" in geojson:
-            for feature in geojson["features"]:
-                if "properties" in feature:
-                    # Remover campos sensíveis
-                    for field in sensitive_fields:
-                        feature["properties"].pop(field, None)
-
-                    # Limitar precisão de coordenadas (anti-tracking)
-                    if "geometry" in feature and "coordinates" in feature["geometry"]:
-                        coords = feature["geometry"]["coordinates"]
-                        feature["geometry"]["coordinates"] = round_coordinates(coords)
+        # Uma única passada por feature: propriedades e coordenadas no mesmo laço
+        for feature in geojson.get("features", ()):
+            # Remover campos sensíveis (só os presentes: uma interseção por feature)
+            props = feature.get("properties")
+            if props:
+                for field in SENSITIVE_FIELDS.intersection(props):
+                    del props[field]
+
+            # Limitar precisão de coordenadas (anti-tracking)
+            geometry = feature.get("geometry")
+            if geometry and "coordinates" in geometry:
+                geometry["coordinates"] = round_coordinates(geometry["coordinates"])
 
         return geojson
 
@@ -152,37 +360,23 @@ class SecurityManager:
         if not bbox_str:
             return False
 
-        try:
-            parts = bbox_str.split(",")
-            if len(parts) != 4:
-                return False
-
-            coords = [float(p) for p in parts]
-            min_lon, min_lat, max_lon, max_lat = coords
-
-            # Validar ranges
-            if not (-180 <= min_lon <= 180):
-                return False
-            if not (-90 <= min_lat <= 90):
-                return False
-            if not (-180 <= max_lon <= 180):
-                return False
-            if not (-90 <= max_lat <= 90):
-                return False
-
-            # Validar lógica
-            if min_lon >= max_lon or min_lat >= max_lat:
-                return False
-
-            # Validar tamanho máximo (prevenir queries muito grandes)
-            if (max_lon - min_lon) > 10 or (max_lat - min_lat) > 10:
-                return False  # Máximo 10 graus
-
-            return True
-
-        except (ValueError, TypeError):
+        # Formato validado pela regex (sem exceções para entrada malformada)
+        coords = parse_bbox(bbox_str)
+        if coords is None:
             return False
 
+        min_lon, min_lat, max_lon, max_lat = coords
+        lon_min, lon_max = BBOX_LON_RANGE
+        lat_min, lat_max = BBOX_LAT_RANGE
+
+        # Ranges, lógica (min < max) e tamanho máximo (prevenir queries muito grandes)
+        return (
+            lon_min <= min_lon < max_lon <= lon_max
+            and lat_min <= min_lat < max_lat <= lat_max
+            and max_lon - min_lon <= BBOX_MAX_SPAN
+            and max_lat - min_lat <= BBOX_MAX_SPAN
+        )
+
     @staticmethod
     def mask_sensitive_data(data: str, show_chars: int = 4) -> str:
         """
@@ -201,6 +395,63 @@ class SecurityManager:
         return f"{data[:show_chars]}...{data[-show_chars:]}"
 
 
+def _round_flat(arr: np.ndarray, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Arredonda um buffer float64 contíguo de coordenadas
+
+    Retorna também a máscara dos valores em que a multiplicação pela escala pode
+    ter mudado o lado do arredondamento (perto de x.5, muito grandes ou não
+    finitos); para eles, o resultado deve vir do round() do Python.
+    """
+    factor = 10.0**precision
+    scaled = arr * factor
+    distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+    exact = (distance > ROUND_TIE_TOLERANCE) & (np.abs(scaled) < ROUND_EXACT_LIMIT)
+    return np.rint(scaled) / factor, ~exact
+
+
+if njit is not None:
+    _round_flat = njit(cache=True)(_round_flat)
+
+
+def _is_numeric_leaf(coords: list) -> bool:
+    """
+    Indica se coords é uma posição ou uma lista de posições (último nível)
+    """
+    first = coords[0]
+    if isinstance(first, list):
+        return bool(first) and isinstance(first[0], (int, float))
+    return isinstance(first, (int, float))
+
+
+def _round_leaf(coords: list, precision: int) -> list:
+    """
+    Arredonda uma posição ou anel ([lon, lat] ou [[lon, lat], ...]) de uma vez
+
+    Mesmo resultado de round() valor a valor: inteiros continuam inteiros e os
+    casos ambíguos indicados por _round_flat são refeitos com round().
+
+    Raises:
+        ValueError: Se o anel for irregular ou tiver valores não numéricos
+    """
+    arr = np.asarray(coords)
+    if arr.dtype.kind in "iu":
+        return arr.tolist()
+    if arr.dtype != np.float64:
+        raise ValueError("coordenadas não numéricas")
+
+    flat = list(chain.from_iterable(coords)) if arr.ndim == 2 else coords
+    with np.errstate(invalid="ignore"):  # inf/nan: marcados como ambíguos
+        values, ambiguous = _round_flat(arr.ravel(), precision)
+    result = values.astype(object)
+    for i in np.flatnonzero(ambiguous):
+        result[i] = round(flat[i], precision)
+    for i, value in enumerate(flat):
+        if isinstance(value, int):
+            result[i] = value
+    return result.reshape(arr.shape).tolist()
+
+
 def round_coordinates(coords: Any, precision: int = 6) -> Any:
     """
     Arredonda coordenadas para limitar precisão
@@ -213,6 +464,12 @@ def round_coordinates(coords: Any, precision: int = 6) -> Any:
         Coordenadas arredondadas
     """
     if isinstance(coords, list):
+        if coords and 0 <= precision <= ROUND_MAX_PRECISION and _is_numeric_leaf(coords):
+            # Posição ou anel inteiro: um único arredondamento vetorizado
+            try:
+                return _round_leaf(coords, precision)
+            except ValueError:
+                pass  # Anel irregular: segue pela recursão
         return [round_coordinates(c, precision) for c in coords]
     elif isinstance(coords, (int, float)):
         return round(coords, precision)
@@ -227,9 +484,14 @@ security = SecurityManager()
 def sanitize_inputs(func):
     """Decorador para sanitizar inputs de funções"""
 
+    @wraps(func)
     def wrapper(*args, **kwargs):
-        # Sanitizar kwargs
-        sanitized_kwargs = {k: security.sanitize_sql_input(v) for k, v in kwargs.items()}
-        return func(*args, **sanitized_kwargs)
+        # Sanitizar kwargs (apenas strings; sem strings, a chamada segue direto)
+        if kwargs and any(isinstance(v, str) for v in kwargs.values()):
+            kwargs = {
+                k: security.sanitize_sql_input(v) if isinstance(v, str) else v
+                for k, v in kwargs.items()
+            }
+        return func(*args, **kwargs)
 
     return wrapper
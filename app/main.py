@@ -3,22 +3,59 @@ DataZone Energy - FastAPI Application
 Ponto de entrada principal da API
 """
 
+import asyncio
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+import orjson
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from slowapi.errors import RateLimitExceeded
+from sqlalchemy.exc import SQLAlchemyError
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli-asgi é opcional; sem ele usamos apenas GZIP
+    BrotliMiddleware = None
 
 from app.api.v1.router import api_router
 from app.config import settings
+from app.core.cache import close_cache
 from app.core.database import check_db_connection, close_db, init_db
 from app.core.logging import app_logger as logger
-from app.core.rate_limit import (
-    custom_rate_limit_exceeded_handler,
-    get_rate_limit_status,
-    limiter,
+from app.core.rate_limit import custom_rate_limit_exceeded_handler, get_rate_limit_status, limiter
+
+# Status do banco reaproveitado entre probes de health check (segundos)
+HEALTH_CACHE_SECONDS = 1.0
+_health_cache = {"ts": float("-inf"), "ok": False}
+
+
+def _health_body(db_status: bool) -> bytes:
+    """Serializa a resposta do health check para um status do banco"""
+    return orjson.dumps(
+        {
+            "status": "healthy" if db_status else "unhealthy",
+            "service": settings.PROJECT_NAME,
+            "version": settings.VERSION,
+            "environment": settings.ENVIRONMENT,
+            "database": "connected" if db_status else "disconnected",
+        }
+    )
+
+
+# Respostas estáticas serializadas uma única vez no import
+HEALTH_OK_JSON = _health_body(True)
+HEALTH_FAIL_JSON = _health_body(False)
+ROOT_JSON = orjson.dumps(
+    {
+        "message": "DataZone Energy API",
+        "version": settings.VERSION,
+        "docs": "/docs",
+        "health": "/health",
+        "rate_limit_status": "/api/v1/rate-limit-status",
+    }
 )
 
 
@@ -50,6 +87,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("🛑 Encerrando DataZone Energy API...")
     await close_db()
+    await close_cache()
     logger.info("✅ Conexões fechadas")
 
 
@@ -63,6 +101,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan,
 )
 
@@ -84,8 +123,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Compressão GZIP
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Compressão Brotli (fallback para GZIP em clientes sem suporte a br).
+# Tiles MVT ficam de fora: já são binários compactos.
+# Com ENABLE_COMPRESSION=False a compressão fica a cargo do proxy reverso.
+if settings.ENABLE_COMPRESSION and BrotliMiddleware is not None:
+    app.add_middleware(
+        BrotliMiddleware,
+        quality=4,
+        minimum_size=1024,
+        gzip_fallback=True,
+        excluded_handlers=[r".*/mvt/.*"],
+    )
+elif settings.ENABLE_COMPRESSION:
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
 
 
 # ============================================
@@ -100,21 +150,19 @@ async def health_check(request: Request):
     """
     Endpoint de health check para monitoramento
     """
-    try:
-        db_status = check_db_connection()
-    except Exception:
-        db_status = False
+    # Rajadas de probes (k8s/load balancer) reaproveitam o último resultado
+    now = time.monotonic()
+    if now - _health_cache["ts"] > HEALTH_CACHE_SECONDS:
+        try:
+            # check_db_connection é síncrono: roda em thread para não bloquear o event loop
+            ok = await asyncio.to_thread(check_db_connection)
+        except Exception:
+            ok = False
+        _health_cache.update(ts=now, ok=ok)
 
-    return JSONResponse(
-        status_code=200 if db_status else 503,
-        content={
-            "status": "healthy" if db_status else "unhealthy",
-            "service": settings.PROJECT_NAME,
-            "version": settings.VERSION,
-            "environment": settings.ENVIRONMENT,
-            "database": "connected" if db_status else "disconnected",
-        },
-    )
+    if _health_cache["ok"]:
+        return Response(content=HEALTH_OK_JSON, media_type="application/json")
+    return Response(content=HEALTH_FAIL_JSON, status_code=503, media_type="application/json")
 
 
 # Root
@@ -124,15 +172,7 @@ async def root(request: Request):
     """
     Endpoint raiz da API
     """
-    return JSONResponse(
-        content={
-            "message": "DataZone Energy API",
-            "version": settings.VERSION,
-            "docs": "/docs",
-            "health": "/health",
-            "rate_limit_status": "/api/v1/rate-limit-status",
-        }
-    )
+    return Response(content=ROOT_JSON, media_type="application/json")
 
 
 # Rate limit status (útil para debug)
@@ -154,13 +194,28 @@ app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 # ============================================
 
 
+@app.exception_handler(SQLAlchemyError)
+async def database_exception_handler(request, exc):
+    """
+    Handler para erros de banco de dados nos endpoints
+    """
+    logger.error(f"Erro de banco de dados em {request.url.path}: {exc}")
+    return ORJSONResponse(
+        status_code=500,
+        content={
+            "detail": "Erro ao consultar o banco de dados",
+            "type": type(exc).__name__,
+        },
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """
     Handler global para exceções não tratadas
     """
     logger.error(f"Erro não tratado: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": "Erro interno do servidor",
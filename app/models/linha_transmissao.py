@@ -29,6 +29,10 @@ class LinhaTransmissao(Base):
     # Geometria (LineString em EPSG:4326)
     geometry = Column(Geometry(geometry_type="LINESTRING", srid=4326), nullable=False)
 
+    # Geometria simplificada pré-calculada (trigger no banco, ver init_db.sql); tipo genérico,
+    # pois a simplificação nem sempre devolve uma LineString
+    geometry_simplified = Column(Geometry(geometry_type="GEOMETRY", srid=4326))
+
     # Metadados
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
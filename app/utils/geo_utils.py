@@ -2,20 +2,37 @@
 Utilitários GIS para conversão de geometrias
 """
 
-import json
-from typing import Any, Dict, List
+from datetime import date, time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 
+import orjson
+from geoalchemy2.functions import ST_Intersects
 from geoalchemy2.shape import to_shape
 from shapely.geometry import mapping
+from sqlalchemy import JSON, Text, and_, cast, func, literal, select
 from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+
+from app.core.database import AsyncSessionLocal
+
+# Linhas buscadas por vez no cursor do servidor ao gerar respostas em streaming
+STREAM_YIELD_PER = 100
+
+# Tiles vetoriais (Mapbox Vector Tile)
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
 
 
 def geometry_to_geojson(geometry) -> Dict[str, Any]:
     """
     Converte geometria GeoAlchemy2 para dict GeoJSON
 
+    Geometrias já convertidas pelo banco (ST_AsGeoJSON, como texto ou json)
+    são usadas diretamente, sem passar pelo Shapely.
+
     Args:
-        geometry: Objeto GeoAlchemy2 Geometry
+        geometry: Objeto GeoAlchemy2 Geometry, ou GeoJSON (str/dict) do ST_AsGeoJSON
 
     Returns:
         Dict com type e coordinates
@@ -23,6 +40,11 @@ def geometry_to_geojson(geometry) -> Dict[str, Any]:
     if geometry is None:
         return None
 
+    if isinstance(geometry, dict):
+        return geometry
+    if isinstance(geometry, str):
+        return orjson.loads(geometry)
+
     # Converter para Shapely geometry
     shape = to_shape(geometry)
 
@@ -41,20 +63,17 @@ def row_to_feature(row: Row, geometry_column: str = "geometry") -> Dict[str, Any
     Returns:
         Dict Feature GeoJSON
     """
-    # Converter row para dict
-    row_dict = dict(row._mapping)
+    columns = row._mapping
 
     # Extrair geometria
-    geometry = row_dict.pop(geometry_column, None)
-    geojson_geometry = geometry_to_geojson(geometry)
+    geojson_geometry = geometry_to_geojson(columns.get(geometry_column))
 
-    # Converter datetime para string ISO
-    properties = {}
-    for key, value in row_dict.items():
-        if hasattr(value, "isoformat"):
-            properties[key] = value.isoformat()
-        else:
-            properties[key] = value
+    # Demais colunas em uma única passada, convertendo datas para string ISO
+    properties = {
+        key: value.isoformat() if isinstance(value, (date, time)) else value
+        for key, value in columns.items()
+        if key != geometry_column
+    }
 
     return {"type": "Feature", "geometry": geojson_geometry, "properties": properties}
 
@@ -77,6 +96,236 @@ def rows_to_feature_collection(
     return {"type": "FeatureCollection", "features": features}
 
 
+def row_to_feature_bytes(row: Row, property_names: Sequence[str]) -> bytes:
+    """
+    Monta o JSON de uma Feature a partir de uma linha com a geometria em GeoJSON
+
+    A geometria (última coluna, saída do ST_AsGeoJSON) é inserida sem ser
+    decodificada; apenas as properties são serializadas.
+
+    Args:
+        row: Linha com as properties seguidas da geometria em GeoJSON
+        property_names: Nomes das properties, na ordem das colunas
+
+    Returns:
+        Bytes do JSON da Feature
+    """
+    geometry_str = row[-1]
+    properties = dict(zip(property_names, row))
+
+    return (
+        b'{"type":"Feature","geometry":'
+        + (geometry_str.encode() if geometry_str else b"null")
+        + b',"properties":'
+        + orjson.dumps(properties, default=float)
+        + b"}"
+    )
+
+
+def bbox_filter(geometry, envelope, bbox_only: bool = False):
+    """
+    Monta o filtro espacial por bounding box
+
+    O operador && garante o uso do índice GIST (teste de MBR). Quando
+    bbox_only é True o refinamento exato com ST_Intersects é omitido,
+    aceitando falsos positivos próximos às bordas do envelope.
+
+    Args:
+        geometry: Coluna de geometria do modelo
+        envelope: Envelope (ST_MakeEnvelope) da bounding box
+        bbox_only: Usar apenas o teste de bounding box
+
+    Returns:
+        Expressão SQLAlchemy para usar em query.where()
+    """
+    mbr = geometry.op("&&")(envelope)
+    if bbox_only:
+        return mbr
+
+    return and_(mbr, ST_Intersects(geometry, envelope))
+
+
+def _feature_object(t, geometry_column: str):
+    """
+    Expressão json_build_object de uma Feature a partir de uma subquery
+    """
+    return func.json_build_object(
+        literal("type"),
+        literal("Feature"),
+        literal("geometry"),
+        cast(t.c[geometry_column], JSON),
+        literal("properties"),
+        func.to_jsonb(t.table_valued()).op("-")(literal(geometry_column)),
+    )
+
+
+def feature_query(
+    query: Select, geometry_column: str = "geometry", id_column: Optional[str] = None
+) -> Select:
+    """
+    Envolve uma query em um SELECT que monta cada Feature no PostgreSQL
+
+    Args:
+        query: Query com as colunas de propriedades e a geometria em GeoJSON
+        geometry_column: Nome (label) da coluna de geometria
+        id_column: Coluna de ordenação retornada junto com a Feature (opcional)
+
+    Returns:
+        Query que retorna um texto JSON de Feature por linha
+    """
+    t = query.subquery("t")
+    stmt = select(cast(_feature_object(t, geometry_column), Text))
+
+    if id_column:
+        stmt = stmt.add_columns(t.c[id_column]).order_by(t.c[id_column])
+
+    return stmt.select_from(t)
+
+
+def feature_collection_query(query: Select, geometry_column: str = "geometry") -> Select:
+    """
+    Envolve uma query em um SELECT que monta a FeatureCollection no PostgreSQL
+
+    A query interna deve retornar a geometria já convertida com ST_AsGeoJSON.
+    As demais colunas viram as properties de cada Feature, evitando o
+    processamento linha a linha em Python.
+
+    Args:
+        query: Query com as colunas de propriedades e a geometria em GeoJSON
+        geometry_column: Nome (label) da coluna de geometria
+
+    Returns:
+        Query que retorna um único texto JSON com a FeatureCollection
+    """
+    t = query.subquery("t")
+    feature = _feature_object(t, geometry_column)
+
+    return select(
+        cast(
+            func.json_build_object(
+                literal("type"),
+                literal("FeatureCollection"),
+                literal("features"),
+                func.coalesce(func.json_agg(feature), cast(literal("[]"), JSON)),
+            ),
+            Text,
+        )
+    ).select_from(t)
+
+
+async def stream_feature_collection(
+    query: Select,
+    geometry_column: str = "geometry",
+    id_column: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Executa a query e retorna a FeatureCollection em partes, lidas por cursor no servidor
+
+    A query é executada (até a primeira Feature) antes do retorno: falhas do banco
+    acontecem antes de o StreamingResponse enviar o status 200 e chegam aos handlers
+    de exceção da API. Usa uma sessão própria, fechada ao fim do stream: o
+    StreamingResponse é consumido depois que as dependências do FastAPI (get_db)
+    já foram finalizadas.
+
+    Args:
+        query: Query com as colunas de propriedades e a geometria em GeoJSON
+        geometry_column: Nome (label) da coluna de geometria
+        id_column: Coluna usada na paginação por cursor; quando informada, a
+            resposta inclui next_cursor com o último valor retornado
+        metadata: Metadados incluídos ao final da resposta, acrescidos de count
+            (número de Features enviadas)
+
+    Returns:
+        Iterador assíncrono com os bytes do JSON da FeatureCollection
+    """
+    stmt = feature_query(query, geometry_column, id_column).execution_options(
+        yield_per=STREAM_YIELD_PER
+    )
+
+    session = AsyncSessionLocal()
+    try:
+        rows = await session.stream(stmt)
+        first = await rows.fetchone()
+    except BaseException:
+        await session.close()
+        raise
+
+    return _feature_collection_chunks(session, rows, first, id_column, metadata)
+
+
+async def _feature_collection_chunks(
+    session, rows, first, id_column: Optional[str], metadata: Optional[Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """
+    Gera os bytes da FeatureCollection a partir do resultado já aberto
+    """
+    async with session:
+        yield b'{"type":"FeatureCollection","features":['
+        last_id = None
+        count = 0
+        if first is not None:
+            yield first[0].encode()
+            count = 1
+            if id_column:
+                last_id = first[1]
+            async for row in rows:
+                yield b"," + row[0].encode()
+                count += 1
+                if id_column:
+                    last_id = row[1]
+
+        tail = b"]"
+        if id_column:
+            tail += b',"next_cursor":' + orjson.dumps(last_id)
+        if metadata is not None:
+            tail += b',"metadata":' + orjson.dumps({**metadata, "count": count})
+        yield tail + b"}"
+
+
+def mvt_tile_query(
+    columns: Sequence,
+    geometry,
+    layer_name: str,
+    z: int,
+    x: int,
+    y: int,
+    extent: int = MVT_EXTENT,
+    buffer: int = MVT_BUFFER,
+) -> Select:
+    """
+    Monta a query de um tile vetorial (Mapbox Vector Tile) com ST_AsMVT
+
+    O recorte e a quantização das geometrias são feitos pelo PostGIS; o
+    filtro && usa o índice GIST com o envelope do tile em EPSG:4326.
+
+    Args:
+        columns: Colunas exportadas como atributos das features
+        geometry: Coluna de geometria (EPSG:4326)
+        layer_name: Nome da camada dentro do tile
+        z, x, y: Coordenadas do tile (esquema XYZ)
+        extent: Resolução do tile em unidades internas
+        buffer: Margem em unidades internas para evitar cortes nas bordas
+
+    Returns:
+        Query que retorna os bytes do tile (bytea)
+    """
+    tile = func.ST_TileEnvelope(z, x, y)
+
+    q = (
+        select(
+            *columns,
+            func.ST_AsMVTGeom(func.ST_Transform(geometry, 3857), tile, extent, buffer, True).label(
+                "geom"
+            ),
+        )
+        .where(geometry.op("&&")(func.ST_Transform(tile, 4326)))
+        .subquery("q")
+    )
+
+    return select(func.ST_AsMVT(q.table_valued(), layer_name, extent, "geom")).select_from(q)
+
+
 def simplify_geometry_query(tolerance: float = 0.001) -> str:
     """
     Retorna SQL para simplificar geometrias usando ST_Simplify
@@ -0,0 +1,115 @@
+"""
+Utilitários compartilhados pelos scripts de ETL
+Inserção via COPY, leitura Arrow do GDAL e comandos fora de transação
+"""
+
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+try:
+    import pyarrow  # noqa: F401
+    import pyogrio
+
+    # Leitura colunar (Arrow) do GDAL: exige GDAL >= 3.6
+    USE_ARROW = pyogrio.__gdal_version__ >= (3, 6, 0)
+except ImportError:
+    USE_ARROW = False
+
+# Marcador de nulo no COPY (distinto da string vazia, que segue como texto vazio)
+COPY_NULL = r"\N"
+
+# Memória de ordenação e workers paralelos por construção de índice (limites da sessão,
+# multiplicados pelo número de índices construídos ao mesmo tempo)
+MAINTENANCE_WORK_MEM = os.getenv("ETL_MAINTENANCE_WORK_MEM", "256MB")
+PARALLEL_MAINTENANCE_WORKERS = int(os.getenv("ETL_PARALLEL_MAINTENANCE_WORKERS", "2"))
+# Construções de índice simultâneas, cada uma em sua própria conexão
+INDEX_BUILD_WORKERS = int(os.getenv("ETL_INDEX_BUILD_WORKERS", "2"))
+
+
+def copy_rows(cursor, table_name: str, columns, rows) -> None:
+    """
+    Envia linhas com COPY FROM STDIN (CSV), sem INSERTs nem bind de parâmetros
+
+    None vira NULL (marcador COPY_NULL); strings vazias seguem como texto vazio.
+
+    Args:
+        cursor: Cursor psycopg2
+        table_name: Nome da tabela destino, já qualificado (ex: geo.tabela)
+        columns: Nomes das colunas
+        rows: Iterável com as linhas (tuplas na ordem de columns)
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [COPY_NULL if value is None else value for value in row] for row in rows
+    )
+    buffer.seek(0)
+
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    cursor.copy_expert(
+        f"COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT CSV, NULL '{COPY_NULL}')",
+        buffer,
+    )
+
+
+def copy_insert(table, conn, keys, data_iter):
+    """
+    Método de inserção do DataFrame.to_sql usando COPY FROM STDIN
+
+    O COPY não passa pelo parser de SQL nem pelo bind de parâmetros do
+    SQLAlchemy, ao contrário dos INSERTs em lote (method="multi"). Geometrias
+    vão como EWKB hexadecimal, lido diretamente pelo PostGIS.
+
+    Args:
+        table: Tabela do pandas (pandas.io.sql.SQLTable)
+        conn: Conexão SQLAlchemy
+        keys: Nomes das colunas
+        data_iter: Iterador com as linhas do chunk (nulos já convertidos em None)
+    """
+    table_name = f'"{table.schema}"."{table.name}"' if table.schema else f'"{table.name}"'
+
+    with conn.connection.cursor() as cursor:
+        copy_rows(cursor, table_name, keys, data_iter)
+
+
+def execute_autocommit(engine: Engine, statement: str) -> None:
+    """
+    Executa um comando em sua própria conexão, fora de transação (ex: CREATE INDEX)
+
+    Args:
+        engine: Engine SQLAlchemy do PostgreSQL
+        statement: Comando SQL
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Ordenação do índice em memória e workers paralelos na construção
+        conn.execute(
+            text("SELECT set_config('maintenance_work_mem', :value, false)"),
+            {"value": MAINTENANCE_WORK_MEM},
+        )
+        conn.execute(
+            text("SELECT set_config('max_parallel_maintenance_workers', :value, false)"),
+            {"value": str(PARALLEL_MAINTENANCE_WORKERS)},
+        )
+        conn.execute(text(statement))
+
+
+def execute_parallel(engine: Engine, statements) -> None:
+    """
+    Executa comandos em paralelo, cada um em sua própria conexão fora de transação
+
+    O ShareLock do CREATE INDEX é compatível consigo mesmo (e com leituras), ao
+    contrário do CONCURRENTLY, cujas construções na mesma tabela seriam executadas
+    em fila. O paralelismo é limitado por INDEX_BUILD_WORKERS, já que cada
+    construção reserva até MAINTENANCE_WORK_MEM no servidor.
+
+    Args:
+        engine: Engine SQLAlchemy do PostgreSQL
+        statements: Comandos SQL (ex: CREATE INDEX)
+    """
+    with ThreadPoolExecutor(max_workers=max(1, INDEX_BUILD_WORKERS)) as pool:
+        list(pool.map(partial(execute_autocommit, engine), statements))
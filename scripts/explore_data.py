@@ -3,16 +3,39 @@ Script helper para explorar arquivos GDB e CSV
 Use este script para descobrir a estrutura dos seus arquivos antes de processar
 """
 
+import codecs
+import csv
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional, Tuple
 
-import fiona
-import geopandas as gpd
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyogrio
+
+try:
+    from chardet.universaldetector import UniversalDetector
+except ImportError:  # chardet é opcional: sem ele, o encoding é achado por tentativa
+    UniversalDetector = None
 
 # Adicionar diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from scripts.etl_utils import USE_ARROW
+
+# CSV: amostra usada na detecção de formato e bytes por bloco nas estatísticas
+CSV_SAMPLE_BYTES = 65536
+CSV_BLOCK_SIZE = 16 << 20
+CSV_ENCODINGS = ["utf-8", "latin-1", "iso-8859-1", "cp1252"]
+CSV_SEPARATORS = ",;\t|"
+
+# Nomes (minúsculos) reconhecidos como colunas de coordenadas, em ordem de preferência
+LAT_COLUMNS = ("latitude", "lat", "y", "coord_y")
+LON_COLUMNS = ("longitude", "lon", "long", "x", "coord_x")
+
 
 def explore_gdb(gdb_path: str):
     """
@@ -33,7 +56,7 @@ def explore_gdb(gdb_path: str):
 
     try:
         # Listar camadas
-        layers = fiona.listlayers(str(gdb_path))
+        layers = [name for name, _ in pyogrio.list_layers(str(gdb_path))]
         print(f"\n📁 Camadas disponíveis ({len(layers)}):")
         for i, layer in enumerate(layers, 1):
             print(f"  {i}. {layer}")
@@ -45,18 +68,23 @@ def explore_gdb(gdb_path: str):
             print("=" * 80)
 
             try:
-                gdf = gpd.read_file(gdb_path, layer=layer, rows=5)
+                # Metadados via GDAL (contagem sem ler os registros)
+                info = pyogrio.read_info(str(gdb_path), layer=layer)
+                gdf = pyogrio.read_dataframe(
+                    gdb_path, layer=layer, max_features=5, use_arrow=USE_ARROW
+                )
 
                 print(f"\n📊 Informações:")
-                print(f"  - Total de registros: {len(gpd.read_file(gdb_path, layer=layer))}")
-                print(f"  - Tipo de geometria: {gdf.geometry.type.unique().tolist()}")
-                print(f"  - CRS: {gdf.crs}")
+                print(f"  - Total de registros: {info['features']}")
+                print(f"  - Tipo de geometria: {info['geometry_type']}")
+                print(f"  - CRS: {info['crs']}")
 
-                print(f"\n📋 Colunas ({len(gdf.columns)}):")
-                for col in gdf.columns:
-                    dtype = gdf[col].dtype
-                    non_null = gdf[col].notna().sum()
-                    print(f"  - {col:30} | Tipo: {dtype:15} | Não-nulos: {non_null}/5")
+                # Metadados das colunas em uma única passada vetorizada
+                columns = dict(zip(gdf.columns, zip(gdf.dtypes, gdf.notna().sum())))
+
+                print(f"\n📋 Colunas ({len(columns)}):")
+                for col, (dtype, non_null) in columns.items():
+                    print(f"  - {col:30} | Tipo: {str(dtype):15} | Não-nulos: {non_null}/5")
 
                 print(f"\n🔍 Primeiros 3 registros:")
                 print(gdf.head(3).to_string())
@@ -68,6 +96,53 @@ def explore_gdb(gdb_path: str):
         print(f"❌ Erro ao explorar GDB: {e}")
 
 
+def detect_csv_format(csv_path: Path) -> Optional[Tuple[str, str]]:
+    """
+    Detecta encoding e separador a partir de uma amostra do início do arquivo
+
+    Args:
+        csv_path: Caminho para o arquivo CSV
+
+    Returns:
+        Tupla (encoding, separador), ou None se não for possível detectar
+    """
+    with csv_path.open("rb") as f:
+        sample = f.read(CSV_SAMPLE_BYTES)
+
+    # Palpite estatístico do chardet primeiro (distingue cp1252 de latin-1, por exemplo);
+    # ASCII vira UTF-8, que o contém e aceita acentos além da amostra
+    encodings = CSV_ENCODINGS
+    if UniversalDetector is not None:
+        detector = UniversalDetector()
+        detector.feed(sample)
+        detector.close()
+        guess = detector.result["encoding"]
+        if guess:
+            encodings = ["utf-8" if guess.lower() == "ascii" else guess, *CSV_ENCODINGS]
+
+    for encoding in encodings:
+        try:
+            # Decoder incremental: tolera um caractere multibyte cortado no fim da amostra
+            text = codecs.getincrementaldecoder(encoding)().decode(sample)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        return None
+
+    # Descartar a última linha da amostra (possivelmente incompleta)
+    lines = text.splitlines()
+    if len(sample) == CSV_SAMPLE_BYTES and len(lines) > 1:
+        lines = lines[:-1]
+
+    try:
+        dialect = csv.Sniffer().sniff("\n".join(lines), delimiters=CSV_SEPARATORS)
+    except csv.Error:
+        return None
+
+    return encoding, dialect.delimiter
+
+
 def explore_csv(csv_path: str):
     """
     Explora estrutura de arquivo CSV
@@ -86,69 +161,97 @@ def explore_csv(csv_path: str):
         return
 
     try:
-        # Tentar diferentes encodings e separadores
-        encodings = ["utf-8", "latin-1", "iso-8859-1", "cp1252"]
-        separators = [",", ";", "\t", "|"]
-
-        df = None
-        used_encoding = None
-        used_separator = None
-
-        for encoding in encodings:
-            for sep in separators:
-                try:
-                    df = pd.read_csv(csv_path, encoding=encoding, sep=sep, nrows=5)
-                    if len(df.columns) > 1:  # Verificar se separador está correto
-                        used_encoding = encoding
-                        used_separator = sep
-                        break
-                except:
-                    continue
-            if df is not None:
-                break
-
-        if df is None:
+        # Detectar encoding e separador pela amostra (sem ler o arquivo inteiro)
+        csv_format = detect_csv_format(csv_path)
+
+        if csv_format is None:
             print("❌ Não foi possível ler o arquivo")
             return
 
+        used_encoding, used_separator = csv_format
+
         print(f"\n✅ Arquivo lido com:")
         print(f"  - Encoding: {used_encoding}")
         print(f"  - Separador: '{used_separator}'")
 
-        # Ler arquivo completo para estatísticas
-        df_full = pd.read_csv(csv_path, encoding=used_encoding, sep=used_separator)
+        read_options = pa_csv.ReadOptions(encoding=used_encoding, block_size=CSV_BLOCK_SIZE)
+        parse_options = pa_csv.ParseOptions(delimiter=used_separator)
+
+        # Tipos inferidos pelo parser do Arrow apenas no primeiro bloco (exibição e amostra)
+        preview = pa_csv.open_csv(csv_path, read_options=read_options, parse_options=parse_options)
+        schema = preview.schema
+        first_batch = next(iter(preview), None)
+
+        if first_batch is None:
+            print("❌ Arquivo sem registros")
+            return
+
+        df = first_batch.slice(0, 5).to_pandas(types_mapper=pd.ArrowDtype)
+
+        # Verificar se tem coordenadas (busca por nome minúsculo em um dict)
+        columns_lower = {name.lower(): name for name in reversed(schema.names)}
+        lat_col = next((columns_lower[c] for c in LAT_COLUMNS if c in columns_lower), None)
+        lon_col = next((columns_lower[c] for c in LON_COLUMNS if c in columns_lower), None)
+
+        # Estatísticas em uma única passada por blocos, com as colunas lidas como texto
+        # (sem inferência de tipos; células vazias contam como nulas)
+        convert_options = pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in schema.names},
+            strings_can_be_null=True,
+        )
+        reader = pa_csv.open_csv(
+            csv_path,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        )
+
+        total = 0
+        non_null = dict.fromkeys(schema.names, 0)
+        uniques = {name: [] for name in schema.names}
+        with_coords = 0
+
+        # Não-nulos vêm do bitmap de validade (contagem pronta, sem varrer a coluna);
+        # únicos em uma passada de hash por coluna, com as colunas em paralelo
+        # (os kernels do Arrow liberam o GIL)
+        with ThreadPoolExecutor() as pool:
+            for batch in reader:
+                total += batch.num_rows
+                batch_uniques = pool.map(pc.unique, batch.columns)
+                for name, column, unique in zip(schema.names, batch.columns, batch_uniques):
+                    non_null[name] += len(column) - column.null_count
+                    uniques[name].append(unique)
+
+                if lat_col and lon_col:
+                    has_coords = pc.and_(pc.is_valid(batch[lat_col]), pc.is_valid(batch[lon_col]))
+                    with_coords += pc.sum(has_coords).as_py() or 0
+
+            counts = pool.map(
+                lambda arrays: pc.count_distinct(pa.chunked_array(arrays, pa.string())).as_py(),
+                uniques.values(),
+            )
+            distinct = dict(zip(uniques, counts))
 
         print(f"\n📊 Informações:")
-        print(f"  - Total de registros: {len(df_full)}")
-        print(f"  - Total de colunas: {len(df_full.columns)}")
+        print(f"  - Total de registros: {total}")
+        print(f"  - Total de colunas: {len(schema)}")
 
         print(f"\n📋 Colunas:")
-        for col in df_full.columns:
-            dtype = df_full[col].dtype
-            non_null = df_full[col].notna().sum()
-            null_pct = (1 - non_null / len(df_full)) * 100
-            unique = df_full[col].nunique()
+        for col, dtype in zip(schema.names, schema.types):
+            non_null_pct = non_null[col] / total * 100
             print(
-                f"  - {col:30} | Tipo: {dtype:15} | Não-nulos: {non_null:6} ({100-null_pct:.1f}%) | Únicos: {unique}"
+                f"  - {col:30} | Tipo: {str(dtype):15} "
+                f"| Não-nulos: {non_null[col]:6} ({non_null_pct:.1f}%) | Únicos: {distinct[col]}"
             )
 
         print(f"\n🔍 Primeiros 3 registros:")
         print(df.head(3).to_string())
 
-        # Verificar se tem coordenadas
-        possible_lat_cols = ["latitude", "lat", "y", "coord_y"]
-        possible_lon_cols = ["longitude", "lon", "long", "x", "coord_x"]
-
-        lat_col = next((col for col in df_full.columns if col.lower() in possible_lat_cols), None)
-        lon_col = next((col for col in df_full.columns if col.lower() in possible_lon_cols), None)
-
         if lat_col and lon_col:
             print(f"\n📍 Coordenadas encontradas:")
             print(f"  - Latitude: {lat_col}")
             print(f"  - Longitude: {lon_col}")
-            print(
-                f"  - Registros com coordenadas: {df_full[[lat_col, lon_col]].notna().all(axis=1).sum()}"
-            )
+            print(f"  - Registros com coordenadas: {with_coords}")
         else:
             print(f"\n⚠️  Colunas de coordenadas não encontradas automaticamente")
             print(f"  Procure por colunas que contenham lat/lon nos dados acima")
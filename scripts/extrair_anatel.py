@@ -12,15 +12,30 @@ import os
 import re
 import sys
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Deque, Iterable, Iterator, Optional, Tuple
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from google.api_core import retry
 from google.cloud import bigquery
 from loguru import logger
 from sqlalchemy import create_engine, text
 
+try:
+    # Storage Read API: resultados em Arrow (gRPC) em vez de JSON via REST
+    from google.cloud import bigquery_storage
+except ImportError:
+    bigquery_storage = None
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.etl_utils import copy_insert, execute_autocommit, execute_parallel
+
 # Configurar credenciais:
 # Removemos a definição explícita de GOOGLE_APPLICATION_CREDENTIALS para arquivo local.
 # O script agora usará ADC (Application Default Credentials), que funciona automaticamente
@@ -41,6 +56,26 @@ logger.add(
     format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} - {message}",
 )
 
+# Guardas dos jobs de extração no BigQuery
+BQ_MAXIMUM_BYTES_BILLED = 100 * 2**30  # 100 GiB
+BQ_JOB_TIMEOUT_MS = 30 * 60 * 1000  # 30 minutos
+BQ_JOB_LABELS = {"pipeline": "etl_anatel"}  # Atribuição de custos no billing
+
+# COPY simultâneos na carga (um por conexão do pool)
+COPY_WORKERS = min(8, os.cpu_count() or 1)
+
+# Índices de geo.cobertura_fibra: sufixo do nome -> coluna
+INDEX_COLUMNS = {"municipio": "id_municipio", "tecnologia": "tecnologia"}
+
+# Colunas de metadados preenchidas pelo PostgreSQL (DEFAULT) durante o COPY
+METADATA_COLUMNS_DDL = (
+    "ADD COLUMN data_source VARCHAR(100) NOT NULL DEFAULT 'ANATEL_BIGQUERY', "
+    "ADD COLUMN data_extracao TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"
+)
+
+# Nome de tabela aceito: identificador simples de até 63 caracteres (limite do PostgreSQL)
+TABLE_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{0,62}")
+
 
 class AnatelBigQueryETL:
     """Pipeline ETL para extração de dados Anatel do BigQuery."""
@@ -74,6 +109,7 @@ class AnatelBigQueryETL:
 
         self.bq_client: Optional[bigquery.Client] = None
         self.pg_engine = None
+        self.credentials = None  # Credenciais ADC, resolvidas uma vez em _validate_credentials
 
         logger.info(f"Pipeline ETL inicializada | Projeto: {project_id} | Chunk Size: {chunk_size}")
 
@@ -85,8 +121,8 @@ class AnatelBigQueryETL:
         try:
             import google.auth
 
-            credentials, project = google.auth.default()
-            if not credentials:
+            self.credentials, project = google.auth.default()
+            if not self.credentials:
                 logger.error("Credenciais ADC não encontradas!")
                 return False
             logger.success(f"Credenciais GCP (ADC) detectadas. Projeto quota/billing: {project}")
@@ -101,15 +137,13 @@ class AnatelBigQueryETL:
             # IMPORTANTE: Usar projeto faturador explicitamente
             # Jobs criados em: causal-tracker-484821-f1
             # Query acessa: basedosdados.br_anatel_banda_larga_fixa.microdados (público)
-            self.bq_client = bigquery.Client(project="causal-tracker-484821-f1")
-
-            # Teste de conexão (job criado no projeto faturador)
-            query_test = "SELECT 1 as test"
-            job_config = bigquery.QueryJobConfig(
-                use_query_cache=False,  # Desabilitar cache para monitoramento preciso no MVP
-                use_legacy_sql=False,
+            # Reaproveita as credenciais ADC já resolvidas (sem nova busca no google-auth)
+            self.bq_client = bigquery.Client(
+                project="causal-tracker-484821-f1", credentials=self.credentials
             )
-            result = self.bq_client.query(query_test, job_config=job_config).result()
+
+            # Teste de conexão via API de metadados (sem criar job de query)
+            self.bq_client.get_service_account_email()
 
             logger.success(
                 f"✅ Conectado ao BigQuery | Projeto faturador: causal-tracker-484821-f1"
@@ -126,7 +160,10 @@ class AnatelBigQueryETL:
     def _connect_postgres(self) -> bool:
         """Estabelece conexão com PostgreSQL/PostGIS."""
         try:
-            self.pg_engine = create_engine(self.database_url)
+            # Conexões para os COPY paralelos, mais folga para DDL e consultas
+            self.pg_engine = create_engine(
+                self.database_url, pool_size=COPY_WORKERS, max_overflow=4
+            )
 
             # Teste de conexão
             with self.pg_engine.connect() as conn:
@@ -155,24 +192,31 @@ class AnatelBigQueryETL:
             logger.error(f"Erro ao carregar query: {e}")
             return None
 
-    def _execute_bigquery(self, query: str) -> Optional[pd.DataFrame]:
+    def _execute_bigquery(self, query: str) -> Optional[Tuple[Iterator[pd.DataFrame], int]]:
         """
-        Executa query no BigQuery e retorna DataFrame.
+        Executa query no BigQuery e retorna os resultados em lotes.
+
+        Os lotes são baixados sob demanda: apenas um fica em memória por vez.
 
         Args:
             query: Query SQL para executar
 
         Returns:
-            DataFrame com resultados ou None em caso de erro
+            Tupla (iterador de DataFrames, total de linhas) ou None em caso de erro
         """
         try:
             logger.info("Executando query no BigQuery...")
             start_time = time.time()
 
             # Configurar job (criado no projeto faturador, mas query acessa dados públicos)
+            # Cache de resultados habilitado: reexecuções com dados inalterados não
+            # varrem (nem faturam) a tabela de novo
             job_config = bigquery.QueryJobConfig(
-                use_query_cache=False,  # Desabilitar cache para monitoramento preciso no MVP
+                use_query_cache=True,
                 use_legacy_sql=False,
+                maximum_bytes_billed=BQ_MAXIMUM_BYTES_BILLED,
+                job_timeout_ms=BQ_JOB_TIMEOUT_MS,
+                labels=BQ_JOB_LABELS,
             )
 
             # Executar query
@@ -181,7 +225,7 @@ class AnatelBigQueryETL:
             query_job = self.bq_client.query(query, job_config=job_config)
 
             # Aguardar conclusão
-            df = query_job.to_dataframe()
+            rows = query_job.result(page_size=self.chunk_size)
 
             elapsed_time = time.time() - start_time
 
@@ -195,12 +239,23 @@ class AnatelBigQueryETL:
 
             logger.success(
                 f"✅ Query executada com sucesso | "
-                f"Linhas: {len(df):,} | "
+                f"Linhas: {rows.total_rows:,} | "
                 f"Tempo: {elapsed_time:.2f}s | "
-                f"Bytes processados: {bytes_processed:,}"
+                f"Bytes processados: {bytes_processed:,} | "
+                f"Cache: {'sim' if query_job.cache_hit else 'não'}"
+            )
+
+            # Baixar em lotes Arrow (Storage API quando disponível);
+            # colunas Arrow viram pandas sem cópia para objetos Python
+            bqstorage_client = (
+                bigquery_storage.BigQueryReadClient() if bigquery_storage is not None else None
+            )
+            batches = (
+                pa.Table.from_batches([batch]).to_pandas(types_mapper=pd.ArrowDtype)
+                for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client)
             )
 
-            return df
+            return batches, rows.total_rows
 
         except Exception as e:
             logger.error(f"❌ Erro ao executar query BigQuery: {e}")
@@ -216,32 +271,51 @@ class AnatelBigQueryETL:
         Returns:
             DataFrame preparado
         """
-        logger.info("Preparando dados para inserção...")
-
         # Colunas da query otimizada: ano, mes, id_municipio, tecnologia, empresa, acessos
         # Manter nomes originais (já estão em snake_case)
 
-        # Adicionar metadados
-        df["data_source"] = "ANATEL_BIGQUERY"
-        df["data_extracao"] = pd.Timestamp.now()
+        # Metadados (data_source, data_extracao) ficam a cargo do DEFAULT da tabela
 
-        # Limpeza de dados
-        df = df.fillna({"acessos": 0, "empresa": "Não informado"})
+        # Limpeza de dados (apenas na coluna afetada, sem copiar o DataFrame inteiro)
+        df["empresa"] = df["empresa"].fillna("Não informado")
 
-        # Garantir tipos corretos
-        df["ano"] = df["ano"].astype(int)
-        df["mes"] = df["mes"].astype(int)
-        df["acessos"] = pd.to_numeric(df["acessos"], errors="coerce").fillna(0).astype(int)
+        # Garantir tipos corretos: cast e preenchimento de nulos em uma passada do Arrow compute
+        df["ano"] = self._to_arrow_int(df["ano"], pa.int32())
+        df["mes"] = self._to_arrow_int(df["mes"], pa.int32())
+        df["acessos"] = self._to_arrow_int(df["acessos"], pa.int64(), fill_value=0)
 
-        logger.info(f"Dados preparados | Linhas: {len(df):,} | Colunas: {list(df.columns)}")
+        logger.debug(f"Lote preparado | Linhas: {len(df):,} | Colunas: {list(df.columns)}")
         return df
 
-    def _insert_to_postgres(self, df: pd.DataFrame, table_name: str = "cobertura_fibra") -> bool:
+    @staticmethod
+    def _to_arrow_int(
+        series: pd.Series, arrow_type: pa.DataType, fill_value: Optional[int] = None
+    ) -> pd.arrays.ArrowExtensionArray:
         """
-        Insere dados no PostgreSQL em chunks.
+        Converte uma coluna para inteiro Arrow usando os kernels do pyarrow.compute.
 
         Args:
-            df: DataFrame para inserir
+            series: Coluna a converter (Arrow ou NumPy)
+            arrow_type: Tipo inteiro de destino (ex: pa.int32())
+            fill_value: Valor para nulos (None mantém os nulos)
+
+        Returns:
+            Array Arrow pronto para atribuir ao DataFrame
+        """
+        values = pc.cast(pa.array(series), arrow_type)
+        if fill_value is not None:
+            values = pc.fill_null(values, fill_value)
+        return pd.arrays.ArrowExtensionArray(values)
+
+    def _insert_to_postgres(
+        self, batches: Iterable[pd.DataFrame], total_rows: int, table_name: str = "cobertura_fibra"
+    ) -> bool:
+        """
+        Insere dados no PostgreSQL lote a lote.
+
+        Args:
+            batches: Lotes (DataFrames) a inserir, consumidos um por vez
+            total_rows: Total de linhas esperado (para o progresso)
             table_name: Nome da tabela destino
 
         Returns:
@@ -254,39 +328,42 @@ class AnatelBigQueryETL:
             logger.info(f"Iniciando inserção no PostgreSQL | Tabela: geo.{validated_table_name}")
             start_time = time.time()
 
-            # Inserir em chunks para melhor performance
-            total_chunks = (len(df) // self.chunk_size) + 1
-
-            for i, chunk_start in enumerate(range(0, len(df), self.chunk_size)):
-                chunk_end = min(chunk_start + self.chunk_size, len(df))
-                chunk = df.iloc[chunk_start:chunk_end]
-
-                # Primeira iteração: replace (limpa tabela)
-                # Demais: append
-                if_exists_mode = "replace" if i == 0 else "append"
-
-                chunk.to_sql(
-                    validated_table_name,
-                    self.pg_engine,
-                    schema="geo",
-                    if_exists=if_exists_mode,
-                    index=False,
-                    method="multi",  # Inserção batch otimizada
-                    chunksize=1000,
-                )
+            # Inserir à medida que os lotes chegam do BigQuery, com até COPY_WORKERS
+            # COPY simultâneos (um por conexão); o download segue enquanto os lotes são gravados
+            inserted = 0
+            pending: Deque[Future] = deque()
 
+            def wait_oldest() -> None:
+                nonlocal inserted
+                rows = pending.popleft().result()
+                inserted += rows
                 logger.info(
-                    f"Chunk {i+1}/{total_chunks} inserido | "
-                    f"Linhas: {len(chunk)} | "
-                    f"Progresso: {(chunk_end/len(df)*100):.1f}%"
+                    f"Chunk inserido | "
+                    f"Linhas: {rows} | "
+                    f"Progresso: {(inserted/total_rows*100):.1f}%"
                 )
 
+            with ThreadPoolExecutor(max_workers=COPY_WORKERS) as pool:
+                for i, chunk in enumerate(batches):
+                    # Primeira iteração: recria a tabela (limpa) a partir do esquema do lote,
+                    # antes de qualquer COPY
+                    if i == 0:
+                        self._create_table(chunk, validated_table_name)
+
+                    # Limitar lotes em memória: aguardar o mais antigo antes de enviar outro
+                    if len(pending) >= COPY_WORKERS:
+                        wait_oldest()
+                    pending.append(pool.submit(self._copy_chunk, chunk, validated_table_name))
+
+                while pending:
+                    wait_oldest()
+
             elapsed_time = time.time() - start_time
             logger.success(
                 f"✅ Inserção concluída | "
-                f"Total de linhas: {len(df):,} | "
+                f"Total de linhas: {inserted:,} | "
                 f"Tempo: {elapsed_time:.2f}s | "
-                f"Taxa: {len(df)/elapsed_time:.0f} linhas/s"
+                f"Taxa: {inserted/elapsed_time:.0f} linhas/s"
             )
 
             return True
@@ -298,6 +375,46 @@ class AnatelBigQueryETL:
             logger.error(f"❌ Erro ao inserir dados no PostgreSQL: {e}")
             return False
 
+    def _copy_chunk(self, chunk: pd.DataFrame, table_name: str) -> int:
+        """
+        Insere um lote via COPY FROM STDIN, em uma conexão própria do pool.
+
+        Args:
+            chunk: Lote a inserir
+            table_name: Nome da tabela destino (já validado)
+
+        Returns:
+            Número de linhas inseridas
+        """
+        chunk.to_sql(
+            table_name,
+            self.pg_engine,
+            schema="geo",
+            if_exists="append",
+            index=False,
+            method=copy_insert,  # COPY FROM STDIN (muito mais rápido que INSERT)
+        )
+        return len(chunk)
+
+    def _create_table(self, df: pd.DataFrame, table_name: str) -> None:
+        """
+        Recria a tabela destino com as colunas do DataFrame e os metadados.
+
+        data_source e data_extracao são colunas com DEFAULT: ficam fora do
+        COPY e são preenchidas pelo PostgreSQL, sem trafegar um valor
+        repetido por linha.
+
+        Args:
+            df: Lote com as colunas de dados (apenas o esquema é usado)
+            table_name: Nome da tabela destino (já validado)
+        """
+        df.head(0).to_sql(
+            table_name, self.pg_engine, schema="geo", if_exists="replace", index=False
+        )
+
+        with self.pg_engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE geo."{table_name}" {METADATA_COLUMNS_DDL}'))
+
     @staticmethod
     def _validate_table_name(table_name: str) -> str:
         """
@@ -312,17 +429,15 @@ class AnatelBigQueryETL:
         Raises:
             ValueError: Se o nome da tabela for inválido
         """
-        # Permitir apenas letras, números e underscores
-        if not re.match(r"^[a-zA-Z0-9_]+$", table_name):
+        # Permitir apenas letras, números e underscores, sem iniciar por número,
+        # até 63 caracteres (o quantificador da regex já limita o tamanho)
+        if not TABLE_NAME_RE.fullmatch(table_name):
             raise ValueError(
                 f"Nome de tabela inválido: '{table_name}'. "
-                "Apenas letras, números e underscores são permitidos."
+                "Apenas letras, números e underscores são permitidos "
+                "(sem iniciar por número, máximo 63 caracteres)."
             )
 
-        # Limitar tamanho máximo
-        if len(table_name) > 63:  # Limite do PostgreSQL
-            raise ValueError(f"Nome de tabela muito longo: '{table_name}' (máximo 63 caracteres)")
-
         return table_name
 
     def _create_indexes(self, table_name: str = "cobertura_fibra") -> bool:
@@ -333,21 +448,17 @@ class AnatelBigQueryETL:
             # Validar table_name para prevenir SQL Injection
             validated_table_name = self._validate_table_name(table_name)
 
-            with self.pg_engine.connect() as conn:
-                # Índice por município (id_municipio)
-                # SEGURANÇA: table_name validado acima
-                conn.execute(text(f"""
-                    CREATE INDEX IF NOT EXISTS idx_{validated_table_name}_municipio
-                    ON geo.{validated_table_name} (id_municipio)
-                """))
+            # Índices criados em paralelo, cada um em sua própria conexão
+            # SEGURANÇA: table_name validado acima
+            statements = [
+                f"CREATE INDEX IF NOT EXISTS idx_{validated_table_name}_{suffix} "
+                f"ON geo.{validated_table_name} ({column})"
+                for suffix, column in INDEX_COLUMNS.items()
+            ]
+            execute_parallel(self.pg_engine, statements)
 
-                # Índice por tecnologia
-                conn.execute(text(f"""
-                    CREATE INDEX IF NOT EXISTS idx_{validated_table_name}_tecnologia
-                    ON geo.{validated_table_name} (tecnologia)
-                """))
-
-                conn.commit()
+            # Estatísticas atualizadas para o planner usar os novos índices
+            execute_autocommit(self.pg_engine, f"ANALYZE geo.{validated_table_name}")
 
             logger.success("✅ Índices criados com sucesso")
             return True
@@ -390,17 +501,20 @@ class AnatelBigQueryETL:
             if not query:
                 return False
 
-            # 5. Executar query BigQuery
-            df = self._execute_bigquery(query)
-            if df is None or df.empty:
+            # 5. Executar query BigQuery (resultados lidos em lotes)
+            result = self._execute_bigquery(query)
+            if result is None or result[1] == 0:
                 logger.warning("⚠️ Nenhum dado retornado do BigQuery")
                 return False
 
-            # 6. Preparar dados
-            df_prepared = self._prepare_dataframe(df)
+            batches, total_rows = result
+
+            # 6. Preparar dados (lote a lote, à medida que são inseridos)
+            logger.info("Preparando dados para inserção...")
+            prepared = (self._prepare_dataframe(df) for df in batches)
 
             # 7. Inserir no PostgreSQL
-            if not self._insert_to_postgres(df_prepared):
+            if not self._insert_to_postgres(prepared, total_rows):
                 return False
 
             # 8. Criar índices
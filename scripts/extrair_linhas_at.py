@@ -1,15 +1,93 @@
 import os
 import sys
-
-import geopandas as gpd
-from shapely.geometry import LineString, MultiLineString
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyogrio
+import shapely
+from geoalchemy2 import Geometry
+from pyogrio.raw import read, read_arrow
+from pyproj import CRS, Transformer
 from sqlalchemy import create_engine
 
 from app.config import settings
 from app.core.logging import app_logger as logger
+from scripts.etl_utils import USE_ARROW, copy_insert
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+# Tensão mínima (kV) considerada Alta Tensão
+MIN_TENSAO_KV = 69
+
+# Mapeamento de colunas (apenas estas são lidas do GDB)
+COLUMNS_MAP = {
+    "NOME": "nome",
+    "COD_ID": "codigo",
+    "TEN_NOM": "tensao_kv",
+    "COMP": "comprimento_km",
+}
+
+# SRID gravado no PostGIS
+TARGET_SRID = 4326
+# Threads da reprojeção (o PROJ libera o GIL ao transformar as coordenadas)
+REPROJECT_WORKERS = os.cpu_count() or 1
+
+
+def read_layer(
+    gdb_path: str, layer: str, columns: list, where: Optional[str]
+) -> Tuple[dict, np.ndarray, pd.DataFrame]:
+    """
+    Lê uma camada sem montar GeoDataFrame: geometrias em WKB e atributos em colunas
+
+    Com GDAL >= 3.6 a leitura é feita por stream Arrow; senão, pelos arrays
+    NumPy da leitura "raw" do pyogrio.
+
+    Args:
+        gdb_path: Caminho do arquivo .gdb
+        layer: Nome da camada
+        columns: Colunas de atributos a ler
+        where: Filtro SQL aplicado pelo GDAL (ou None)
+
+    Returns:
+        Tupla (metadados da camada, geometrias em WKB, atributos)
+    """
+    if USE_ARROW:
+        meta, table = read_arrow(gdb_path, layer=layer, columns=columns, where=where)
+        geometry_name = meta["geometry_name"] or "wkb_geometry"
+        wkb = table[geometry_name].to_numpy(zero_copy_only=False)
+        attributes = table.drop([geometry_name]).to_pandas()
+    else:
+        meta, _, wkb, field_data = read(gdb_path, layer=layer, columns=columns, where=where)
+        attributes = pd.DataFrame(dict(zip(meta["fields"], field_data)))
+
+    return meta, wkb, attributes
+
+
+def reproject(geoms: np.ndarray, crs: CRS) -> np.ndarray:
+    """
+    Reprojeta as geometrias para o SRID de destino, em partes paralelas
+
+    Args:
+        geoms: Array de geometrias Shapely
+        crs: CRS de origem
+
+    Returns:
+        Array de geometrias reprojetadas, na mesma ordem
+    """
+
+    def transform_part(part: np.ndarray) -> np.ndarray:
+        # Um Transformer por parte: instâncias do pyproj não são thread-safe
+        transformer = Transformer.from_crs(crs, TARGET_SRID, always_xy=True)
+        return shapely.transform(
+            part, lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1]))
+        )
+
+    parts = np.array_split(geoms, REPROJECT_WORKERS)
+    with ThreadPoolExecutor(REPROJECT_WORKERS) as pool:
+        return np.concatenate(list(pool.map(transform_part, parts)))
+
 
 def extrair_linhas_at(gdb_path: str):
     """
@@ -27,54 +105,56 @@ def extrair_linhas_at(gdb_path: str):
         # Geralmente 'SSD' (Segmento de Rede de Distribuição) ou 'SLT' (Segmento de Linha de Transmissão)
         layer_name = "SLT"  # Ajustar conforme nome real da camada no GDB
 
+        # Metadados da camada (total e colunas) sem ler os registros
+        info = pyogrio.read_info(gdb_path, layer=layer_name)
+        logger.info(f"Total de segmentos encontrados: {info['features']}")
+
+        # Filtrar Alta Tensão (ex: > 69kV) no próprio GDAL, antes de materializar as linhas
+        has_voltage = "TEN_NOM" in info["fields"]
+        where = f"CAST(TEN_NOM AS float) >= {MIN_TENSAO_KV}" if has_voltage else None
+        if not has_voltage:
+            logger.warning("Coluna de tensão não encontrada. Processando todas as linhas.")
+
         logger.info(f"Lendo camada '{layer_name}'...")
-        gdf = gpd.read_file(gdb_path, layer=layer_name)
+        columns = [c for c in COLUMNS_MAP if c in info["fields"]]
+        meta, wkb, df_final = read_layer(gdb_path, layer_name, columns, where)
 
-        logger.info(f"Total de segmentos encontrados: {len(gdf)}")
+        if has_voltage:
+            logger.info(f"Linhas AT filtradas: {len(df_final)}")
 
-        # Filtrar Alta Tensão (ex: > 69kV)
-        if "TEN_NOM" in gdf.columns:
-            gdf_at = gdf[gdf["TEN_NOM"].astype(float) >= 69]
-            logger.info(f"Linhas AT filtradas: {len(gdf_at)}")
-        else:
-            logger.warning("Coluna de tensão não encontrada. Processando todas as linhas.")
-            gdf_at = gdf
+        # Geometrias em array (sem GeoSeries): todas as operações abaixo são vetorizadas no GEOS
+        geoms = shapely.from_wkb(wkb)
 
         # Converter CRS
-        if gdf_at.crs != "EPSG:4326":
+        crs = CRS.from_user_input(meta["crs"]) if meta["crs"] else None
+        if crs is not None and crs.to_epsg() != TARGET_SRID:
             logger.info("Convertendo CRS para EPSG:4326...")
-            gdf_at = gdf_at.to_crs("EPSG:4326")
+            geoms = reproject(geoms, crs)
 
         # Garantir geometria MultiLineString
         # O PostGIS pode reclamar se misturar LineString e MultiLineString na mesma coluna geometry(MultiLineString)
-        def force_multilinestring(geom):
-            if isinstance(geom, LineString):
-                return MultiLineString([geom])
-            return geom
-
-        gdf_at["geometry"] = gdf_at["geometry"].apply(force_multilinestring)
-
-        # Mapeamento de colunas
-        columns_map = {
-            "NOME": "nome",
-            "COD_ID": "codigo",
-            "TEN_NOM": "tensao_kv",
-            "COMP": "comprimento_km",
-        }
-        valid_columns = {k: v for k, v in columns_map.items() if k in gdf_at.columns}
-        gdf_final = gdf_at.rename(columns=valid_columns)
+        # (vetorizado no GEOS: converte todas as LineString de uma vez)
+        is_line = shapely.get_type_id(geoms) == shapely.GeometryType.LINESTRING
+        geoms[is_line] = shapely.multilinestrings(geoms[is_line].reshape(-1, 1))
+
+        # Mapeamento de colunas; geometria como EWKB hexadecimal (com SRID) para o COPY
+        df_final = df_final.rename(columns=COLUMNS_MAP)
+        df_final["geometry"] = shapely.to_wkb(
+            shapely.set_srid(geoms, TARGET_SRID), hex=True, include_srid=True
+        )
 
         # Salvar no Banco
         engine = create_engine(settings.DATABASE_URL)
         table_name = "linhas_transmissao"
 
-        logger.info(f"Salvando {len(gdf_final)} linhas na tabela '{table_name}'...")
-        gdf_final.to_postgis(
+        logger.info(f"Salvando {len(df_final)} linhas na tabela '{table_name}'...")
+        df_final.to_sql(
             table_name,
             engine,
             if_exists="replace",
             index=False,
-            dtype={"geometry": "MultiLineString"},
+            dtype={"geometry": Geometry("MULTILINESTRING", srid=TARGET_SRID)},
+            method=copy_insert,
         )
         logger.info("Extração de linhas concluída!")
 
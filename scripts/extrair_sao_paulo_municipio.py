@@ -12,14 +12,33 @@ Data: 2026-01-28
 import os
 import sys
 import time
-from typing import Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, Iterable, Iterator, Optional, Tuple
 
 import pandas as pd
-from geoalchemy2 import WKTElement
+import pyarrow as pa
+import shapely
+from geoalchemy2 import Geometry
 from google.cloud import bigquery
 from loguru import logger
 from sqlalchemy import create_engine, text
 
+try:
+    # Storage Read API: resultados em Arrow (gRPC) em vez de JSON via REST
+    from google.cloud import bigquery_storage
+except ImportError:
+    bigquery_storage = None
+
+# Adicionar diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.etl_utils import copy_rows, execute_autocommit, execute_parallel
+
+# Conexões com COPY simultâneos (cada lote vai por uma conexão do pool)
+COPY_WORKERS = 4
+
 # Configurar logging
 logger.remove()
 logger.add(
@@ -108,7 +127,8 @@ class ZoneamentoSPETL:
     def _connect_postgres(self) -> bool:
         """Estabelece conexão com PostgreSQL/PostGIS."""
         try:
-            self.pg_engine = create_engine(self.database_url)
+            # Pool com folga para os COPY paralelos além das conexões de controle
+            self.pg_engine = create_engine(self.database_url, pool_size=COPY_WORKERS + 2)
 
             # Teste de conexão
             with self.pg_engine.connect() as conn:
@@ -122,12 +142,14 @@ class ZoneamentoSPETL:
             logger.error(f"❌ Erro ao conectar PostgreSQL: {e}")
             return False
 
-    def _execute_bigquery(self) -> Optional[pd.DataFrame]:
+    def _execute_bigquery(self) -> Optional[Tuple[Iterator[pd.DataFrame], int]]:
         """
-        Executa query no BigQuery e retorna DataFrame.
+        Executa query no BigQuery e retorna os resultados em lotes.
+
+        Os lotes são baixados sob demanda: apenas um fica em memória por vez.
 
         Returns:
-            DataFrame com resultados ou None em caso de erro
+            Tupla (iterador de DataFrames, total de linhas) ou None em caso de erro
         """
         try:
             logger.info("Executando query no BigQuery...")
@@ -151,15 +173,16 @@ class ZoneamentoSPETL:
                 `{self.project_id}.{self.bigquery_dataset}.{self.bigquery_table}`
             """
 
-            # Configurar job
+            # Configurar job (cache de resultados: reexecuções sem mudança na tabela
+            # não varrem os dados de novo)
             job_config = bigquery.QueryJobConfig(
-                use_query_cache=False,
+                use_query_cache=True,
                 use_legacy_sql=False,
             )
 
-            # Executar query
+            # Executar query e aguardar conclusão
             query_job = self.bq_client.query(query, job_config=job_config)
-            df = query_job.to_dataframe()
+            rows = query_job.result(page_size=self.chunk_size)
 
             elapsed_time = time.time() - start_time
 
@@ -170,12 +193,23 @@ class ZoneamentoSPETL:
 
             logger.success(
                 f"✅ Query executada com sucesso | "
-                f"Linhas: {len(df):,} | "
+                f"Linhas: {rows.total_rows:,} | "
                 f"Tempo: {elapsed_time:.2f}s | "
-                f"Bytes processados: {bytes_processed:,}"
+                f"Bytes processados: {bytes_processed:,} | "
+                f"Cache: {'sim' if query_job.cache_hit else 'não'}"
+            )
+
+            # Baixar em lotes Arrow (Storage API quando disponível, em vez da paginação REST);
+            # colunas Arrow viram pandas sem cópia para objetos Python
+            bqstorage_client = (
+                bigquery_storage.BigQueryReadClient() if bigquery_storage is not None else None
+            )
+            batches = (
+                pa.Table.from_batches([batch]).to_pandas(types_mapper=pd.ArrowDtype)
+                for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client)
             )
 
-            return df
+            return batches, rows.total_rows
 
         except Exception as e:
             logger.error(f"❌ Erro ao executar query BigQuery: {e}")
@@ -191,32 +225,29 @@ class ZoneamentoSPETL:
         Returns:
             DataFrame preparado
         """
-        logger.info("Preparando dados para inserção...")
-
         # Renomear coluna 'id' para 'id_original' para evitar conflito com PK auto-increment
         df = df.rename(columns={"id": "id_original"})
 
-        # Converter geometria WKT para GeoAlchemy2 WKTElement
-        logger.info("Convertendo geometrias WKT para PostGIS...")
-
-        # Função para converter POLYGON em MULTIPOLYGON
-        def to_multipolygon_wkt(wkt):
-            if wkt.startswith("MULTIPOLYGON"):
-                return wkt
-            elif wkt.startswith("POLYGON"):
-                # Envolve o polígono em MULTIPOLYGON
-                coords = wkt[7:]  # Remove "POLYGON"
-                return f"MULTIPOLYGON({coords})"
-            return wkt
-
-        df["geometry"] = df["geometry_wkt"].apply(
-            lambda wkt: WKTElement(to_multipolygon_wkt(wkt), srid=4326)
-        )
+        # Converter geometria WKT para EWKB hexadecimal (com SRID), lido diretamente pelo COPY
+        # Parse em bloco no GEOS (sem objeto por linha em Python); nulos seguem nulos
+        geoms = shapely.from_wkt(df["geometry_wkt"].to_numpy(dtype=object, na_value=None))
+
+        # POLYGON vira MULTIPOLYGON (coluna geometry(MultiPolygon)), também vetorizado
+        is_polygon = shapely.get_type_id(geoms) == shapely.GeometryType.POLYGON
+        geoms[is_polygon] = shapely.multipolygons(geoms[is_polygon].reshape(-1, 1))
+
+        df["geometry"] = shapely.to_wkb(shapely.set_srid(geoms, 4326), hex=True, include_srid=True)
         df = df.drop("geometry_wkt", axis=1)
 
-        # Converter data_atualizacao para datetime (se não for None)
-        if "dt_atualizacao" in df.columns:
-            df["dt_atualizacao"] = pd.to_datetime(df["dt_atualizacao"], errors="coerce")
+        # Converter data_atualizacao para datetime (se não for None); TIMESTAMP do BigQuery já
+        # chega como timestamp Arrow e dispensa conversão. Texto é ISO 8601: formato fixo,
+        # sem a inferência linha a linha do dateutil
+        if "dt_atualizacao" in df.columns and not pd.api.types.is_datetime64_any_dtype(
+            df["dt_atualizacao"]
+        ):
+            df["dt_atualizacao"] = pd.to_datetime(
+                df["dt_atualizacao"], format="ISO8601", errors="coerce", utc=True
+            )
 
         # Adicionar metadados de carga
         df["data_source"] = "BIGQUERY_SP_ZONEAMENTO"
@@ -230,60 +261,74 @@ class ZoneamentoSPETL:
             }
         )
 
-        logger.info(f"Dados preparados | Linhas: {len(df):,} | Colunas: {list(df.columns)}")
+        logger.debug(f"Lote preparado | Linhas: {len(df):,} | Colunas: {list(df.columns)}")
         return df
 
-    def _insert_to_postgres(self, df: pd.DataFrame, table_name: str = "zoneamento_sp") -> bool:
+    def _insert_to_postgres(
+        self, batches: Iterable[pd.DataFrame], total_rows: int, table_name: str = "zoneamento_sp"
+    ) -> bool:
         """
-        Insere dados no PostgreSQL em chunks.
+        Insere dados no PostgreSQL lote a lote, via COPY FROM STDIN.
 
         Args:
-            df: DataFrame para inserir
+            batches: Lotes (DataFrames) a inserir, consumidos um por vez
+            total_rows: Total de linhas esperado (para o progresso)
             table_name: Nome da tabela destino
 
         Returns:
             True se sucesso, False caso contrário
         """
         try:
-            from geoalchemy2 import Geometry
-
             logger.info(f"Iniciando inserção no PostgreSQL | Tabela: geo.{table_name}")
             start_time = time.time()
 
-            # Inserir em chunks para melhor performance
-            total_chunks = (len(df) // self.chunk_size) + 1
-
-            for i, chunk_start in enumerate(range(0, len(df), self.chunk_size)):
-                chunk_end = min(chunk_start + self.chunk_size, len(df))
-                chunk = df.iloc[chunk_start:chunk_end]
-
-                # Primeira iteração: replace (limpa tabela)
-                # Demais: append
-                if_exists_mode = "replace" if i == 0 else "append"
-
-                chunk.to_sql(
-                    table_name,
-                    self.pg_engine,
-                    schema="geo",
-                    if_exists=if_exists_mode,
-                    index=False,
-                    method="multi",
-                    chunksize=1000,
-                    dtype={"geometry": Geometry("MULTIPOLYGON", srid=4326)},
-                )
+            # A view de estatísticas depende da tabela, que será recriada (replace)
+            with self.pg_engine.begin() as conn:
+                conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS geo.{table_name}_stats_mv"))
 
+            # Inserir à medida que os lotes chegam do BigQuery, com até COPY_WORKERS
+            # COPY simultâneos (um por conexão); o download segue enquanto os lotes são gravados
+            inserted = 0
+            pending: Deque[Future] = deque()
+
+            def wait_oldest() -> None:
+                nonlocal inserted
+                rows = pending.popleft().result()
+                inserted += rows
                 logger.info(
-                    f"Chunk {i+1}/{total_chunks} inserido | "
-                    f"Linhas: {len(chunk)} | "
-                    f"Progresso: {(chunk_end/len(df)*100):.1f}%"
+                    f"Chunk inserido | "
+                    f"Linhas: {rows} | "
+                    f"Progresso: {(inserted/total_rows*100):.1f}%"
                 )
 
+            with ThreadPoolExecutor(max_workers=COPY_WORKERS) as pool:
+                for i, chunk in enumerate(batches):
+                    # Primeira iteração: recria a tabela (vazia) a partir do esquema do lote,
+                    # antes de qualquer COPY
+                    if i == 0:
+                        chunk.head(0).to_sql(
+                            table_name,
+                            self.pg_engine,
+                            schema="geo",
+                            if_exists="replace",
+                            index=False,
+                            dtype={"geometry": Geometry("MULTIPOLYGON", srid=4326)},
+                        )
+
+                    # Limitar lotes em memória: aguardar o mais antigo antes de enviar outro
+                    if len(pending) >= COPY_WORKERS:
+                        wait_oldest()
+                    pending.append(pool.submit(self._copy_chunk, chunk, table_name))
+
+                while pending:
+                    wait_oldest()
+
             elapsed_time = time.time() - start_time
             logger.success(
                 f"✅ Inserção concluída | "
-                f"Total de linhas: {len(df):,} | "
+                f"Total de linhas: {inserted:,} | "
                 f"Tempo: {elapsed_time:.2f}s | "
-                f"Taxa: {len(df)/elapsed_time:.0f} linhas/s"
+                f"Taxa: {inserted/elapsed_time:.0f} linhas/s"
             )
 
             return True
@@ -295,37 +340,92 @@ class ZoneamentoSPETL:
             traceback.print_exc()
             return False
 
+    def _copy_chunk(self, chunk: pd.DataFrame, table_name: str) -> int:
+        """
+        Envia um chunk com COPY FROM STDIN (CSV), sem INSERTs nem bind de parâmetros.
+
+        Strings vazias seguem como texto vazio; apenas nulos viram NULL. Usa
+        uma conexão própria do pool, podendo rodar em paralelo com outros chunks.
+
+        Args:
+            chunk: DataFrame a inserir (geometria em EWKB hexadecimal)
+            table_name: Nome da tabela destino
+
+        Returns:
+            Número de linhas enviadas
+        """
+        # Nulos do pandas (NaN, NaT, NA) como None, que o COPY recebe como NULL
+        rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+
+        raw_connection = self.pg_engine.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                copy_rows(cursor, f"geo.{table_name}", chunk.columns, rows)
+            raw_connection.commit()
+        finally:
+            raw_connection.close()
+
+        return len(chunk)
+
     def _create_indexes(self, table_name: str = "zoneamento_sp") -> bool:
         """Cria índices na tabela para otimizar consultas."""
         try:
             logger.info("Criando índices...")
 
-            with self.pg_engine.connect() as conn:
-                # Índice espacial (PostGIS cria automaticamente com GIST)
-                conn.execute(text(f"""
-                    CREATE INDEX IF NOT EXISTS idx_{table_name}_geometry
-                    ON geo.{table_name} USING GIST (geometry)
-                """))
+            # Extensão dos índices trigram, antes dos índices que dependem dela
+            execute_autocommit(self.pg_engine, "CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+            # Índice espacial (PostGIS cria automaticamente com GIST)
+            execute_autocommit(self.pg_engine, f"""
+                CREATE INDEX IF NOT EXISTS idx_{table_name}_geometry
+                ON geo.{table_name} USING GIST (geometry)
+            """)
+
+            # Ordenar fisicamente pelo índice espacial: polígonos vizinhos
+            # ficam nas mesmas páginas, reduzindo leituras em consultas por bbox.
+            # O CLUSTER reescreve a tabela e reconstrói os índices existentes,
+            # por isso os demais só são criados depois dele
+            execute_autocommit(
+                self.pg_engine, f"CLUSTER geo.{table_name} USING idx_{table_name}_geometry"
+            )
 
+            statements = [
                 # Índice por código de zoneamento
-                conn.execute(text(f"""
-                    CREATE INDEX IF NOT EXISTS idx_{table_name}_codigo
-                    ON geo.{table_name} (cd_zoneamento_perimetro)
-                """))
-
+                f"""
+                CREATE INDEX IF NOT EXISTS idx_{table_name}_codigo
+                ON geo.{table_name} (cd_zoneamento_perimetro)
+                """,
+                # Igualdade sem diferenciar maiúsculas (filtro padrão da API)
+                f"""
+                CREATE INDEX IF NOT EXISTS idx_{table_name}_codigo_upper
+                ON geo.{table_name} (upper(cd_zoneamento_perimetro))
+                """,
+                # Índices trigram para os filtros ILIKE com curinga
+                f"""
+                CREATE INDEX IF NOT EXISTS idx_{table_name}_codigo_trgm
+                ON geo.{table_name} USING GIN (cd_zoneamento_perimetro gin_trgm_ops)
+                """,
+                f"""
+                CREATE INDEX IF NOT EXISTS idx_{table_name}_tipo_trgm
+                ON geo.{table_name} USING GIN (cd_tipo_legislacao_zoneamento gin_trgm_ops)
+                """,
                 # Índice por ano da legislação
-                conn.execute(text(f"""
-                    CREATE INDEX IF NOT EXISTS idx_{table_name}_ano
-                    ON geo.{table_name} (an_legislacao_zoneamento)
-                """))
-
+                f"""
+                CREATE INDEX IF NOT EXISTS idx_{table_name}_ano
+                ON geo.{table_name} (an_legislacao_zoneamento)
+                """,
                 # Índice por id_original
-                conn.execute(text(f"""
-                    CREATE INDEX IF NOT EXISTS idx_{table_name}_id_original
-                    ON geo.{table_name} (id_original)
-                """))
+                f"""
+                CREATE INDEX IF NOT EXISTS idx_{table_name}_id_original
+                ON geo.{table_name} (id_original)
+                """,
+            ]
+
+            # Índices criados em paralelo, cada um em sua própria conexão
+            execute_parallel(self.pg_engine, statements)
 
-                conn.commit()
+            # Estatísticas atualizadas para o planner usar os novos índices
+            execute_autocommit(self.pg_engine, f"ANALYZE geo.{table_name}")
 
             logger.success("✅ Índices criados com sucesso")
             return True
@@ -334,6 +434,65 @@ class ZoneamentoSPETL:
             logger.warning(f"⚠️ Erro ao criar índices (não crítico): {e}")
             return False
 
+    def _create_stats_view(self, table_name: str = "zoneamento_sp") -> bool:
+        """
+        Cria (ou atualiza) a materialized view com as estatísticas usadas em /stats/summary.
+
+        Quando a view já existe, o REFRESH CONCURRENTLY a recalcula sem bloquear as
+        leituras da API; a chave única (id) exigida por ele é uma linha sintética.
+        """
+        try:
+            logger.info("Criando view de estatísticas...")
+
+            with self.pg_engine.begin() as conn:
+                conn.execute(text(f"""
+                    CREATE MATERIALIZED VIEW IF NOT EXISTS geo.{table_name}_stats_mv AS
+                    SELECT
+                        1 AS id,
+                        (SELECT count(*) FROM geo.{table_name}) AS total,
+                        (
+                            SELECT coalesce(
+                                json_agg(json_build_object('codigo', codigo, 'count', n)
+                                         ORDER BY n DESC),
+                                '[]'::json
+                            )
+                            FROM (
+                                SELECT cd_zoneamento_perimetro AS codigo, count(*) AS n
+                                FROM geo.{table_name}
+                                GROUP BY cd_zoneamento_perimetro
+                                ORDER BY n DESC
+                                LIMIT 20
+                            ) t
+                        ) AS tipos,
+                        (
+                            SELECT coalesce(
+                                json_agg(json_build_object('ano', ano, 'count', n)
+                                         ORDER BY ano DESC),
+                                '[]'::json
+                            )
+                            FROM (
+                                SELECT an_legislacao_zoneamento AS ano, count(*) AS n
+                                FROM geo.{table_name}
+                                WHERE an_legislacao_zoneamento IS NOT NULL
+                                GROUP BY an_legislacao_zoneamento
+                            ) t
+                        ) AS anos
+                """))
+                conn.execute(text(f"""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_{table_name}_stats_mv_id
+                    ON geo.{table_name}_stats_mv (id)
+                """))
+                conn.execute(
+                    text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY geo.{table_name}_stats_mv")
+                )
+
+            logger.success("✅ View de estatísticas criada")
+            return True
+
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao criar view de estatísticas (não crítico): {e}")
+            return False
+
     def run(self) -> bool:
         """
         Executa a pipeline ETL completa.
@@ -360,22 +519,28 @@ class ZoneamentoSPETL:
             if not self._connect_postgres():
                 return False
 
-            # 4. Executar query BigQuery
-            df = self._execute_bigquery()
-            if df is None or df.empty:
+            # 4. Executar query BigQuery (resultados lidos em lotes)
+            result = self._execute_bigquery()
+            if result is None or result[1] == 0:
                 logger.warning("⚠️ Nenhum dado retornado do BigQuery")
                 return False
 
-            # 5. Preparar dados
-            df_prepared = self._prepare_dataframe(df)
+            batches, total_rows = result
+
+            # 5. Preparar dados (lote a lote, à medida que são inseridos)
+            logger.info("Preparando dados para inserção...")
+            prepared = (self._prepare_dataframe(df) for df in batches)
 
             # 6. Inserir no PostgreSQL
-            if not self._insert_to_postgres(df_prepared):
+            if not self._insert_to_postgres(prepared, total_rows):
                 return False
 
             # 7. Criar índices
             self._create_indexes()
 
+            # 8. Pré-calcular estatísticas
+            self._create_stats_view()
+
             # Sucesso!
             total_time = time.time() - pipeline_start
             logger.success("=" * 80)
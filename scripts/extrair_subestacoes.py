@@ -1,15 +1,19 @@
 import os
 import sys
 
-import geopandas as gpd
+import pyogrio
 from sqlalchemy import create_engine, text
 
 from app.config import settings
 from app.core.logging import app_logger as logger
+from scripts.etl_utils import USE_ARROW
 
 # Adiciona o diretório raiz ao sys.path para importar módulos da app
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+# Tensão mínima (kV) considerada Alta Tensão
+MIN_TENSAO_KV = 69
+
 
 def extrair_subestacoes(gdb_path: str):
     """
@@ -24,15 +28,12 @@ def extrair_subestacoes(gdb_path: str):
 
     try:
         # A camada exata pode variar, geralmente é 'SUB' ou 'Subestacao' na BDGD
-        # Listar camadas se necessário: fiona.listlayers(gdb_path)
+        # Listar camadas se necessário: pyogrio.list_layers(gdb_path)
         layer_name = "SUB"
 
-        logger.info(f"Lendo camada '{layer_name}'...")
-        # Lendo apenas colunas necessárias para economizar memória se possível
-        # Nota: read_file carrega tudo em memória. Para datasets gigantes, usar bbox ou row slice.
-        gdf = gpd.read_file(gdb_path, layer=layer_name)
-
-        initial_count = len(gdf)
+        # Metadados da camada (total e colunas) sem ler os registros
+        info = pyogrio.read_info(gdb_path, layer=layer_name)
+        initial_count = info["features"]
         logger.info(f"Total de registros encontrados: {initial_count}")
 
         # Filtros:
@@ -42,12 +43,19 @@ def extrair_subestacoes(gdb_path: str):
 
         # Para este MVP, vamos supor que queremos tudo que não seja 'BT' (Baixa Tensão)
         # Se não houver coluna clara, importamos tudo e filtramos no banco, mas o ideal é aqui.
-        if "TEN_NOM" in gdf.columns:  # Exemplo de coluna
-            gdf_at = gdf[gdf["TEN_NOM"].astype(float) >= 69]
-            logger.info(f"Filtrado para Alta Tensão (>69kV): {len(gdf_at)} registros")
-        else:
+        # O filtro roda no próprio GDAL (OpenFileGDB), antes de materializar os registros
+        has_voltage = "TEN_NOM" in info["fields"]  # Exemplo de coluna
+        where = f"CAST(TEN_NOM AS float) >= {MIN_TENSAO_KV}" if has_voltage else None
+        if not has_voltage:
             logger.warning("Coluna de tensão não encontrada. Importando todos os registros.")
-            gdf_at = gdf
+
+        logger.info(f"Lendo camada '{layer_name}'...")
+        gdf_at = pyogrio.read_dataframe(
+            gdb_path, layer=layer_name, where=where, use_arrow=USE_ARROW
+        )
+
+        if has_voltage:
+            logger.info(f"Filtrado para Alta Tensão (>69kV): {len(gdf_at)} registros")
 
         # Converter CRS para WGS84 (EPSG:4326)
         if gdf_at.crs != "EPSG:4326":
@@ -7,6 +7,7 @@ CREATE EXTENSION IF NOT EXISTS postgis;
 CREATE EXTENSION IF NOT EXISTS postgis_topology;
 CREATE EXTENSION IF NOT EXISTS fuzzystrmatch;
 CREATE EXTENSION IF NOT EXISTS postgis_tiger_geocoder;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- Verificar versão do PostGIS
 SELECT PostGIS_Version();
@@ -42,6 +43,12 @@ CREATE TABLE IF NOT EXISTS geo.subestacoes (
 CREATE INDEX IF NOT EXISTS idx_subestacoes_geom ON geo.subestacoes USING GIST (geometry);
 CREATE INDEX IF NOT EXISTS idx_subestacoes_uf ON geo.subestacoes (uf);
 CREATE INDEX IF NOT EXISTS idx_subestacoes_municipio ON geo.subestacoes (municipio);
+-- Filtro combinado uf = X AND tensao_kv BETWEEN ... (também atende uf sozinho)
+CREATE INDEX IF NOT EXISTS idx_subestacoes_uf_tensao ON geo.subestacoes (uf, tensao_kv);
+
+-- Índices trigram para os filtros ILIKE '%...%'
+CREATE INDEX IF NOT EXISTS idx_subestacoes_municipio_trgm ON geo.subestacoes USING GIN (municipio gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_subestacoes_operador_trgm ON geo.subestacoes USING GIN (operador gin_trgm_ops);
 
 -- ============================================
 -- Tabela: Linhas de Transmissão
@@ -57,6 +64,7 @@ CREATE TABLE IF NOT EXISTS geo.linhas_transmissao (
     destino VARCHAR(255),
     status VARCHAR(50),
     geometry GEOMETRY(LineString, 4326) NOT NULL,
+    geometry_simplified GEOMETRY(Geometry, 4326),
     
     -- Metadados
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -68,6 +76,11 @@ CREATE TABLE IF NOT EXISTS geo.linhas_transmissao (
 CREATE INDEX IF NOT EXISTS idx_linhas_geom ON geo.linhas_transmissao USING GIST (geometry);
 CREATE INDEX IF NOT EXISTS idx_linhas_tensao ON geo.linhas_transmissao (tensao_kv);
 
+-- Índices trigram para os filtros ILIKE '%...%'
+CREATE INDEX IF NOT EXISTS idx_linhas_operador_trgm ON geo.linhas_transmissao USING GIN (operador gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_linhas_origem_trgm ON geo.linhas_transmissao USING GIN (origem gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_linhas_destino_trgm ON geo.linhas_transmissao USING GIN (destino gin_trgm_ops);
+
 -- ============================================
 -- Tabela: Infraestrutura de Fibra Ótica
 -- ============================================
@@ -93,6 +106,11 @@ CREATE INDEX IF NOT EXISTS idx_fibra_geom ON geo.fibra_optica USING GIST (geomet
 CREATE INDEX IF NOT EXISTS idx_fibra_uf ON geo.fibra_optica (uf);
 CREATE INDEX IF NOT EXISTS idx_fibra_operadora ON geo.fibra_optica (operadora);
 
+-- Índices trigram para os filtros ILIKE '%...%'
+CREATE INDEX IF NOT EXISTS idx_fibra_municipio_trgm ON geo.fibra_optica USING GIN (municipio gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_fibra_operadora_trgm ON geo.fibra_optica USING GIN (operadora gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_fibra_tecnologia_trgm ON geo.fibra_optica USING GIN (tecnologia gin_trgm_ops);
+
 -- ============================================
 -- Funções auxiliares
 -- ============================================
@@ -116,6 +134,29 @@ CREATE TRIGGER update_linhas_updated_at BEFORE UPDATE ON geo.linhas_transmissao
 CREATE TRIGGER update_fibra_updated_at BEFORE UPDATE ON geo.fibra_optica
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Geometria simplificada das linhas, pré-calculada na carga (tolerância = SIMPLIFY_TOLERANCE
+-- de app/config.py). Tipo genérico: a simplificação pode não devolver uma LineString
+ALTER TABLE geo.linhas_transmissao
+    ADD COLUMN IF NOT EXISTS geometry_simplified GEOMETRY(Geometry, 4326);
+
+CREATE OR REPLACE FUNCTION update_geometry_simplified_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.geometry_simplified = ST_Simplify(NEW.geometry, 0.001);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_linhas_geometry_simplified ON geo.linhas_transmissao;
+CREATE TRIGGER update_linhas_geometry_simplified
+    BEFORE INSERT OR UPDATE OF geometry ON geo.linhas_transmissao
+    FOR EACH ROW EXECUTE FUNCTION update_geometry_simplified_column();
+
+-- Backfill das linhas carregadas antes do trigger existir
+UPDATE geo.linhas_transmissao
+SET geometry_simplified = ST_Simplify(geometry, 0.001)
+WHERE geometry_simplified IS NULL;
+
 -- ============================================
 -- Comentários nas tabelas
 -- ============================================
@@ -123,6 +164,19 @@ COMMENT ON TABLE geo.subestacoes IS 'Subestações de energia elétrica (fonte:
 COMMENT ON TABLE geo.linhas_transmissao IS 'Linhas de transmissão de alta tensão (fonte: ANEEL)';
 COMMENT ON TABLE geo.fibra_optica IS 'Infraestrutura de fibra ótica (fonte: ANATEL)';
 
+-- ============================================
+-- Planner
+-- ============================================
+-- Dados cabem em SSD/cache: leitura aleatória quase tão barata quanto sequencial,
+-- o que favorece BitmapAnd entre os índices GIST, GIN e btree acima
+DO $$
+BEGIN
+    EXECUTE format('ALTER DATABASE %I SET random_page_cost = 1.1', current_database());
+    -- Queries curtas da API: o custo de compilação do JIT não compensa (vale também
+    -- para conexões via PgBouncer, que não repassam server_settings)
+    EXECUTE format('ALTER DATABASE %I SET jit = off', current_database());
+END $$;
+
 -- ============================================
 -- Grants (ajustar conforme necessário)
 -- ============================================
@@ -3,20 +3,36 @@ Script para processar dados de Fibra Ótica da ANATEL
 Lê arquivos CSV e carrega no PostGIS
 """
 
+import codecs
 import sys
 from pathlib import Path
+from typing import Optional
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import shapely
 from loguru import logger
-from shapely.geometry import Point
 from sqlalchemy import create_engine
 
+try:
+    from chardet.universaldetector import UniversalDetector
+except ImportError:  # chardet é opcional: sem ele, o encoding é achado por tentativa
+    UniversalDetector = None
+
 # Adicionar diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.config import settings
 
+# CSV: amostra usada na detecção do encoding e bytes por bloco na leitura
+CSV_SAMPLE_BYTES = 65536
+CSV_BLOCK_SIZE = 16 << 20
+CSV_ENCODINGS = ["utf-8", "latin-1", "iso-8859-1", "cp1252"]
+CSV_SEPARATOR = ";"  # Ajustar separador se necessário
+
 
 def setup_logging():
     """Configurar logging para o script"""
@@ -34,6 +50,40 @@ def setup_logging():
     )
 
 
+def detect_encoding(csv_path: Path) -> Optional[str]:
+    """
+    Detecta o encoding a partir de uma amostra do início do arquivo
+
+    Args:
+        csv_path: Caminho para o arquivo CSV
+
+    Returns:
+        Encoding detectado, ou None se nenhum dos testados decodificar a amostra
+    """
+    with csv_path.open("rb") as f:
+        sample = f.read(CSV_SAMPLE_BYTES)
+
+    # Palpite estatístico do chardet primeiro; ASCII vira UTF-8, que o contém
+    encodings = CSV_ENCODINGS
+    if UniversalDetector is not None:
+        detector = UniversalDetector()
+        detector.feed(sample)
+        detector.close()
+        guess = detector.result["encoding"]
+        if guess:
+            encodings = ["utf-8" if guess.lower() == "ascii" else guess, *CSV_ENCODINGS]
+
+    for encoding in encodings:
+        try:
+            # Decoder incremental: tolera um caractere multibyte cortado no fim da amostra
+            codecs.getincrementaldecoder(encoding)().decode(sample)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    return None
+
+
 def create_geometry_from_coords(
     df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude"
 ) -> gpd.GeoDataFrame:
@@ -50,11 +100,13 @@ def create_geometry_from_coords(
     """
     logger.info("Criando geometrias a partir de coordenadas...")
 
-    # Remover linhas sem coordenadas
-    df = df.dropna(subset=[lat_col, lon_col])
+    # Remover linhas sem coordenadas (máscara booleana aplicada uma única vez)
+    df = df[df[lat_col].notna() & df[lon_col].notna()]
 
-    # Criar geometrias
-    geometry = [Point(xy) for xy in zip(df[lon_col], df[lat_col])]
+    # Criar geometrias em bloco no GEOS (sem um objeto Point por iteração Python)
+    geometry = shapely.points(
+        df[lon_col].to_numpy(dtype=np.float64), df[lat_col].to_numpy(dtype=np.float64)
+    )
 
     # Criar GeoDataFrame
     gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
@@ -84,29 +136,35 @@ def process_fibra_optica(csv_path: str) -> None:
     logger.info(f"Arquivo CSV: {csv_path}")
 
     try:
-        # Ler CSV
-        logger.info("Lendo arquivo CSV...")
-
-        # Tentar diferentes encodings
-        encodings = ["utf-8", "latin-1", "iso-8859-1", "cp1252"]
-        df = None
-
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(
-                    csv_path, encoding=encoding, sep=";"
-                )  # Ajustar separador se necessário
-                logger.info(f"Arquivo lido com encoding: {encoding}")
-                break
-            except UnicodeDecodeError:
-                continue
-
-        if df is None:
+        # Detectar encoding uma única vez, pela amostra do início do arquivo
+        encoding = detect_encoding(csv_path)
+        if encoding is None:
             logger.error("Não foi possível ler o arquivo com nenhum encoding testado")
             return
 
-        logger.info(f"Registros lidos: {len(df)}")
-        logger.info(f"Colunas disponíveis: {list(df.columns)}")
+        logger.info(f"Arquivo lido com encoding: {encoding}")
+
+        read_options = pa_csv.ReadOptions(encoding=encoding, block_size=CSV_BLOCK_SIZE)
+        parse_options = pa_csv.ParseOptions(delimiter=CSV_SEPARATOR)
+
+        # Cabeçalho pelo primeiro bloco; depois as colunas são lidas como texto, para que a
+        # inferência de tipos de um bloco não quebre a leitura dos seguintes (o COPY do
+        # PostgreSQL converte o texto para o tipo da coluna)
+        schema = pa_csv.open_csv(
+            csv_path, read_options=read_options, parse_options=parse_options
+        ).schema
+        logger.info(f"Colunas disponíveis: {schema.names}")
+
+        convert_options = pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in schema.names},
+            strings_can_be_null=True,
+        )
+        reader = pa_csv.open_csv(
+            csv_path,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        )
 
         # AJUSTAR NOMES DAS COLUNAS CONFORME ARQUIVO REAL
         # Exemplo de mapeamento (você precisará ajustar):
@@ -120,55 +178,83 @@ def process_fibra_optica(csv_path: str) -> None:
             # 'Longitude': 'longitude',
         }
 
-        # Renomear colunas se necessário
-        # df = df.rename(columns=column_mapping)
-
-        # Criar GeoDataFrame
-        # AJUSTAR NOMES DAS COLUNAS DE LAT/LON
-        gdf = create_geometry_from_coords(df, lat_col="latitude", lon_col="longitude")
-
-        # Validar geometrias
-        invalid_geoms = ~gdf.geometry.is_valid
-        if invalid_geoms.any():
-            logger.warning(f"Removendo {invalid_geoms.sum()} geometrias inválidas")
-            gdf = gdf[~invalid_geoms]
-
-        # Remover duplicatas
-        gdf = gdf.drop_duplicates()
-
-        # Adicionar metadados
-        gdf["data_source"] = "ANATEL"
-
         # Conectar ao banco
         logger.info("Conectando ao banco de dados...")
         engine = create_engine(settings.DATABASE_URL)
 
-        # Inserir
-        logger.info("Inserindo dados no PostGIS...")
-        gdf.to_postgis(
-            name="fibra_optica",
-            con=engine,
-            schema="geo",
-            if_exists="append",
-            index=False,
-        )
+        total_read = 0
+        inserted = 0
+        # Hashes (64 bits) das linhas já inseridas: duplicatas entre blocos também são removidas
+        seen_hashes = np.empty(0, dtype=np.uint64)
+        uf_counts = pd.Series(dtype="int64")
+        op_counts = pd.Series(dtype="int64")
+
+        # Ler, tratar e inserir bloco a bloco (cada bloco é descartado após a inserção)
+        logger.info("Lendo arquivo CSV e inserindo dados no PostGIS...")
+        for batch in reader:
+            df = batch.to_pandas()
+            total_read += len(df)
+
+            # Renomear colunas se necessário
+            # df = df.rename(columns=column_mapping)
+
+            # Criar GeoDataFrame
+            # AJUSTAR NOMES DAS COLUNAS DE LAT/LON
+            gdf = create_geometry_from_coords(df, lat_col="latitude", lon_col="longitude")
+
+            # Validar geometrias
+            invalid_geoms = ~gdf.geometry.is_valid
+            if invalid_geoms.any():
+                logger.warning(f"Removendo {invalid_geoms.sum()} geometrias inválidas")
+                gdf = gdf[~invalid_geoms]
+
+            # Remover duplicatas pelas colunas escalares: o ponto é derivado de latitude/longitude,
+            # então a geometria não precisa entrar no hash
+            hashes = pd.util.hash_pandas_object(
+                gdf.drop(columns=gdf.geometry.name), index=False
+            ).to_numpy()
+            is_new = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, seen_hashes)
+            gdf = gdf[is_new]
+            seen_hashes = np.concatenate([seen_hashes, hashes[is_new]])
+
+            if gdf.empty:
+                continue
+
+            # Adicionar metadados
+            gdf["data_source"] = "ANATEL"
+
+            # Inserir
+            gdf.to_postgis(
+                name="fibra_optica",
+                con=engine,
+                schema="geo",
+                if_exists="append",
+                index=False,
+            )
+            inserted += len(gdf)
+            logger.info(f"Registros lidos: {total_read} | inseridos: {inserted}")
+
+            # Estatísticas acumuladas por bloco
+            if "uf" in gdf.columns:
+                uf_counts = uf_counts.add(gdf["uf"].value_counts(), fill_value=0)
+            if "operadora" in gdf.columns:
+                op_counts = op_counts.add(gdf["operadora"].value_counts(), fill_value=0)
 
-        logger.success(f"✅ {len(gdf)} pontos de fibra ótica inseridos com sucesso!")
+        logger.success(f"✅ {inserted} pontos de fibra ótica inseridos com sucesso!")
 
         # Estatísticas
         logger.info("\n" + "=" * 80)
         logger.info("ESTATÍSTICAS")
         logger.info("=" * 80)
 
-        if "uf" in gdf.columns:
+        if "uf" in schema.names:
             logger.info("\nDistribuição por UF:")
-            uf_counts = gdf["uf"].value_counts()
-            for uf, count in uf_counts.items():
+            for uf, count in uf_counts.astype("int64").sort_values(ascending=False).items():
                 logger.info(f"  {uf}: {count}")
 
-        if "operadora" in gdf.columns:
+        if "operadora" in schema.names:
             logger.info("\nTop 10 operadoras:")
-            op_counts = gdf["operadora"].value_counts().head(10)
+            op_counts = op_counts.astype("int64").sort_values(ascending=False).head(10)
             for op, count in op_counts.items():
                 logger.info(f"  {op}: {count}")
 
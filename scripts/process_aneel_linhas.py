@@ -7,7 +7,10 @@ import sys
 from pathlib import Path
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import pyogrio
+import shapely
 from loguru import logger
 from sqlalchemy import create_engine
 
@@ -15,6 +18,14 @@ from sqlalchemy import create_engine
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.config import settings
+from scripts.etl_utils import USE_ARROW
+
+# Copy-on-write: filtros não copiam o GeoDataFrame inteiro; a cópia só acontece
+# (e apenas das colunas afetadas) quando um resultado é modificado
+pd.options.mode.copy_on_write = True
+
+# Projeção métrica usada no cálculo de extensão (SIRGAS 2000 / Brazil Polyconic)
+LENGTH_EPSG = 5880
 
 
 def setup_logging():
@@ -33,6 +44,38 @@ def setup_logging():
     )
 
 
+def linear_parts(geoms: np.ndarray) -> np.ndarray:
+    """
+    Mantém só as partes lineares de cada geometria
+
+    make_valid pode devolver pontos (linha de comprimento zero) ou GeometryCollection,
+    que a coluna LineString do PostGIS rejeitaria
+
+    Args:
+        geoms: Array de geometrias Shapely
+
+    Returns:
+        Array com LineString (uma parte), MultiLineString (várias) ou LineString vazia
+    """
+    # Dois níveis: a coleção pode conter MultiLineString
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    parts, sub_index = shapely.get_parts(parts, return_index=True)
+    index = index[sub_index]
+
+    is_line = shapely.get_type_id(parts) == shapely.GeometryType.LINESTRING
+    parts, index = parts[is_line], index[is_line]
+
+    result = np.full(len(geoms), shapely.from_wkt("LINESTRING EMPTY"), dtype=object)
+    if len(parts):
+        rows, group = np.unique(index, return_inverse=True)
+        lines = shapely.multilinestrings(parts, indices=group)
+        single = shapely.get_num_geometries(lines) == 1
+        lines[single] = shapely.get_geometry(lines[single], 0)
+        result[rows] = lines
+
+    return result
+
+
 def validate_gdf(gdf: gpd.GeoDataFrame, layer_name: str) -> gpd.GeoDataFrame:
     """Valida e limpa GeoDataFrame"""
     logger.info(f"Validando {layer_name}...")
@@ -40,19 +83,24 @@ def validate_gdf(gdf: gpd.GeoDataFrame, layer_name: str) -> gpd.GeoDataFrame:
     original_count = len(gdf)
     logger.info(f"Registros originais: {original_count}")
 
-    # Remover geometrias inválidas
-    invalid_geoms = ~gdf.geometry.is_valid
+    # Corrigir geometrias inválidas (vetorizado no GEOS, sem despacho por linha do pandas)
+    geoms = np.array(gdf.geometry.values, dtype=object)
+    invalid_geoms = ~shapely.is_valid(geoms)
     if invalid_geoms.any():
         logger.warning(
             f"Encontradas {invalid_geoms.sum()} geometrias inválidas. Tentando corrigir..."
         )
-        gdf.loc[invalid_geoms, "geometry"] = gdf.loc[invalid_geoms, "geometry"].buffer(0)
+        geoms[invalid_geoms] = linear_parts(shapely.make_valid(geoms[invalid_geoms]))
+        gdf[gdf.geometry.name] = geoms
 
-    # Remover geometrias vazias
-    gdf = gdf[~gdf.geometry.is_empty].copy()
+    # Remover geometrias vazias (inclusive as corrigidas sem nenhuma parte linear)
+    gdf = gdf[~shapely.is_empty(geoms)]
 
-    # Remover duplicatas
-    gdf = gdf.drop_duplicates()
+    # Remover duplicatas: geometria comparada pelo WKB (gerado em bloco no GEOS),
+    # sem hash/igualdade de objetos Shapely linha a linha
+    keys = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    keys["_wkb"] = shapely.to_wkb(np.array(gdf.geometry.values, dtype=object))
+    gdf = gdf[~keys.duplicated().to_numpy()]
 
     # Converter para EPSG:4326
     if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
@@ -91,10 +139,9 @@ def process_linhas_transmissao(gdb_path: str, layer_name: str = None) -> None:
     logger.info(f"Arquivo GDB: {gdb_path}")
 
     try:
-        # Listar camadas
-        import fiona
-
-        layers = fiona.listlayers(str(gdb_path))
+        # Listar camadas (com o tipo de geometria declarado de cada uma)
+        layer_types = dict(pyogrio.list_layers(str(gdb_path)))
+        layers = list(layer_types)
         logger.info(f"Camadas disponíveis: {layers}")
 
         # Detectar camada de linhas
@@ -113,10 +160,14 @@ def process_linhas_transmissao(gdb_path: str, layer_name: str = None) -> None:
 
         # Ler dados
         logger.info("Lendo dados...")
-        gdf = gpd.read_file(gdb_path, layer=layer_name)
+        gdf = gpd.read_file(gdb_path, layer=layer_name, engine="pyogrio", use_arrow=USE_ARROW)
 
         logger.info(f"Colunas disponíveis: {list(gdf.columns)}")
-        logger.info(f"Tipo de geometria: {gdf.geometry.type.unique()}")
+        logger.info(f"Tipo de geometria: {layer_types[layer_name]}")
+        # Tipos por registro exigem varrer todas as geometrias: só calculados se houver sink DEBUG
+        logger.opt(lazy=True).debug(
+            "Tipos de geometria nos registros: {}", lambda: gdf.geometry.geom_type.unique()
+        )
 
         # Validar
         gdf = validate_gdf(gdf, layer_name)
@@ -124,13 +175,12 @@ def process_linhas_transmissao(gdb_path: str, layer_name: str = None) -> None:
         # Calcular extensão se não existir
         if "extensao_km" not in gdf.columns:
             logger.info("Calculando extensão das linhas...")
-            # Converter para projeção métrica para cálculo preciso
-            gdf_metric = gdf.to_crs(epsg=3857)  # Web Mercator
-            gdf["extensao_km"] = gdf_metric.geometry.length / 1000
+            # Reprojetar só a geometria (sem copiar o GeoDataFrame) para uma projeção métrica
+            # adequada ao Brasil; Web Mercator superestima distâncias nessas latitudes
+            gdf["extensao_km"] = gdf.geometry.to_crs(epsg=LENGTH_EPSG).length.to_numpy() / 1000
 
         # Preparar para inserção
-        df_to_insert = gdf.copy()
-        df_to_insert["data_source"] = "ANEEL"
+        gdf["data_source"] = "ANEEL"
 
         # Conectar ao banco
         logger.info("Conectando ao banco de dados...")
@@ -138,7 +188,7 @@ def process_linhas_transmissao(gdb_path: str, layer_name: str = None) -> None:
 
         # Inserir
         logger.info("Inserindo dados no PostGIS...")
-        df_to_insert.to_postgis(
+        gdf.to_postgis(
             name="linhas_transmissao",
             con=engine,
             schema="geo",
@@ -146,22 +196,22 @@ def process_linhas_transmissao(gdb_path: str, layer_name: str = None) -> None:
             index=False,
         )
 
-        logger.success(f"✅ {len(df_to_insert)} linhas de transmissão inseridas com sucesso!")
+        logger.success(f"✅ {len(gdf)} linhas de transmissão inseridas com sucesso!")
 
         # Estatísticas
         logger.info("\n" + "=" * 80)
         logger.info("ESTATÍSTICAS")
         logger.info("=" * 80)
 
-        if "tensao_kv" in df_to_insert.columns:
+        if "tensao_kv" in gdf.columns:
             logger.info("\nDistribuição por tensão:")
-            tensao_counts = df_to_insert["tensao_kv"].value_counts().sort_index()
+            tensao_counts = gdf["tensao_kv"].value_counts().sort_index()
             for tensao, count in tensao_counts.items():
                 logger.info(f"  {tensao} kV: {count} linhas")
 
-        if "extensao_km" in df_to_insert.columns:
-            total_km = df_to_insert["extensao_km"].sum()
-            media_km = df_to_insert["extensao_km"].mean()
+        if "extensao_km" in gdf.columns:
+            total_km = gdf["extensao_km"].sum()
+            media_km = gdf["extensao_km"].mean()
             logger.info(f"\nExtensão total: {total_km:,.2f} km")
             logger.info(f"Extensão média: {media_km:,.2f} km")
 
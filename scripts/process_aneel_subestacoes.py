@@ -3,18 +3,56 @@ Script para processar dados de Subestações da ANEEL
 Lê arquivos Geodatabase (.gdb) e carrega no PostGIS
 """
 
+import glob
+import hashlib
+import os
+import re
+import shutil
 import sys
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import pyogrio
+import shapely
+from geoalchemy2 import Geometry
 from loguru import logger
+from pyproj import CRS, Transformer
 from sqlalchemy import create_engine
 
 # Adicionar diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.config import settings
+from scripts.etl_utils import USE_ARROW, copy_insert
+
+# Nomes de camada reconhecidos como subestações (trechos, sem diferenciar maiúsculas)
+LAYER_NAME_RE = re.compile(r"subestacao|subestacoes|substation|se", re.IGNORECASE)
+
+# Registros lidos da camada por lote e linhas por COPY na gravação de cada lote
+READ_BATCH_SIZE = 50000
+INSERT_CHUNK_SIZE = 10000
+# Threads de validação dos lotes (as funções do shapely 2 liberam o GIL no GEOS)
+VALIDATE_WORKERS = os.cpu_count() or 1
+# Cache dos lotes já validados (Parquet, um arquivo por lote), um diretório por camada e versão
+# do .gdb (caminho, tamanhos e datas de modificação)
+CACHE_DIR = Path("data/cache/aneel_subestacoes")
+
+# Faixas de tensão (kV) das estatísticas: intervalos fechados à direita, como no pd.cut
+TENSAO_BINS = np.array([0, 69, 138, 230, 500, 1000])
+TENSAO_LABELS = ["< 69kV", "69-138kV", "138-230kV", "230-500kV", "> 500kV"]
+
+# CRS de destino; comparado por equivalência, pois CRS só em WKT não devolvem código EPSG
+WGS84 = CRS.from_epsg(4326)
+
+# Transformers para EPSG:4326 por thread e CRS de origem, reusados entre lotes
+# (instâncias do pyproj não são thread-safe)
+_transformers = threading.local()
 
 
 def setup_logging():
@@ -33,6 +71,30 @@ def setup_logging():
     )
 
 
+def to_wgs84(geoms: np.ndarray, crs: CRS) -> np.ndarray:
+    """
+    Reprojeta as geometrias para EPSG:4326 em bloco
+
+    As coordenadas de todas as geometrias são transformadas em uma única
+    chamada ao PROJ, com um Transformer reusado entre lotes.
+
+    Args:
+        geoms: Array de geometrias Shapely
+        crs: CRS de origem
+
+    Returns:
+        Array de geometrias reprojetadas, na mesma ordem
+    """
+    cache = _transformers.__dict__
+    if crs not in cache:
+        cache[crs] = Transformer.from_crs(crs, 4326, always_xy=True)
+    transformer = cache[crs]
+
+    return shapely.transform(
+        geoms, lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1]))
+    )
+
+
 def validate_gdf(gdf: gpd.GeoDataFrame, layer_name: str) -> gpd.GeoDataFrame:
     """
     Valida e limpa GeoDataFrame
@@ -50,24 +112,30 @@ def validate_gdf(gdf: gpd.GeoDataFrame, layer_name: str) -> gpd.GeoDataFrame:
     original_count = len(gdf)
     logger.info(f"Registros originais: {original_count}")
 
-    # Remover geometrias inválidas
-    invalid_geoms = ~gdf.geometry.is_valid
-    if invalid_geoms.any():
-        logger.warning(
-            f"Encontradas {invalid_geoms.sum()} geometrias inválidas. Tentando corrigir..."
-        )
-        gdf.loc[invalid_geoms, "geometry"] = gdf.loc[invalid_geoms, "geometry"].buffer(0)
-
-    # Remover geometrias vazias
-    gdf = gdf[~gdf.geometry.is_empty].copy()
-
-    # Remover duplicatas
-    gdf = gdf.drop_duplicates()
-
-    # Converter para EPSG:4326 se necessário
-    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+    # Validade e vazio calculados uma única vez no GEOS, sobre o array de geometrias
+    geoms = np.array(gdf.geometry.values, dtype=object)
+    empty = shapely.is_empty(geoms)
+
+    # Corrigir geometrias inválidas com make_valid (feito para isso, ao contrário do
+    # buffer(0), que pode descartar partes); as vazias serão removidas de qualquer forma
+    fix = ~shapely.is_valid(geoms) & ~empty
+    if fix.any():
+        logger.warning(f"Encontradas {fix.sum()} geometrias inválidas. Tentando corrigir...")
+        geoms[fix] = shapely.make_valid(geoms[fix])
+        gdf[gdf.geometry.name] = geoms
+
+    # Remover geometrias vazias e duplicatas em uma única seleção: geometria comparada
+    # pelo WKB (gerado em bloco no GEOS), sem igualdade de objetos Shapely linha a linha
+    keys = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    keys["_wkb"] = shapely.to_wkb(geoms)
+    gdf = gdf[~empty & ~keys.duplicated().to_numpy()].copy()
+
+    # Converter para EPSG:4326 se necessário (depois da limpeza: só as geometrias mantidas
+    # passam pelo PROJ; ordem dos eixos ignorada, pois a transformação é sempre em x/y)
+    if gdf.crs is not None and not WGS84.equals(gdf.crs, ignore_axis_order=True):
         logger.info(f"Convertendo CRS de {gdf.crs} para EPSG:4326...")
-        gdf = gdf.to_crs(epsg=4326)
+        gdf[gdf.geometry.name] = to_wgs84(np.array(gdf.geometry.values, dtype=object), gdf.crs)
+        gdf.set_crs(epsg=4326, inplace=True, allow_override=True)
     elif gdf.crs is None:
         logger.warning("CRS não definido. Assumindo EPSG:4326")
         gdf.set_crs(epsg=4326, inplace=True)
@@ -80,13 +148,135 @@ def validate_gdf(gdf: gpd.GeoDataFrame, layer_name: str) -> gpd.GeoDataFrame:
     return gdf
 
 
-def process_subestacoes(gdb_path: str, layer_name: str = None) -> None:
+def gdb_fingerprint(gdb_path: Path) -> str:
+    """
+    Identifica o .gdb (um diretório de arquivos) e a versão do seu conteúdo
+
+    Args:
+        gdb_path: Caminho para o arquivo .gdb
+
+    Returns:
+        Hash do caminho absoluto e do nome, tamanho e mtime de cada arquivo
+    """
+    gdb_path = gdb_path.resolve()
+    paths = sorted(gdb_path.iterdir()) if gdb_path.is_dir() else [gdb_path]
+
+    digest = hashlib.blake2b(str(gdb_path).encode(), digest_size=8)
+    for path in paths:
+        stat = path.stat()
+        digest.update(f"\0{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def drop_seen_rows(df: pd.DataFrame, seen: Dict[int, List[tuple]]) -> pd.DataFrame:
+    """
+    Remove as linhas iguais a outras já inseridas (em qualquer lote) e registra as novas
+
+    O hash de 64 bits de cada linha só seleciona as candidatas: a linha é descartada
+    quando é igual a uma já registrada com o mesmo hash, e uma colisão não descarta
+    nada. A primeira ocorrência é a mantida.
+
+    Args:
+        df: Lote preparado (geometria em EWKB hexadecimal)
+        seen: Linhas já inseridas por hash; atualizado com as novas
+
+    Returns:
+        Lote sem as duplicatas
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy().tolist()
+    # Nulos (NaN, NaT, NA) como None: iguais entre si na comparação das tuplas
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+    keep = np.ones(len(df), dtype=bool)
+    for i, (row_hash, row) in enumerate(zip(hashes, rows)):
+        bucket = seen.setdefault(row_hash, [])
+        if row in bucket:
+            keep[i] = False
+        else:
+            bucket.append(row)
+    return df[keep]
+
+
+def tensao_band_counts(tensao: pd.Series) -> np.ndarray:
+    """
+    Conta os valores de tensão por faixa de TENSAO_BINS
+
+    Faixa de cada valor por busca binária nos limites (sem coluna categórica);
+    nulos e valores fora dos limites ficam de fora, como no pd.cut.
+
+    Args:
+        tensao: Tensões em kV
+
+    Returns:
+        Contagem por faixa, na ordem de TENSAO_LABELS
+    """
+    faixa = np.searchsorted(TENSAO_BINS, tensao.to_numpy(dtype=np.float64, na_value=np.nan))
+    faixa = faixa[(faixa >= 1) & (faixa < len(TENSAO_BINS))] - 1
+    return np.bincount(faixa, minlength=len(TENSAO_LABELS))
+
+
+def publish_cache(cache_tmp: Path, cache_dir: Path, layer_name: str) -> None:
+    """
+    Publica o cache completo de uma vez e descarta os das versões anteriores da camada
+
+    Args:
+        cache_tmp: Diretório com os lotes gravados
+        cache_dir: Diretório final (camada e versão do .gdb)
+        layer_name: Nome da camada
+    """
+    for stale in cache_dir.parent.glob(f"{glob.escape(layer_name)}-*"):
+        if stale != cache_tmp:
+            shutil.rmtree(stale, ignore_errors=True)
+    cache_tmp.rename(cache_dir)
+
+
+def prepare_batch(gdf: gpd.GeoDataFrame, layer_name: str) -> pd.DataFrame:
+    """
+    Valida um lote e o prepara para o COPY
+
+    Args:
+        gdf: Lote lido da camada
+        layer_name: Nome da camada (para logs)
+
+    Returns:
+        DataFrame com metadados e geometria em EWKB hexadecimal (com SRID)
+    """
+    gdf = validate_gdf(gdf, layer_name)
+
+    # Adicionar metadados
+    gdf["data_source"] = "ANEEL"
+
+    # Geometria como EWKB hexadecimal (com SRID), gerado em bloco no GEOS: o COPY
+    # a entrega ao PostGIS sem INSERT nem bind de parâmetros por linha
+    geometry_name = gdf.geometry.name
+    df = pd.DataFrame(gdf.drop(columns=geometry_name))
+    df[geometry_name] = shapely.to_wkb(
+        shapely.set_srid(np.array(gdf.geometry.values, dtype=object), 4326),
+        hex=True,
+        include_srid=True,
+    )
+    return df
+
+
+def process_subestacoes(
+    gdb_path: str,
+    layer_name: str = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    where: Optional[str] = None,
+    use_cache: bool = True,
+) -> None:
     """
     Processa subestações de arquivo GDB da ANEEL
 
+    Os filtros são executados pelo próprio driver do GDAL: registros fora
+    deles não chegam a ser lidos.
+
     Args:
         gdb_path: Caminho para o arquivo .gdb
         layer_name: Nome da camada (opcional, tenta detectar automaticamente)
+        bbox: Recorte espacial (minx, miny, maxx, maxy) no CRS da camada (opcional)
+        where: Filtro de atributos em SQL do OGR, ex: "UF IN ('SP', 'RJ')" (opcional)
+        use_cache: Reusar/gravar o cache de lotes validados (ignorado com filtros)
     """
     logger.info("=" * 80)
     logger.info("PROCESSAMENTO DE SUBESTAÇÕES - ANEEL")
@@ -103,23 +293,14 @@ def process_subestacoes(gdb_path: str, layer_name: str = None) -> None:
 
     try:
         # Listar camadas disponíveis
-        import fiona
-
-        layers = fiona.listlayers(str(gdb_path))
+        layers = [name for name, _ in pyogrio.list_layers(str(gdb_path))]
         logger.info(f"Camadas disponíveis: {layers}")
 
         # Detectar camada de subestações
         if layer_name is None:
             # Tentar encontrar camada com nome relacionado a subestações
-            possible_names = [
-                "subestacao",
-                "subestacoes",
-                "substation",
-                "substations",
-                "se",
-            ]
             layer_name = next(
-                (l for l in layers if any(name in l.lower() for name in possible_names)),
+                (l for l in layers if LAYER_NAME_RE.search(l)),
                 layers[0] if layers else None,
             )
 
@@ -129,15 +310,11 @@ def process_subestacoes(gdb_path: str, layer_name: str = None) -> None:
 
         logger.info(f"Usando camada: {layer_name}")
 
-        # Ler GeoDataFrame
-        logger.info("Lendo dados...")
-        gdf = gpd.read_file(gdb_path, layer=layer_name)
-
-        logger.info(f"Colunas disponíveis: {list(gdf.columns)}")
-        logger.info(f"Tipo de geometria: {gdf.geometry.type.unique()}")
-
-        # Validar e limpar dados
-        gdf = validate_gdf(gdf, layer_name)
+        # Metadados da camada (total, colunas e tipo) sem ler os registros
+        info = pyogrio.read_info(gdb_path, layer=layer_name)
+        logger.info(f"Total de registros: {info['features']}")
+        logger.info(f"Colunas disponíveis: {list(info['fields'])}")
+        logger.info(f"Tipo de geometria: {info['geometry_type']}")
 
         # Mapear colunas (ajustar conforme estrutura real do arquivo)
         # NOTA: Você precisará ajustar isso baseado nas colunas reais do seu arquivo
@@ -146,27 +323,108 @@ def process_subestacoes(gdb_path: str, layer_name: str = None) -> None:
             # 'NOME_CAMPO_GDB': 'nome_campo_banco',
         }
 
-        # Preparar DataFrame para inserção
-        df_to_insert = gdf.copy()
-
-        # Adicionar metadados
-        df_to_insert["data_source"] = "ANEEL"
-
         # Criar engine de conexão
         logger.info("Conectando ao banco de dados...")
         engine = create_engine(settings.DATABASE_URL)
 
-        # Inserir no banco
-        logger.info("Inserindo dados no PostGIS...")
-        df_to_insert.to_postgis(
-            name="subestacoes",
-            con=engine,
-            schema="geo",
-            if_exists="append",  # 'replace' para sobrescrever, 'append' para adicionar
-            index=False,
-        )
-
-        logger.success(f"✅ {len(df_to_insert)} subestações inseridas com sucesso!")
+        inserted = 0
+        # Linhas já inseridas, por hash: validate_gdf só remove duplicatas dentro do lote,
+        # as que se repetem entre lotes são removidas aqui
+        seen_rows: Dict[int, List[tuple]] = {}
+        uf_counts = pd.Series(dtype="int64")
+        tensao_counts: Optional[np.ndarray] = None
+        pending: Deque[Future] = deque()
+
+        # Cache só para a camada completa: com filtros o resultado depende dos parâmetros.
+        # A chave inclui a versão do .gdb: outro arquivo, ou o mesmo alterado, não o reusa
+        cache_dir = CACHE_DIR / f"{layer_name}-{gdb_fingerprint(gdb_path)}"
+        cache_tmp = cache_dir.with_name(f"{cache_dir.name}.tmp")
+        use_cache = use_cache and bbox is None and where is None
+        cache_fresh = use_cache and cache_dir.is_dir()
+        write_cache = use_cache and not cache_fresh
+        if write_cache:
+            shutil.rmtree(cache_tmp, ignore_errors=True)
+            cache_tmp.mkdir(parents=True)
+
+        def insert(df: pd.DataFrame) -> None:
+            nonlocal inserted, uf_counts, tensao_counts
+
+            # Lotes inseridos na ordem de leitura: a primeira ocorrência é a mantida
+            before = len(df)
+            df = drop_seen_rows(df, seen_rows)
+            if len(df) < before:
+                logger.info(f"Removendo {before - len(df)} duplicatas de lotes anteriores")
+
+            if write_cache:
+                df.to_parquet(cache_tmp / f"part-{inserted:012d}.parquet", index=False)
+
+            # Inserir no banco
+            df.to_sql(
+                "subestacoes",
+                engine,
+                schema="geo",
+                if_exists="append",  # 'replace' para sobrescrever, 'append' para adicionar
+                index=False,
+                chunksize=INSERT_CHUNK_SIZE,
+                dtype={"geometry": Geometry("POINT", srid=4326)},
+                method=copy_insert,
+            )
+            inserted += len(df)
+            logger.info(f"Lote inserido | Lidos: {offset} | Inseridos: {inserted}")
+
+            # Estatísticas acumuladas lote a lote
+            if "uf" in df.columns:
+                uf_counts = uf_counts.add(df["uf"].value_counts(), fill_value=0)
+            if "tensao_kv" in df.columns:
+                counts = tensao_band_counts(df["tensao_kv"])
+                tensao_counts = counts if tensao_counts is None else tensao_counts + counts
+
+        offset = 0
+        if cache_fresh:
+            # Lotes já validados e em EWKB: sem leitura do GDAL nem validação
+            logger.info(f"Lendo lotes validados do cache: {cache_dir}")
+            for part in sorted(cache_dir.glob("*.parquet")):
+                df = pd.read_parquet(part)
+                offset += len(df)
+                insert(df)
+
+        else:
+            # Ler, validar e inserir em lotes: a validação roda em paralelo nas threads,
+            # enquanto a leitura e o COPY seguem na thread principal; no máximo
+            # VALIDATE_WORKERS lotes ficam em memória.
+            # Com filtro, o total filtrado não é conhecido de antemão: a leitura termina
+            # no primeiro lote incompleto
+            logger.info("Lendo dados e inserindo no PostGIS...")
+            with ThreadPoolExecutor(max_workers=VALIDATE_WORKERS) as pool:
+                while offset < info["features"]:
+                    gdf = pyogrio.read_dataframe(
+                        gdb_path,
+                        layer=layer_name,
+                        skip_features=offset,
+                        max_features=READ_BATCH_SIZE,
+                        bbox=bbox,
+                        where=where,
+                        use_arrow=USE_ARROW,
+                    )
+                    batch_size = len(gdf)
+                    offset += batch_size
+
+                    if len(pending) >= VALIDATE_WORKERS:
+                        insert(pending.popleft().result())
+                    pending.append(pool.submit(prepare_batch, gdf, layer_name))
+
+                    if batch_size < READ_BATCH_SIZE:
+                        break
+
+                while pending:
+                    insert(pending.popleft().result())
+
+        # Cache completo: publicado de uma vez (um cache parcial nunca é reusado); os das
+        # versões anteriores da camada são descartados
+        if write_cache:
+            publish_cache(cache_tmp, cache_dir, layer_name)
+
+        logger.success(f"✅ {inserted} subestações inseridas com sucesso!")
 
         # Estatísticas
         logger.info("\n" + "=" * 80)
@@ -174,23 +432,21 @@ def process_subestacoes(gdb_path: str, layer_name: str = None) -> None:
         logger.info("=" * 80)
 
         # Contar por UF (se disponível)
-        if "uf" in df_to_insert.columns:
-            logger.info("\nDistribuição por UF:")
-            uf_counts = df_to_insert["uf"].value_counts()
-            for uf, count in uf_counts.items():
-                logger.info(f"  {uf}: {count}")
+        if not uf_counts.empty:
+            uf_counts = uf_counts.astype("int64").sort_values(ascending=False)
+            # Bloco inteiro numa única mensagem: um registro formatado/escrito, não um por UF
+            logger.info(
+                "\nDistribuição por UF:\n"
+                + "\n".join(f"  {uf}: {count}" for uf, count in uf_counts.items())
+            )
 
         # Contar por tensão (se disponível)
-        if "tensao_kv" in df_to_insert.columns:
-            logger.info("\nDistribuição por faixa de tensão:")
-            df_to_insert["faixa_tensao"] = pd.cut(
-                df_to_insert["tensao_kv"],
-                bins=[0, 69, 138, 230, 500, 1000],
-                labels=["< 69kV", "69-138kV", "138-230kV", "230-500kV", "> 500kV"],
+        if tensao_counts is not None:
+            order = np.argsort(-tensao_counts, kind="stable")
+            logger.info(
+                "\nDistribuição por faixa de tensão:\n"
+                + "\n".join(f"  {TENSAO_LABELS[i]}: {tensao_counts[i]}" for i in order)
             )
-            tensao_counts = df_to_insert["faixa_tensao"].value_counts()
-            for faixa, count in tensao_counts.items():
-                logger.info(f"  {faixa}: {count}")
 
         engine.dispose()
 
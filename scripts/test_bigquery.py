@@ -6,12 +6,22 @@ basedosdados usando o projeto causal-tracker-484821-f1 para billing.
 """
 
 import os
+from functools import lru_cache
 
 from google.cloud import bigquery
 
 # Configurar credenciais
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/secrets/gpc-service-account.json"
 
+# Projeto de billing das queries
+BILLING_PROJECT = "causal-tracker-484821-f1"
+
+
+@lru_cache(maxsize=None)
+def get_client() -> bigquery.Client:
+    """Cliente BigQuery do módulo, criado uma única vez (credenciais negociadas uma vez)."""
+    return bigquery.Client(project=BILLING_PROJECT)
+
 
 def test_bigquery_connection():
     """Testa conexão com BigQuery e acesso ao projeto público basedosdados."""
@@ -22,7 +32,7 @@ def test_bigquery_connection():
 
     # 1. Criar cliente (billing no seu projeto)
     print("\n1. Criando cliente BigQuery...")
-    client = bigquery.Client(project="causal-tracker-484821-f1")
+    client = get_client()
     print(f"   ✅ Cliente criado | Projeto de billing: {client.project}")
 
     # 2. Teste simples
@@ -53,12 +63,14 @@ def test_bigquery_connection():
     job_config = bigquery.QueryJobConfig(use_query_cache=False)
     job = client.query(query_basedosdados, job_config=job_config)
 
-    # Aguardar resultado
-    df = job.to_dataframe()
+    # Aguardar resultado em Arrow (sem materializar DataFrame para poucas linhas;
+    # sem Storage API, cuja sessão custa mais que o resultado)
+    table = job.to_arrow(create_bqstorage_client=False)
 
     print(f"   ✅ Query executada com sucesso!")
     print(f"   📊 Resultados encontrados:")
-    print(df.to_string(index=False))
+    for row in table.to_pylist():
+        print(f"      {row}")
     print(f"\n   📈 Métricas:")
     bytes_processed = job.total_bytes_processed if job.total_bytes_processed is not None else 0
     print(f"      - Bytes processados: {bytes_processed:,}")
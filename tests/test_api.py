@@ -1,27 +1,121 @@
-from fastapi.testclient import TestClient
+import pytest
 
+from app import main
 from app.main import app
 
+# Todos os testes da API rodam com o banco mockado
+pytestmark = pytest.mark.usefixtures("mock_db_connection")
 
-def test_read_root():
+
+def test_read_root(client):
     """
     Verifica se o endpoint raiz está respondendo corretamente.
     """
-    # Instanciando cliente dentro do teste para isolamento
-    with TestClient(app) as client:
-        response = client.get("/")
-        assert response.status_code == 200
-        assert "DataZone Energy API" in response.json()["message"]
+    response = client.get("/")
+    assert response.status_code == 200
+    assert "DataZone Energy API" in response.json()["message"]
 
 
-def test_health_check_endpoint():
+def test_health_check_endpoint(client):
     """
     Verifica se o endpoint de 'health check' está funcionando.
     O banco de dados deve aparecer como 'connected' devido ao mock no conftest.py.
     """
-    with TestClient(app) as client:
-        response = client.get("/health")
-        assert response.status_code == 200
-        data = response.json()
-        assert data["status"] == "healthy"
-        assert data["database"] == "connected"
+    response = client.get("/health")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "healthy"
+    assert data["database"] == "connected"
+
+
+def test_health_check_reuses_recent_status(client, monkeypatch):
+    """
+    Probes em sequência dentro de HEALTH_CACHE_SECONDS consultam o banco uma única vez.
+    """
+    chamadas = []
+    monkeypatch.setattr(main, "check_db_connection", lambda: chamadas.append(1) or True)
+    monkeypatch.setitem(main._health_cache, "ts", float("-inf"))
+
+    assert client.get("/health").status_code == 200
+    assert client.get("/health").status_code == 200
+
+    assert len(chamadas) == 1
+
+
+def test_mvt_tile_out_of_bounds(client):
+    """
+    Tiles com x/y fora do nível de zoom devem ser rejeitados antes de consultar o banco.
+    """
+    response = client.get("/api/v1/fibra/mvt/1/5/0")
+    assert response.status_code == 400
+
+
+def test_db_error_returns_generic_500(client):
+    """
+    Erros do SQLAlchemy são tratados pelo handler global, sem expor detalhes da query.
+    """
+    from sqlalchemy.exc import OperationalError
+
+    from app.core.database import get_db
+
+    async def failing_db():
+        raise OperationalError("SELECT 1", {}, Exception("conexão recusada"))
+        yield  # pragma: no cover
+
+    app.dependency_overrides[get_db] = failing_db
+    try:
+        response = client.get("/api/v1/fibra/1")
+    finally:
+        app.dependency_overrides.pop(get_db)
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Erro ao consultar o banco de dados"
+    assert "conexão recusada" not in response.text
+
+
+def test_stream_db_error_returns_500(client, monkeypatch):
+    """
+    Falhas na query das Features acontecem antes do streaming e viram 500, não um 200 truncado.
+    """
+    from unittest.mock import AsyncMock
+
+    from sqlalchemy.exc import OperationalError
+
+    from app.core.database import get_db
+
+    class FailingSession:
+        async def stream(self, stmt):
+            raise OperationalError("SELECT 1", {}, Exception("conexão recusada"))
+
+        async def close(self):
+            pass
+
+    async def fake_db():
+        yield None
+
+    monkeypatch.setattr("app.api.v1.endpoints.fibra.get_layer_version", AsyncMock(return_value=""))
+    monkeypatch.setattr("app.utils.geo_utils.AsyncSessionLocal", FailingSession)
+    app.dependency_overrides[get_db] = fake_db
+    try:
+        response = client.get("/api/v1/fibra")
+    finally:
+        app.dependency_overrides.pop(get_db)
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Erro ao consultar o banco de dados"
+
+
+def test_camadas_requires_valid_bbox(client):
+    """
+    O endpoint combinado valida o bbox antes de consultar o banco.
+    """
+    response = client.get("/api/v1/camadas", params={"bbox": "-50,-25,-30,-10"})
+    assert response.status_code == 400
+
+
+def test_zoneamento_mvt_out_of_bounds(client):
+    """
+    Tiles de zoneamento fora da grade do nível de zoom devem ser rejeitados.
+    """
+    response = client.get("/api/v1/zoneamento-sp/mvt/1/2/0")
+    assert response.status_code == 400
@@ -0,0 +1,54 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.cache import etag_matches, get_cached, get_layer_version, make_cache_key, make_etag
+
+
+def test_make_cache_key_ignores_param_order():
+    """
+    A mesma consulta com parâmetros em outra ordem deve gerar a mesma chave.
+    """
+    key_a = make_cache_key("fibra", [("uf", "SP"), ("limit", "100")])
+    key_b = make_cache_key("fibra", [("limit", "100"), ("uf", "SP")])
+
+    assert key_a == key_b
+    assert key_a.startswith("geo:fibra:")
+    assert key_a != make_cache_key("linhas", [("uf", "SP"), ("limit", "100")])
+
+
+def test_get_cached_disabled_returns_none():
+    """
+    Com ENABLE_REDIS_CACHE desligado o cache nunca é consultado.
+    """
+    assert asyncio.run(get_cached("geo:fibra:qualquer")) is None
+
+
+def test_etag_matches_accepts_list_and_wildcard():
+    """
+    If-None-Match pode trazer vários ETags separados por vírgula ou '*'.
+    """
+    etag = make_etag("geo:fibra:abc")
+
+    assert etag.startswith('W/"')
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'W/"outro", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('W/"outro"', etag)
+
+
+def test_get_layer_version_uses_table_counters():
+    """
+    A versão vem dos contadores de escrita da tabela, sem consultar as linhas da camada.
+    """
+    from app.models.subestacao import Subestacao
+
+    db = AsyncMock()
+    db.execute.return_value = MagicMock(first=MagicMock(return_value=(16384, 120, 3, 1)))
+
+    assert asyncio.run(get_layer_version(db, Subestacao)) == "16384:120:3:1"
+    assert db.execute.call_args.args[1] == {"table_name": "geo.subestacoes"}
+
+    # Tabela ainda não criada
+    db.execute.return_value = MagicMock(first=MagicMock(return_value=None))
+    assert asyncio.run(get_layer_version(db, Subestacao)) == ""
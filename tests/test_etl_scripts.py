@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from scripts.process_aneel_linhas import linear_parts
+from scripts.process_aneel_subestacoes import (
+    TENSAO_BINS,
+    TENSAO_LABELS,
+    drop_seen_rows,
+    gdb_fingerprint,
+    publish_cache,
+    tensao_band_counts,
+)
+
+
+def test_linear_parts_keeps_only_lines():
+    """
+    Pontos e polígonos de um make_valid são descartados; uma parte vira LineString.
+    """
+    geoms = shapely.from_wkt(
+        [
+            "LINESTRING (0 0, 1 1)",
+            "GEOMETRYCOLLECTION (POINT (0 0), LINESTRING (0 0, 1 0))",
+            "GEOMETRYCOLLECTION (MULTILINESTRING ((0 0, 1 0), (2 2, 3 3)), POINT (5 5))",
+            "POINT (1 1)",
+        ]
+    )
+
+    result = linear_parts(np.array(geoms, dtype=object))
+
+    assert [g.wkt for g in result] == [
+        "LINESTRING (0 0, 1 1)",
+        "LINESTRING (0 0, 1 0)",
+        "MULTILINESTRING ((0 0, 1 0), (2 2, 3 3))",
+        "LINESTRING EMPTY",
+    ]
+
+
+def test_drop_seen_rows_removes_duplicates_across_batches():
+    """
+    Linhas repetidas de lotes anteriores saem (nulos incluídos); a primeira ocorrência fica.
+    """
+    seen = {}
+    first = pd.DataFrame({"nome": ["SE A", "SE B"], "tensao_kv": [138.0, np.nan]})
+    second = pd.DataFrame({"nome": ["SE B", "SE C"], "tensao_kv": [np.nan, 69.0]})
+
+    assert len(drop_seen_rows(first, seen)) == 2
+    assert drop_seen_rows(second, seen)["nome"].tolist() == ["SE C"]
+
+
+def test_drop_seen_rows_keeps_rows_on_hash_collision():
+    """
+    Um hash igual com conteúdo diferente (colisão) não descarta a linha.
+    """
+    df = pd.DataFrame({"nome": ["SE A"], "tensao_kv": [138.0]})
+    row_hash = pd.util.hash_pandas_object(df, index=False).iloc[0]
+    seen = {int(row_hash): [("SE Z", 500.0)]}
+
+    assert drop_seen_rows(df, seen)["nome"].tolist() == ["SE A"]
+
+
+def test_tensao_band_counts_matches_pd_cut():
+    """
+    A contagem por busca binária deve ser igual à do pd.cut (nulos e fora das faixas excluídos).
+    """
+    tensao = pd.Series([0, 13.8, 69, 69.1, 138, 230, 345, 500, 750, 1000, 1200, -5, None])
+
+    expected = pd.cut(tensao, bins=TENSAO_BINS, labels=TENSAO_LABELS).value_counts(sort=False)
+
+    assert tensao_band_counts(tensao).tolist() == expected.tolist()
+
+
+def test_gdb_fingerprint_changes_with_content(tmp_path):
+    """
+    O fingerprint muda quando um arquivo do .gdb é alterado.
+    """
+    gdb = tmp_path / "camada.gdb"
+    gdb.mkdir()
+    table = gdb / "a00000001.gdbtable"
+    table.write_bytes(b"v1")
+    before = gdb_fingerprint(gdb)
+
+    table.write_bytes(b"v2 maior")
+    os.utime(table, ns=(0, 123))
+
+    assert gdb_fingerprint(gdb) != before
+    assert gdb_fingerprint(gdb) == gdb_fingerprint(gdb)
+
+
+def test_publish_cache_replaces_previous_versions(tmp_path):
+    """
+    O cache publicado substitui os das versões anteriores da mesma camada, e só dela.
+    """
+    (tmp_path / "SUB[1]-antigo").mkdir()
+    (tmp_path / "OUTRA-antigo").mkdir()
+    cache_tmp = tmp_path / "SUB[1]-novo.tmp"
+    cache_tmp.mkdir()
+    (cache_tmp / "part-000000000000.parquet").write_bytes(b"")
+
+    publish_cache(cache_tmp, tmp_path / "SUB[1]-novo", "SUB[1]")
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["OUTRA-antigo", "SUB[1]-novo"]
+    assert (tmp_path / "SUB[1]-novo" / "part-000000000000.parquet").exists()
@@ -0,0 +1,25 @@
+import csv
+import io
+
+from scripts.etl_utils import COPY_NULL, copy_rows
+
+
+class FakeCursor:
+    """Cursor que guarda o comando e o conteúdo enviados ao COPY."""
+
+    def copy_expert(self, sql, buffer):
+        self.sql = sql
+        self.rows = list(csv.reader(io.StringIO(buffer.read())))
+
+
+def test_copy_rows_distinguishes_null_from_empty_string():
+    """
+    None vai como o marcador de nulo do COPY; a string vazia segue como texto vazio.
+    """
+    cursor = FakeCursor()
+
+    copy_rows(cursor, "geo.tabela", ["nome", "zona"], [("", None), ("A", "ZM")])
+
+    assert f"NULL '{COPY_NULL}'" in cursor.sql
+    assert cursor.sql.startswith('COPY geo.tabela ("nome", "zona") FROM STDIN')
+    assert cursor.rows == [["", COPY_NULL], ["A", "ZM"]]
@@ -0,0 +1,193 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import column, select, table
+from sqlalchemy.dialects import postgresql
+
+from app.utils.geo_utils import (
+    bbox_filter,
+    feature_collection_query,
+    row_to_feature,
+    row_to_feature_bytes,
+    stream_feature_collection,
+)
+
+
+def compile_sql(query):
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+def test_feature_collection_query_aggregates_in_db():
+    """
+    A FeatureCollection deve ser montada pelo PostgreSQL em uma única linha.
+    """
+    camada = table("camada", column("id"), column("nome"), column("geometry"))
+    query = select(camada.c.id, camada.c.nome, camada.c.geometry).limit(10)
+
+    sql = compile_sql(feature_collection_query(query))
+
+    assert "json_agg(json_build_object(" in sql
+    assert "to_jsonb(t) -" in sql
+    assert "CAST(t.geometry AS JSON)" in sql
+    assert "LIMIT" in sql
+
+
+def test_bbox_filter_uses_index_operator():
+    """
+    O filtro por bbox deve sempre incluir o operador && (índice GIST).
+    """
+    camada = table("camada", column("geometry"))
+    envelope = column("envelope")
+
+    completo = compile_sql(bbox_filter(camada.c.geometry, envelope))
+    somente_mbr = compile_sql(bbox_filter(camada.c.geometry, envelope, bbox_only=True))
+
+    assert "camada.geometry && envelope" in completo
+    assert "ST_Intersects" in completo
+    assert "camada.geometry && envelope" in somente_mbr
+    assert "ST_Intersects" not in somente_mbr
+
+
+def test_stream_feature_collection_builds_valid_json(monkeypatch):
+    """
+    As Features geradas pelo banco devem ser unidas em uma FeatureCollection válida.
+    """
+
+    class FakeRows:
+        def __init__(self, values):
+            self.values = iter(values)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self.values)
+            except StopIteration:
+                raise StopAsyncIteration
+
+        async def fetchone(self):
+            return next(self.values, None)
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+        async def close(self):
+            pass
+
+        async def stream(self, stmt):
+            return FakeRows(
+                [('{"type": "Feature", "id": 1}', 1), ('{"type": "Feature", "id": 2}', 2)]
+            )
+
+    monkeypatch.setattr("app.utils.geo_utils.AsyncSessionLocal", FakeSession)
+
+    camada = table("camada", column("id"), column("geometry"))
+    query = select(camada.c.id, camada.c.geometry)
+
+    async def consume():
+        chunks = await stream_feature_collection(query, id_column="id")
+        return b"".join([chunk async for chunk in chunks])
+
+    payload = json.loads(asyncio.run(consume()))
+
+    assert payload["type"] == "FeatureCollection"
+    assert [feature["id"] for feature in payload["features"]] == [1, 2]
+    assert payload["next_cursor"] == 2
+
+
+def test_stream_feature_collection_includes_metadata(monkeypatch):
+    """
+    Os metadados são anexados ao final, com a contagem de Features enviadas.
+    """
+
+    class FakeRows:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise StopAsyncIteration
+
+        async def fetchone(self):
+            return None
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+        async def close(self):
+            pass
+
+        async def stream(self, stmt):
+            return FakeRows()
+
+    monkeypatch.setattr("app.utils.geo_utils.AsyncSessionLocal", FakeSession)
+
+    camada = table("camada", column("id"), column("geometry"))
+    query = select(camada.c.id, camada.c.geometry)
+
+    async def consume():
+        chunks = await stream_feature_collection(query, metadata={"limit": 10})
+        return b"".join([chunk async for chunk in chunks])
+
+    payload = json.loads(asyncio.run(consume()))
+
+    assert payload["features"] == []
+    assert payload["metadata"] == {"limit": 10, "count": 0}
+
+
+def test_row_to_feature_bytes_keeps_geometry_and_converts_types():
+    """
+    A geometria do PostGIS é inserida como está e Decimal/datetime são serializados.
+    """
+    geometry = '{"type":"Point","coordinates":[-46.6333,-23.5505]}'
+    row = (1, Decimal("138.5"), datetime(2024, 1, 2, 3, 4, 5), geometry)
+
+    feature = json.loads(row_to_feature_bytes(row, ("id", "tensao_kv", "created_at")))
+
+    assert feature["geometry"] == json.loads(geometry)
+    assert feature["properties"] == {
+        "id": 1,
+        "tensao_kv": 138.5,
+        "created_at": "2024-01-02T03:04:05",
+    }
+
+
+def test_row_to_feature_bytes_aware_datetime_matches_isoformat():
+    """
+    Datas com fuso (ex: dt_atualizacao) devem sair iguais ao antigo isoformat().
+    """
+    dt_atualizacao = datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone(timedelta(hours=-3)))
+    row = ("1", dt_atualizacao, None)
+
+    feature = json.loads(row_to_feature_bytes(row, ("id_original", "dt_atualizacao")))
+
+    assert feature["geometry"] is None
+    assert feature["properties"]["dt_atualizacao"] == dt_atualizacao.isoformat()
+
+
+def test_row_to_feature_uses_db_geojson_without_shapely():
+    """
+    Geometria já em GeoJSON (ST_AsGeoJSON) é usada direto; datas viram ISO.
+    """
+
+    class FakeRow:
+        _mapping = {
+            "nome": "SE Norte",
+            "created_at": datetime(2024, 1, 2, 3, 4, 5),
+            "geometry": '{"type":"Point","coordinates":[-46.6,-23.5]}',
+        }
+
+    feature = row_to_feature(FakeRow())
+
+    assert feature["geometry"] == {"type": "Point", "coordinates": [-46.6, -23.5]}
+    assert feature["properties"] == {"nome": "SE Norte", "created_at": "2024-01-02T03:04:05"}
@@ -0,0 +1,220 @@
+import base64
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+from app.config import settings
+from app.core.security import (
+    KDF_SALT,
+    LEGACY_KDF_ITERATIONS,
+    SecurityManager,
+    _derive_fernet,
+    derive_keys,
+    parse_bbox,
+    round_coordinates,
+    sanitize_inputs,
+    security,
+)
+
+
+def test_derived_key_is_reused_across_instances():
+    """
+    A derivação PBKDF2 deve rodar uma única vez por segredo.
+    """
+    outro = SecurityManager()
+
+    assert outro._fernet is security._fernet
+    assert _derive_fernet.cache_info().hits >= 1
+
+
+def test_encrypt_decrypt_roundtrip():
+    """
+    Dados criptografados devem voltar ao valor original.
+    """
+    token = security.encrypt("dado sensível")
+
+    assert token != "dado sensível"
+    assert security.decrypt(token) == "dado sensível"
+    assert security.decrypt("token-invalido") == ""
+
+
+def test_optional_decrypt_cache(monkeypatch):
+    """
+    Com DECRYPT_CACHE_SIZE > 0, tokens repetidos não passam de novo pela cifra.
+    """
+    monkeypatch.setattr(settings, "DECRYPT_CACHE_SIZE", 8)
+    gerenciador = SecurityManager()
+    token = gerenciador.encrypt("dado")
+
+    assert gerenciador.decrypt(token) == "dado"
+    assert gerenciador.decrypt(token) == "dado"
+    assert gerenciador.decrypt("token-invalido") == ""
+    assert gerenciador._decrypt_cached.cache_info().hits == 1
+    assert gerenciador._decrypt_cached.cache_info().currsize == 1
+
+    gerenciador.clear_decrypt_cache()
+    assert gerenciador._decrypt_cached.cache_info().currsize == 0
+    assert security._decrypt_cached is None
+
+
+def test_encrypt_bytes_roundtrip():
+    """
+    A API de bytes não passa por base64 nem por encode/decode.
+    """
+    token = security.encrypt_bytes(b"\x00\xffdado")
+
+    assert security.decrypt_bytes(token) == b"\x00\xffdado"
+    assert security.decrypt_bytes(b"invalido") == b""
+
+
+def test_legacy_key_data_still_readable():
+    """
+    Dados criptografados com a chave de 100k iterações (PBKDF2HMAC) ainda devem abrir.
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(), length=32, salt=KDF_SALT, iterations=LEGACY_KDF_ITERATIONS
+    )
+    token = Fernet(base64.urlsafe_b64encode(kdf.derive(b"segredo"))).encrypt(b"valor")
+
+    assert _derive_fernet("segredo").decrypt(token) == b"valor"
+
+
+def test_fernet_data_still_readable():
+    """
+    Tokens Fernet gravados antes do AES-GCM ainda devem abrir.
+    """
+    token = security._fernet.encrypt(b"valor")
+
+    # Formato antigo (base64 sobre o token Fernet) e token Fernet direto
+    assert security.decrypt(base64.urlsafe_b64encode(token).decode()) == "valor"
+    assert security.decrypt(token.decode("ascii")) == "valor"
+
+
+def test_derive_keys_parallel_keeps_order():
+    """
+    As chaves derivadas em paralelo devem sair na ordem dos pedidos.
+    """
+    chaves = derive_keys([("a", 1000), ("b", 1000), ("a", 1000)])
+
+    assert chaves[0] == chaves[2]
+    assert chaves[0] != chaves[1]
+
+
+def test_sanitize_sql_input_removes_dangerous_sequences():
+    """
+    Sequências perigosas são removidas sem diferenciar maiúsculas.
+    """
+    assert security.sanitize_sql_input("ZEPAM'; drop--") == "ZEPAM' drop"
+    assert security.sanitize_sql_input("exec xp_cmd /* */ ExEcUtE") == " cmd   "
+    assert len(security.sanitize_sql_input("a" * 5000)) == 1000
+    assert security.sanitize_sql_input(42) == 42
+
+
+def test_round_coordinates_multipolygon():
+    """
+    Anéis de polígonos são arredondados em bloco preservando o aninhamento.
+    """
+    coords = [[[[-46.1234567, -23.7654321], [-46.1, -23.2], [-46.1234567, -23.7654321]]]]
+
+    assert round_coordinates(coords) == [
+        [[[-46.123457, -23.765432], [-46.1, -23.2], [-46.123457, -23.765432]]]
+    ]
+    assert round_coordinates([-46.1234567, -23.7654321], 3) == [-46.123, -23.765]
+    assert round_coordinates([[1.23456789, 2.0], [3.0]], 2) == [[1.23, 2.0], [3.0]]
+    assert round_coordinates([]) == []
+
+
+def test_sanitize_geojson_output_removes_sensitive_fields():
+    """
+    Campos sensíveis saem das propriedades e as coordenadas são arredondadas.
+    """
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [-46.1234567, -23.7654321]},
+                "properties": {"nome": "SE Norte", "senha": "x", "data_source": "ANEEL"},
+            },
+            {"type": "Feature", "geometry": None, "properties": None},
+        ],
+    }
+
+    resultado = security.sanitize_geojson_output(geojson)
+
+    assert resultado["features"][0]["properties"] == {"nome": "SE Norte"}
+    assert resultado["features"][0]["geometry"]["coordinates"] == [-46.123457, -23.765432]
+    assert resultado["features"][1]["properties"] is None
+
+
+def test_validate_bbox():
+    """
+    Bbox válido passa; formato, ranges, ordem e tamanho inválidos são rejeitados.
+    """
+    assert security.validate_bbox("-46.8,-23.8,-46.3,-23.4")
+    assert not security.validate_bbox("")
+    assert not security.validate_bbox("-46.8,-23.8,-46.3")
+    assert not security.validate_bbox("a,b,c,d")
+    assert not security.validate_bbox("-46.3,-23.8,-46.8,-23.4")
+    assert not security.validate_bbox("-46.8,-23.8,-46.8,-23.4")
+    assert not security.validate_bbox("-181,-23.8,-175,-23.4")
+    assert not security.validate_bbox("-60,-30,-40,-20")
+
+
+def test_sanitize_inputs_keeps_signature_and_sanitizes_strings():
+    """
+    O decorador mantém nome/docstring da função e sanitiza apenas kwargs str.
+    """
+
+    @sanitize_inputs
+    def buscar(tipo=None, limite=10):
+        """Busca zoneamento."""
+        return tipo, limite
+
+    assert buscar.__name__ == "buscar"
+    assert buscar.__doc__ == "Busca zoneamento."
+    assert buscar(tipo="ZEPAM; --", limite=5) == ("ZEPAM ", 5)
+    assert buscar(limite=5) == (None, 5)
+
+
+def test_parse_bbox_accepts_only_four_numbers():
+    """
+    A bbox deve ter exatamente quatro números decimais separados por vírgula.
+    """
+    assert parse_bbox("-46.8,-23.7, -46.5,-23.4") == (-46.8, -23.7, -46.5, -23.4)
+    assert parse_bbox("-46.8,-23.7,-46.5") is None
+    assert parse_bbox("-46.8,-23.7,-46.5,abc") is None
+    assert parse_bbox("1e3,0,1,1") is None
+
+
+def test_round_coordinates_matches_python_round():
+    """
+    O arredondamento vetorizado deve dar o mesmo resultado (e tipo) do round() valor a valor.
+    """
+
+    def python_round(coords, precision):
+        if isinstance(coords, list):
+            return [python_round(c, precision) for c in coords]
+        return round(coords, precision)
+
+    cases = [
+        [2.675, 1.005],  # x.5 apenas após a multiplicação pela escala
+        [[0.0078125, -46], [-23.5, 3]],  # meio exato e inteiros misturados
+        [-46, -23],
+        [[-46.6333335, -23.5500005], [-46.1234565, -23.9876545]],
+        [float("inf"), 1e300],
+    ]
+    for coords in cases:
+        for precision in (0, 2, 6):
+            expected = python_round(coords, precision)
+            assert repr(round_coordinates(coords, precision)) == repr(expected)
+
+
+def test_sanitize_sql_input_truncates_after_stripping():
+    """
+    O limite de tamanho vale para o valor já sem as sequências perigosas.
+    """
+    value = ";" * 10 + "a" * 1000
+
+    assert SecurityManager.sanitize_sql_input(value) == "a" * 1000